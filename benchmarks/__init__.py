@@ -0,0 +1,3 @@
+"""
+Benchmarks and a local SendGrid stand-in for measuring SWECC Email Sender performance.
+"""
@@ -0,0 +1,121 @@
+"""
+Cold-start import time of the package and the CLI.
+
+Each scenario runs in a fresh interpreter, as a cron job or job runner would start
+the CLI. The reported time is the scenario's wall time minus that of an empty
+interpreter, so it covers only importing and running the scenario itself. The
+modules each scenario ends up loading are checked against a list of expensive
+dependencies that only some code paths need::
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --repeat 50 --json after.json --compare before.json
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from benchmarks.micro import compare, format_seconds
+from swecc_email_sender import __version__
+
+DEFAULT_REPEAT = 20
+
+SCENARIOS = {
+    "import_package": "import swecc_email_sender",
+    "import_email_sender": "from swecc_email_sender import EmailSender",
+    "import_cli": "import swecc_email_sender.cli",
+    "cli_parse_args": (
+        "from swecc_email_sender.cli import create_parser; "
+        "create_parser().parse_args(['--from', 'a@example.com', '--to', 'b@example.com', "
+        "'--subject', 'Hi', '--content', 'Hello'])"
+    ),
+}
+
+# Dependencies that should only be loaded by the code paths that use them
+WATCHED_MODULES = (
+    "asyncio",
+    "markdown",
+    "csv",
+    "json",
+    "getpass",
+    "sqlite3",
+    "multiprocessing",
+    "cProfile",
+)
+
+_REPORT_MODULES = f"import json; print(json.dumps([m for m in {WATCHED_MODULES!r} if m in loaded]))"
+
+
+def time_statement(statement: str) -> float:
+    """Wall time of running a statement in a fresh interpreter."""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", statement], check=True)
+    return time.perf_counter() - start
+
+
+def loaded_modules(statement: str) -> List[str]:
+    """Watched modules that are loaded after running a statement."""
+    # Snapshot sys.modules before the reporting code itself imports json
+    script = f"{statement}\nimport sys\nloaded = set(sys.modules)\n{_REPORT_MODULES}"
+    output = subprocess.run(
+        [sys.executable, "-c", script], check=True, capture_output=True, text=True
+    ).stdout
+    loaded: List[str] = json.loads(output)
+    return loaded
+
+
+def run_scenario(name: str, statement: str, repeat: int, baseline: float) -> Dict[str, Any]:
+    """Time a scenario, reporting the best and median seconds above the empty interpreter."""
+    times = sorted(max(0.0, time_statement(statement) - baseline) for _ in range(repeat))
+    return {
+        "name": name,
+        "repeat": repeat,
+        "best_seconds": times[0],
+        "median_seconds": times[len(times) // 2],
+        "loaded": loaded_modules(statement),
+    }
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Run the import-time scenarios and print a report."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--json", dest="json_path", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Baseline JSON results to compare against")
+    args = parser.parse_args(argv)
+
+    baseline = statistics.median(time_statement("pass") for _ in range(args.repeat))
+    print(f"{'empty interpreter':<40} {format_seconds(baseline):>12}")
+
+    results = []
+    for name, statement in SCENARIOS.items():
+        result = run_scenario(name, statement, args.repeat, baseline)
+        results.append(result)
+        print(
+            f"{name:<40} {format_seconds(result['best_seconds']):>12}"
+            f" (median {format_seconds(result['median_seconds'])})"
+            f"  loads: {', '.join(result['loaded']) or '-'}"
+        )
+
+    if args.json_path:
+        report = {
+            "version": __version__,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "results": results,
+        }
+        Path(args.json_path).write_text(json.dumps(report, indent=2))
+
+    if args.compare:
+        return 1 if compare(results, args.compare) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,285 @@
+"""
+Microbenchmarks for the CPU-bound rendering, Markdown and loading paths.
+
+Each benchmark is timed with ``timeit`` and reported as the best per-operation
+time over several repeats. Results can be written as JSON and compared with an
+earlier run to catch regressions between versions::
+
+    python -m benchmarks.micro --json before.json
+    python -m benchmarks.micro --json after.json --compare before.json
+    python -m benchmarks.micro --rows 1000 100000 1000000 --filter load
+"""
+
+import argparse
+import csv
+import json
+import platform
+import sys
+import tempfile
+import timeit
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence
+
+from swecc_email_sender import __version__
+from swecc_email_sender.core.loader import DataLoader
+from swecc_email_sender.core.payload import payload_builder
+from swecc_email_sender.core.sender import EmailSender
+from swecc_email_sender.utils.markdown_utils import (
+    clear_markdown_cache,
+    convert_markdown_to_html,
+)
+
+DEFAULT_ROWS = (1_000, 100_000, 1_000_000)
+DEFAULT_REPEAT = 5
+# Slowdowns beyond this ratio are flagged when comparing runs
+REGRESSION_THRESHOLD = 1.10
+
+TEMPLATE = """# Hi {first_name} {last_name},
+
+Thanks for joining **SWECC** in {joined}. Here is what's coming up this quarter:
+
+| Event | Date | Location |
+|-------|------|----------|
+| Kickoff | {kickoff_date} | CSE2 G20 |
+| Resume review | Oct 14 | Allen Center |
+| Mock interviews | Oct 21 | Online |
+
+## Your details
+
+- Major: *{major}*
+- Graduation: {grad_year}
+- Discord: `{discord}`
+
+```
+Questions? Reply to this email or ping us on Discord.
+```
+
+[Manage your membership](https://swecc.org/members/{member_id})
+
+Cheers,
+The SWECC team
+"""
+FIELDS = [
+    "to_email",
+    "first_name",
+    "last_name",
+    "joined",
+    "kickoff_date",
+    "major",
+    "grad_year",
+    "discord",
+    "member_id",
+]
+
+
+class Benchmark(NamedTuple):
+    """A named operation timed over ``number`` iterations per repeat."""
+
+    name: str
+    fn: Callable[[], Any]
+    number: int
+
+
+def make_record(i: int) -> Dict[str, str]:
+    """Synthetic recipient row with realistic field lengths."""
+    return {
+        "to_email": f"student{i}@uw.edu",
+        "first_name": f"First{i % 997}",
+        "last_name": f"Last{i % 991}",
+        "joined": str(2015 + i % 10),
+        "kickoff_date": "Oct 7",
+        "major": ("Computer Science", "Informatics", "Computer Engineering")[i % 3],
+        "grad_year": str(2025 + i % 4),
+        "discord": f"user{i}",
+        "member_id": str(100000 + i),
+    }
+
+
+def write_csv(path: Path, rows: int) -> None:
+    """Write a synthetic recipient CSV file."""
+    with path.open("w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        for i in range(rows):
+            writer.writerow(make_record(i))
+
+
+def write_json(path: Path, rows: int) -> None:
+    """Write a synthetic recipient JSON array without holding it all in memory."""
+    with path.open("w") as f:
+        f.write("[")
+        for i in range(rows):
+            if i:
+                f.write(",\n")
+            json.dump(make_record(i), f)
+        f.write("]")
+
+
+def json_dumps_payload(html: str) -> bytes:
+    """Serialize a request body by building the dict and calling json.dumps."""
+    payload = {
+        "personalizations": [{"to": [{"email": "student1@uw.edu"}]}],
+        "from": {"email": "bench@example.com"},
+        "subject": "Welcome",
+        "content": [{"type": "text/html", "value": html}],
+    }
+    return json.dumps(payload).encode()
+
+
+def render_benchmarks() -> List[Benchmark]:
+    """Template substitution, validation and Markdown conversion."""
+    records = [make_record(i) for i in range(1000)]
+    rendered = [TEMPLATE.format(**record) for record in records]
+    state = {"i": 0}
+
+    def next_record() -> Dict[str, str]:
+        state["i"] = (state["i"] + 1) % len(records)
+        return records[state["i"]]
+
+    html = convert_markdown_to_html(rendered[0])
+
+    def convert_uncached() -> str:
+        clear_markdown_cache()
+        return convert_markdown_to_html(rendered[0])
+
+    def convert_distinct() -> str:
+        # Every document differs, as with per-recipient personalization
+        next_record()
+        return convert_markdown_to_html(rendered[state["i"]])
+
+    return [
+        Benchmark(
+            "format_with_fallback",
+            lambda: EmailSender.format_with_fallback(TEMPLATE, next_record()),
+            10_000,
+        ),
+        Benchmark(
+            "format_with_fallback_missing",
+            lambda: EmailSender.format_with_fallback(TEMPLATE, {"first_name": "Ada"}),
+            10_000,
+        ),
+        Benchmark(
+            "validate_template_keys",
+            lambda: EmailSender.validate_template_keys(TEMPLATE, next_record()),
+            10_000,
+        ),
+        Benchmark(
+            "convert_markdown_to_html_cached",
+            lambda: convert_markdown_to_html(rendered[0]),
+            10_000,
+        ),
+        Benchmark("convert_markdown_to_html_uncached", convert_uncached, 200),
+        Benchmark("convert_markdown_to_html_distinct", convert_distinct, 200),
+        Benchmark("build_payload_json_dumps", lambda: json_dumps_payload(html), 10_000),
+        Benchmark(
+            "build_payload_builder",
+            lambda: payload_builder("bench@example.com", "text/html").build(
+                "student1@uw.edu", "Welcome", html
+            ),
+            10_000,
+        ),
+    ]
+
+
+def loader_benchmarks(
+    directory: Path, row_counts: Sequence[int], name_filter: Optional[str] = None
+) -> List[Benchmark]:
+    """DataLoader over synthetic CSV and JSON files of each size."""
+    benchmarks = []
+    for rows in row_counts:
+        for suffix, writer in ((".csv", write_csv), (".json", write_json)):
+            path = directory / f"recipients_{rows}{suffix}"
+            for method in ("load_data", "load_table"):
+                name = f"{method}_{suffix[1:]}[{rows}]"
+                if name_filter and name_filter not in name:
+                    continue
+                if not path.exists():
+                    writer(path, rows)
+                load = getattr(DataLoader, method)
+                benchmarks.append(Benchmark(name, lambda path=path, load=load: load(str(path)), 1))
+    return benchmarks
+
+
+def run_benchmark(benchmark: Benchmark, repeat: int) -> Dict[str, Any]:
+    """Time a benchmark, reporting the best and median seconds per operation."""
+    timer = timeit.Timer(benchmark.fn)
+    per_op = sorted(t / benchmark.number for t in timer.repeat(repeat, benchmark.number))
+    return {
+        "name": benchmark.name,
+        "number": benchmark.number,
+        "repeat": repeat,
+        "best_seconds": per_op[0],
+        "median_seconds": per_op[len(per_op) // 2],
+    }
+
+
+def format_seconds(seconds: float) -> str:
+    """Human-readable duration."""
+    for unit, scale in (("s", 1.0), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: str) -> int:
+    """Print the change relative to a baseline run, returning the number of regressions."""
+    baseline = {
+        result["name"]: result for result in json.loads(Path(baseline_path).read_text())["results"]
+    }
+    regressions = 0
+    print(f"\nCompared with {baseline_path}:")
+    for result in results:
+        previous = baseline.get(result["name"])
+        if previous is None:
+            continue
+        ratio = result["best_seconds"] / previous["best_seconds"]
+        flag = ""
+        if ratio > REGRESSION_THRESHOLD:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{result['name']:<40} {ratio:>6.2f}x{flag}")
+    return regressions
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Run the microbenchmarks and print a report."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "--rows", type=int, nargs="+", default=list(DEFAULT_ROWS), help="Loader file sizes"
+    )
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--filter", help="Only run benchmarks whose name contains this")
+    parser.add_argument("--json", dest="json_path", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Baseline JSON results to compare against")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        benchmarks = render_benchmarks() + loader_benchmarks(Path(tmp), args.rows, args.filter)
+        if args.filter:
+            benchmarks = [b for b in benchmarks if args.filter in b.name]
+
+        results = []
+        for benchmark in benchmarks:
+            result = run_benchmark(benchmark, args.repeat)
+            results.append(result)
+            print(
+                f"{result['name']:<40} {format_seconds(result['best_seconds']):>12}"
+                f" (median {format_seconds(result['median_seconds'])})"
+            )
+
+    if args.json_path:
+        report = {
+            "version": __version__,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "results": results,
+        }
+        Path(args.json_path).write_text(json.dumps(report, indent=2))
+
+    if args.compare:
+        return 1 if compare(results, args.compare) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
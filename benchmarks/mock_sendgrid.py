@@ -0,0 +1,238 @@
+"""
+Local stand-in for the SendGrid ``/v3/mail/send`` endpoint.
+
+Run it directly to get a server that other processes (or ``swecc-email-sender
+--api-url``) can send to::
+
+    python -m benchmarks.mock_sendgrid --port 8025 --latency 0.05 --error-rate 0.01
+"""
+
+import argparse
+import json
+import random
+import ssl
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+MAIL_SEND_PATH = "/v3/mail/send"
+
+
+class MockSendGridConfig:
+    """Behaviour of the mock server."""
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        latency_jitter: float = 0.0,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        rate_limit: Optional[int] = None,
+        rate_window: float = 1.0,
+        api_key: Optional[str] = None,
+    ):
+        """
+        Configure the mock server.
+
+        Args:
+            latency: Seconds to wait before answering each request
+            latency_jitter: Extra uniformly random latency up to this many seconds
+            error_rate: Fraction of requests answered with a random 5xx status
+            throttle_rate: Fraction of requests answered with 429
+            rate_limit: Requests allowed per window before answering 429
+            rate_window: Length of the rate-limit window in seconds
+            api_key: If set, requests with another bearer token get 401
+        """
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.api_key = api_key
+
+
+class MockSendGridServer(ThreadingHTTPServer):
+    """Threaded HTTP server emulating SendGrid's mail/send endpoint."""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: Tuple[str, int] = ("127.0.0.1", 0),
+        config: Optional[MockSendGridConfig] = None,
+        certfile: Optional[str] = None,
+        keyfile: Optional[str] = None,
+    ):
+        """Bind the server; pass a certificate to serve HTTPS."""
+        super().__init__(address, MockSendGridHandler)
+        self.config = config or MockSendGridConfig()
+        self.lock = threading.Lock()
+        self.stats: Dict[str, int] = {
+            "requests": 0,
+            "accepted": 0,
+            "personalizations": 0,
+            "bytes_in": 0,
+            "connections": 0,
+        }
+        self.statuses: Dict[int, int] = {}
+        self._window_start = time.monotonic()
+        self._window_count = 0
+        self.secure = certfile is not None
+        if certfile is not None:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(certfile, keyfile)
+            self.socket = context.wrap_socket(self.socket, server_side=True)
+
+    @property
+    def url(self) -> str:
+        """Base URL to pass as ``api_url``."""
+        host, port = self.server_address[:2]
+        return f"{'https' if self.secure else 'http'}://{host}:{port}"
+
+    def choose_response(self, personalizations: int) -> Tuple[int, Dict[str, str]]:
+        """Pick the status and rate-limit headers for a request."""
+        config = self.config
+        with self.lock:
+            now = time.monotonic()
+            if now - self._window_start >= config.rate_window:
+                self._window_start = now
+                self._window_count = 0
+            self._window_count += 1
+            reset = time.time() + config.rate_window - (now - self._window_start)
+            headers = {"X-RateLimit-Reset": str(int(reset + 0.999))}
+            if config.rate_limit is not None:
+                remaining = max(config.rate_limit - self._window_count, 0)
+                headers["X-RateLimit-Limit"] = str(config.rate_limit)
+                headers["X-RateLimit-Remaining"] = str(remaining)
+                if self._window_count > config.rate_limit:
+                    return self._record(429, personalizations), headers
+
+            roll = random.random()
+            if roll < config.throttle_rate:
+                return self._record(429, personalizations), headers
+            if roll < config.throttle_rate + config.error_rate:
+                return self._record(random.choice([500, 502, 503]), personalizations), headers
+            return self._record(202, personalizations), headers
+
+    def _record(self, status: int, personalizations: int) -> int:
+        """Count a response; the caller must hold the lock."""
+        self.stats["requests"] += 1
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if status == 202:
+            self.stats["accepted"] += 1
+            self.stats["personalizations"] += personalizations
+        return status
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Copy of the request counters."""
+        with self.lock:
+            return {**self.stats, "statuses": dict(self.statuses)}
+
+
+class MockSendGridHandler(BaseHTTPRequestHandler):
+    """Request handler implementing ``POST /v3/mail/send``."""
+
+    protocol_version = "HTTP/1.1"
+    server: MockSendGridServer
+
+    def setup(self) -> None:
+        """Count each new client connection."""
+        super().setup()
+        with self.server.lock:
+            self.server.stats["connections"] += 1
+
+    def log_message(self, format: str, *args: Any) -> None:
+        """Silence per-request logging."""
+
+    def _reply(
+        self, status: int, body: bytes = b"", headers: Optional[Dict[str, str]] = None
+    ) -> None:
+        """Send a complete response with a Content-Length so the connection stays open."""
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self) -> None:
+        """Validate a mail/send request and answer according to the server config."""
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        with self.server.lock:
+            self.server.stats["bytes_in"] += length
+
+        if self.path != MAIL_SEND_PATH:
+            self._reply(404, b'{"errors": [{"message": "not found"}]}')
+            return
+
+        config = self.server.config
+        if config.api_key and self.headers.get("Authorization") != f"Bearer {config.api_key}":
+            self._reply(401, b'{"errors": [{"message": "unauthorized"}]}')
+            return
+
+        try:
+            payload = json.loads(body)
+            personalizations = len(payload["personalizations"])
+        except (ValueError, KeyError, TypeError):
+            self._reply(400, b'{"errors": [{"message": "invalid payload"}]}')
+            return
+
+        delay = config.latency + random.uniform(0, config.latency_jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+        status, headers = self.server.choose_response(personalizations)
+        error = b"" if status == 202 else json.dumps({"errors": [{"status": status}]}).encode()
+        self._reply(status, error, headers)
+
+
+def start_server(
+    config: Optional[MockSendGridConfig] = None, port: int = 0
+) -> Tuple[MockSendGridServer, threading.Thread]:
+    """Start a mock server on a background thread."""
+    server = MockSendGridServer(("127.0.0.1", port), config)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, thread
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Run the mock server until interrupted."""
+    parser = argparse.ArgumentParser(description="Local stand-in for SendGrid's mail/send API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds per request")
+    parser.add_argument("--latency-jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of 5xx")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="Fraction of 429")
+    parser.add_argument("--rate-limit", type=int, help="Requests per window before 429")
+    parser.add_argument("--rate-window", type=float, default=1.0)
+    parser.add_argument("--certfile", help="Serve HTTPS with this certificate")
+    parser.add_argument("--keyfile")
+    args = parser.parse_args(argv)
+
+    config = MockSendGridConfig(
+        latency=args.latency,
+        latency_jitter=args.latency_jitter,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        rate_limit=args.rate_limit,
+        rate_window=args.rate_window,
+    )
+    server = MockSendGridServer((args.host, args.port), config, args.certfile, args.keyfile)
+    print(f"Mock SendGrid listening on {server.url}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps(server.snapshot()))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
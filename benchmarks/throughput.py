@@ -0,0 +1,261 @@
+"""
+End-to-end send throughput benchmark against the local mock SendGrid server.
+
+The mock server runs in a separate process so that the reported CPU time belongs
+to the sender alone::
+
+    python -m benchmarks.throughput --emails 5000 --workers 16 --latency 0.05
+    python -m benchmarks.throughput --scenarios cli batch --json results.json
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from swecc_email_sender import cli
+from swecc_email_sender.core.async_sender import AsyncEmailSender
+from swecc_email_sender.core.retry import RetryPolicy
+from swecc_email_sender.core.sender import EmailSender
+from swecc_email_sender.core.sharded import ShardedSender
+
+SCENARIOS = ("send_email", "batch", "async", "sharded", "cli")
+
+SUBJECT = "Hello {name}"
+TEMPLATE = """# Hi {name}
+
+Thanks for being part of **SWECC** since {joined}.
+
+| Event | Date |
+|-------|------|
+| Kickoff | {date} |
+"""
+
+
+def make_records(count: int, distinct_bodies: int) -> List[Dict[str, str]]:
+    """Synthetic recipients; ``distinct_bodies`` controls how many bodies differ."""
+    return [
+        {
+            "to_email": f"user{i}@example.com",
+            "name": f"User {i % distinct_bodies}",
+            "joined": str(2015 + i % 10),
+            "date": "2024-10-01",
+        }
+        for i in range(count)
+    ]
+
+
+def percentile(values: Sequence[float], fraction: float) -> float:
+    """Nearest-rank percentile of a non-empty sequence."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(
+    name: str,
+    emails: int,
+    succeeded: int,
+    wall: float,
+    cpu: float,
+    latencies: Optional[List[float]] = None,
+) -> Dict[str, Any]:
+    """Build the result row for one scenario."""
+    result: Dict[str, Any] = {
+        "scenario": name,
+        "emails": emails,
+        "succeeded": succeeded,
+        "wall_seconds": round(wall, 4),
+        "emails_per_second": round(emails / wall, 1) if wall else None,
+        "cpu_ms_per_email": round(cpu * 1000 / emails, 4) if emails else None,
+    }
+    if latencies:
+        result["p50_ms"] = round(statistics.median(latencies) * 1000, 2)
+        result["p99_ms"] = round(percentile(latencies, 0.99) * 1000, 2)
+    return result
+
+
+def measure(fn: Callable[[], Any]) -> Any:
+    """Run fn, returning its result with wall and CPU time."""
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    value = fn()
+    return value, time.perf_counter() - wall_start, time.process_time() - cpu_start
+
+
+def make_sender(args: argparse.Namespace, url: str) -> EmailSender:
+    """Sender configured like a production batch run."""
+    return EmailSender(
+        "SG.benchmark",
+        pool_size=args.workers,
+        retry_policy=RetryPolicy(max_attempts=5, backoff_base=0.01),
+        api_url=url,
+    )
+
+
+def run_send_email(args: argparse.Namespace, url: str, records: List[Dict[str, str]]) -> Dict:
+    """Per-recipient send_email calls fanned out over a thread pool."""
+    latencies: List[float] = []
+
+    with make_sender(args, url) as sender:
+
+        def send(record: Dict[str, str]) -> bool:
+            start = time.perf_counter()
+            ok = sender.send_email(
+                record["to_email"], SUBJECT, TEMPLATE, "bench@example.com", args.markdown, record
+            )
+            latencies.append(time.perf_counter() - start)
+            return ok
+
+        def run() -> int:
+            with ThreadPoolExecutor(max_workers=args.workers) as executor:
+                return sum(executor.map(send, records))
+
+        succeeded, wall, cpu = measure(run)
+    return summarize("send_email", len(records), succeeded, wall, cpu, latencies)
+
+
+def run_batch(args: argparse.Namespace, url: str, records: List[Dict[str, str]]) -> Dict:
+    """A single send_batch call packing identical emails together."""
+    with make_sender(args, url) as sender:
+        results, wall, cpu = measure(
+            lambda: sender.send_batch(
+                records, SUBJECT, TEMPLATE, "bench@example.com", args.markdown
+            )
+        )
+    return summarize("batch", len(records), sum(results), wall, cpu)
+
+
+def run_async(args: argparse.Namespace, url: str, records: List[Dict[str, str]]) -> Dict:
+    """AsyncEmailSender.send_many with the worker count as concurrency."""
+
+    async def run() -> List[bool]:
+        async with AsyncEmailSender(
+            "SG.benchmark",
+            pool_size=args.workers,
+            retry_policy=RetryPolicy(max_attempts=5, backoff_base=0.01),
+            api_url=url,
+        ) as sender:
+            return await sender.send_many(
+                records,
+                SUBJECT,
+                TEMPLATE,
+                "bench@example.com",
+                args.markdown,
+                concurrency=args.workers,
+            )
+
+    results, wall, cpu = measure(lambda: asyncio.run(run()))
+    return summarize("async", len(records), sum(results), wall, cpu)
+
+
+def run_sharded(args: argparse.Namespace, url: str, records: List[Dict[str, str]]) -> Dict:
+    """ShardedSender spreading the workers over processes; CPU time is the parent's only."""
+    sender = ShardedSender(
+        args.processes,
+        "SG.benchmark",
+        threads=max(1, args.workers // args.processes),
+        retry_policy=RetryPolicy(max_attempts=5, backoff_base=0.01),
+        api_url=url,
+    )
+    results, wall, cpu = measure(
+        lambda: sender.send_all(records, SUBJECT, TEMPLATE, "bench@example.com", args.markdown)
+    )
+    return summarize("sharded", len(records), sum(results), wall, cpu)
+
+
+def run_cli(args: argparse.Namespace, url: str, records: List[Dict[str, str]]) -> Dict:
+    """The full CLI, including loading a CSV file."""
+    with tempfile.TemporaryDirectory() as tmp:
+        src = Path(tmp) / "recipients.csv"
+        with src.open("w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(records[0]))
+            writer.writeheader()
+            writer.writerows(records)
+        argv = [
+            "--from", "bench@example.com",
+            "--api-key", "SG.benchmark",
+            "--api-url", url,
+            "--src", str(src),
+            "--subject", SUBJECT,
+            "--content", TEMPLATE,
+            "--workers", str(args.workers),
+            "--max-attempts", "5",
+        ]  # fmt: skip
+        if args.markdown:
+            argv.append("--markdown")
+        exit_code, wall, cpu = measure(lambda: cli.main(argv))
+    return summarize("cli", len(records), len(records) if exit_code == 0 else 0, wall, cpu)
+
+
+RUNNERS = {
+    "send_email": run_send_email,
+    "batch": run_batch,
+    "async": run_async,
+    "sharded": run_sharded,
+    "cli": run_cli,
+}
+
+
+def start_mock_server(args: argparse.Namespace) -> Tuple["subprocess.Popen[str]", str]:
+    """Launch the mock server in a child process and return it with its URL."""
+    command = [
+        sys.executable, "-m", "benchmarks.mock_sendgrid",
+        "--port", "0",
+        "--latency", str(args.latency),
+        "--error-rate", str(args.error_rate),
+        "--throttle-rate", str(args.throttle_rate),
+    ]  # fmt: skip
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    assert process.stdout is not None
+    line = process.stdout.readline()
+    if not line:
+        raise RuntimeError("Mock server failed to start")
+    return process, line.rsplit(" ", 1)[-1].strip()
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Run the selected scenarios and print a report."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--emails", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--distinct-bodies", type=int, default=100)
+    parser.add_argument("--markdown", action="store_true")
+    parser.add_argument("--latency", type=float, default=0.02, help="Mock server seconds/request")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--json", dest="json_path", help="Write results to this JSON file")
+    args = parser.parse_args(argv)
+
+    logging.getLogger("swecc_email_sender").setLevel(logging.ERROR)
+    records = make_records(args.emails, args.distinct_bodies)
+    process, url = start_mock_server(args)
+    try:
+        results = [RUNNERS[name](args, url, records) for name in args.scenarios]
+    finally:
+        process.terminate()
+        process.wait()
+
+    columns = ["scenario", "emails_per_second", "cpu_ms_per_email", "p50_ms", "p99_ms"]
+    print(" ".join(f"{column:>18}" for column in columns))
+    for result in results:
+        print(" ".join(f"{result.get(column, '-')!s:>18}" for column in columns))
+
+    if args.json_path:
+        report = {"config": vars(args), "results": results}
+        Path(args.json_path).write_text(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -2,8 +2,59 @@
 SWECC Email Sender - An email automation library using SendGrid.
 """
 
-from swecc_email_sender.core.loader import DataLoader
-from swecc_email_sender.core.sender import EmailSender
+from typing import TYPE_CHECKING
+
+from swecc_email_sender.utils.lazy import lazy_exports
+
+if TYPE_CHECKING:
+    from swecc_email_sender.core.async_sender import AsyncEmailSender
+    from swecc_email_sender.core.credentials import (
+        ChainCredentialProvider,
+        ConfigFileCredentialProvider,
+        CredentialProvider,
+        EnvCredentialProvider,
+    )
+    from swecc_email_sender.core.loader import DataLoader
+    from swecc_email_sender.core.metrics import SenderMetrics
+    from swecc_email_sender.core.ratelimit import RateLimiter
+    from swecc_email_sender.core.retry import RetryPolicy
+    from swecc_email_sender.core.send_queue import QueueWorker, SendQueue
+    from swecc_email_sender.core.sender import EmailSender
+    from swecc_email_sender.core.sharded import ShardedSender
 
 __version__ = "1.0.7"
-__all__ = ["DataLoader", "EmailSender"]
+__all__ = [
+    "AsyncEmailSender",
+    "ChainCredentialProvider",
+    "ConfigFileCredentialProvider",
+    "CredentialProvider",
+    "DataLoader",
+    "EmailSender",
+    "EnvCredentialProvider",
+    "QueueWorker",
+    "RateLimiter",
+    "RetryPolicy",
+    "SendQueue",
+    "SenderMetrics",
+    "ShardedSender",
+]
+
+# Exports are imported on first use so that importing the package stays cheap
+__getattr__, __dir__ = lazy_exports(
+    __name__,
+    {
+        "AsyncEmailSender": "swecc_email_sender.core.async_sender",
+        "ChainCredentialProvider": "swecc_email_sender.core.credentials",
+        "ConfigFileCredentialProvider": "swecc_email_sender.core.credentials",
+        "CredentialProvider": "swecc_email_sender.core.credentials",
+        "DataLoader": "swecc_email_sender.core.loader",
+        "EmailSender": "swecc_email_sender.core.sender",
+        "EnvCredentialProvider": "swecc_email_sender.core.credentials",
+        "QueueWorker": "swecc_email_sender.core.send_queue",
+        "RateLimiter": "swecc_email_sender.core.ratelimit",
+        "RetryPolicy": "swecc_email_sender.core.retry",
+        "SendQueue": "swecc_email_sender.core.send_queue",
+        "SenderMetrics": "swecc_email_sender.core.metrics",
+        "ShardedSender": "swecc_email_sender.core.sharded",
+    },
+)
@@ -6,29 +6,78 @@ import argparse
 import logging
 import os
 import sys
-from typing import Optional, Sequence
+import threading
+from collections import deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Deque,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    TypeVar,
+)
 
 from swecc_email_sender.core.loader import DataLoader
-from swecc_email_sender.core.sender import EmailSender
+from swecc_email_sender.core.metrics import SenderMetrics
+from swecc_email_sender.core.pool import DEFAULT_POOL_SIZE, SENDGRID_API_URL
+from swecc_email_sender.core.ratelimit import RateLimiter
+from swecc_email_sender.core.recipients import RecipientTable
+from swecc_email_sender.core.retry import RetryPolicy
+from swecc_email_sender.core.sender import EmailSender, SendOutcome
+from swecc_email_sender.core.sharded import ShardedSender
+from swecc_email_sender.core.validation import validate_file, validate_records
 from swecc_email_sender.utils.markdown_utils import convert_markdown_to_html
 
-# Set up root logger
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+if TYPE_CHECKING:
+    from swecc_email_sender.core.journal import SendJournal
+    from swecc_email_sender.core.send_queue import SendQueue
+
 logger = logging.getLogger(__name__)
 
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+SERVE_COMMAND = "serve"
+WORKER_COMMAND = "worker"
 
-def create_parser() -> argparse.ArgumentParser:
-    """Create and configure the argument parser."""
-    parser = argparse.ArgumentParser(
-        description="Send emails using SendGrid API with support for templates and Markdown.",
-        formatter_class=argparse.RawDescriptionHelpFormatter,
-    )
+SERVER_SIDE_HELP = (
+    "send the template once per request and let SendGrid substitute each recipient's "
+    "values (fields become -name- substitution tags)"
+)
+
+T = TypeVar("T")
+R = TypeVar("R")
 
+
+def positive_int(value: str) -> int:
+    """Argparse type for integers greater than zero."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer: {value}")
+    return number
+
+
+def positive_float(value: str) -> float:
+    """Argparse type for numbers greater than zero."""
+    number = float(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"must be a positive number: {value}")
+    return number
+
+
+def add_connection_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the SendGrid account and logging options shared by every command."""
     parser.add_argument(
-        "--from", dest="from_email", type=str, required=True, help="Sender email address"
+        "--api-key", type=str, help="SendGrid API key (defaults to SENDGRID_API_KEY env var)"
     )
     parser.add_argument(
-        "--api-key", type=str, help="SendGrid API key (defaults to SENDGRID_API_KEY env var)"
+        "--api-url",
+        default=SENDGRID_API_URL,
+        help="SendGrid API base URL (e.g. a local mock server for testing)",
     )
     parser.add_argument(
         "--verbose",
@@ -37,6 +86,76 @@ def create_parser() -> argparse.ArgumentParser:
         help="Enable verbose logging (includes debug messages)",
     )
 
+
+def add_delivery_arguments(parser: argparse.ArgumentParser, budget_scope: str) -> None:
+    """Add the rate limiting and retry options shared by every command that sends."""
+    parser.add_argument(
+        "--rate",
+        type=positive_float,
+        help="Maximum SendGrid requests per second (default: unlimited)",
+    )
+    parser.add_argument(
+        "--burst",
+        type=positive_int,
+        help="Requests allowed back to back when --rate is set (default: one second's worth)",
+    )
+    parser.add_argument(
+        "--max-attempts",
+        type=positive_int,
+        default=3,
+        help="Attempts per email for transient SendGrid errors and timeouts (default: 3)",
+    )
+    parser.add_argument(
+        "--retry-budget",
+        type=int,
+        help=f"Maximum total retries for {budget_scope} (default: unlimited)",
+    )
+
+
+def add_queue_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the options of draining a durable send queue."""
+    from swecc_email_sender.core.send_queue import (
+        DEFAULT_CLAIM_SIZE,
+        DEFAULT_MAX_DELIVERIES,
+        DEFAULT_VISIBILITY_TIMEOUT,
+    )
+
+    parser.add_argument(
+        "--claim-size",
+        type=positive_int,
+        default=DEFAULT_CLAIM_SIZE,
+        help=f"Queued emails each worker thread takes at a time (default: {DEFAULT_CLAIM_SIZE})",
+    )
+    parser.add_argument(
+        "--visibility-timeout",
+        type=positive_float,
+        default=DEFAULT_VISIBILITY_TIMEOUT,
+        help="Seconds before queued emails taken by a worker that never reported back are "
+        f"sent again (default: {DEFAULT_VISIBILITY_TIMEOUT:g})",
+    )
+    parser.add_argument(
+        "--max-deliveries",
+        type=positive_int,
+        default=DEFAULT_MAX_DELIVERIES,
+        help="Times a queued email is taken for sending before it is dead-lettered "
+        f"(default: {DEFAULT_MAX_DELIVERIES})",
+    )
+
+
+def create_parser() -> argparse.ArgumentParser:
+    """Create and configure the argument parser."""
+    parser = argparse.ArgumentParser(
+        description="Send emails using SendGrid API with support for templates and Markdown.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=f"Run '%(prog)s {SERVE_COMMAND} --help' to start a long-running send server, "
+        f"or '%(prog)s {WORKER_COMMAND} --help' to send emails from a queue.",
+    )
+
+    parser.add_argument(
+        "--from", dest="from_email", type=str, required=True, help="Sender email address"
+    )
+    add_connection_arguments(parser)
+
     content_group = parser.add_mutually_exclusive_group(required=True)
     content_group.add_argument("--content", type=str, help="Direct email content")
     content_group.add_argument(
@@ -51,16 +170,425 @@ def create_parser() -> argparse.ArgumentParser:
 
     parser.add_argument("--subject", type=str, required=True, help="Email subject")
     parser.add_argument("--markdown", action="store_true", help="Treat content as Markdown")
+    parser.add_argument(
+        "--render-once",
+        action="store_true",
+        help="With --markdown, convert the template to HTML once instead of once per recipient",
+    )
+    parser.add_argument(
+        "--resume",
+        metavar="JOURNAL",
+        help="Record outcomes in JOURNAL (created if missing) and skip recipients "
+        "it lists as already sent",
+    )
+    parser.add_argument(
+        "--queue",
+        metavar="DB",
+        help="Store the emails in a durable queue in DB (created if missing) before "
+        f"sending them from it; if the run is interrupted, '%(prog)s {WORKER_COMMAND} DB' "
+        "sends the rest. Recipients of --src already queued in DB with the same templates "
+        "are not queued again, so repeating the command only adds new recipients",
+    )
     parser.add_argument(
         "--validate", action="store_true", help="Validate templates without sending"
     )
     parser.add_argument(
         "--preview", action="store_true", help="Preview the first email content without sending"
     )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Pack recipients whose rendered bodies are identical into multi-recipient "
+        "requests (subjects may differ per recipient)",
+    )
+    parser.add_argument(
+        "--server-side",
+        action="store_true",
+        help="With --batch, " + SERVER_SIDE_HELP,
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Load all recipients into a compact columnar table instead of streaming them "
+        "(uses far less memory than a list of records for large --batch sends)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=positive_int,
+        default=1,
+        help="Number of concurrent sending threads for batch sends (default: 1)",
+    )
+    parser.add_argument(
+        "--processes",
+        type=positive_int,
+        default=1,
+        help="Number of worker processes rendering and sending batch emails, each with "
+        "--workers threads and an equal share of --rate (default: 1)",
+    )
+    add_delivery_arguments(parser, "the whole run")
+    add_queue_arguments(parser)
+    parser.add_argument(
+        "--metrics-out",
+        metavar="PATH",
+        help="Time each sending stage and write the metrics in Prometheus text format to PATH",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="OUT",
+        help="Profile the run, writing cProfile stats to OUT and collapsed stacks for "
+        "flamegraph tools to OUT.collapsed",
+    )
+
+    return parser
+
+
+def create_serve_parser() -> argparse.ArgumentParser:
+    """Create the argument parser of the serve command."""
+    from swecc_email_sender.core.server import (
+        DEFAULT_HOST,
+        DEFAULT_MAX_BATCH,
+        DEFAULT_MAX_DELAY,
+        DEFAULT_MAX_REQUEST_BYTES,
+        DEFAULT_PORT,
+    )
+
+    parser = argparse.ArgumentParser(
+        prog=f"swecc-email-sender {SERVE_COMMAND}",
+        description="Run a long-lived send server accepting jobs over localhost HTTP or a\n"
+        "Unix socket and micro-batching them into SendGrid requests.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="Submit a job with POST /jobs and a JSON body such as\n"
+        '  {"from_email": "a@example.com", "subject": "Hi {name}", "content": "Hello {name}",\n'
+        '   "markdown": false, "recipients": [{"to_email": "b@example.com", "name": "B"}]}\n'
+        "and follow it with GET /jobs/<id>, or add ?wait=1 to wait for the outcome. An\n"
+        'optional "id" field makes retries safe: a job whose id is known is not sent again.',
+    )
+    add_connection_arguments(parser)
+
+    listen_group = parser.add_mutually_exclusive_group()
+    listen_group.add_argument(
+        "--port",
+        type=int,
+        default=DEFAULT_PORT,
+        help=f"Port to serve HTTP on (default: {DEFAULT_PORT})",
+    )
+    listen_group.add_argument(
+        "--socket", metavar="PATH", help="Serve on a Unix socket at PATH instead of HTTP"
+    )
+    parser.add_argument(
+        "--host",
+        default=DEFAULT_HOST,
+        help=f"Loopback address to serve HTTP on (default: {DEFAULT_HOST})",
+    )
+    parser.add_argument(
+        "--allow-remote",
+        action="store_true",
+        help="Allow --host to be a non-loopback address; the job API has no authentication, "
+        "so anyone who can reach the port sends with your API key",
+    )
+    parser.add_argument(
+        "--max-batch",
+        type=positive_int,
+        default=DEFAULT_MAX_BATCH,
+        help="Recipients after which queued jobs are sent without waiting for more "
+        f"(default: {DEFAULT_MAX_BATCH})",
+    )
+    parser.add_argument(
+        "--max-delay",
+        type=float,
+        default=DEFAULT_MAX_DELAY,
+        help="Seconds a job waits for others to share its requests "
+        f"(default: {DEFAULT_MAX_DELAY})",
+    )
+    parser.add_argument(
+        "--max-request-bytes",
+        type=positive_int,
+        default=DEFAULT_MAX_REQUEST_BYTES,
+        help="Largest job request body accepted; larger jobs are answered with 413 "
+        f"(default: {DEFAULT_MAX_REQUEST_BYTES})",
+    )
+    parser.add_argument(
+        "--workers",
+        type=positive_int,
+        default=1,
+        help="Number of batches sent concurrently (default: 1)",
+    )
+    parser.add_argument(
+        "--render-once",
+        action="store_true",
+        help="Convert Markdown templates to HTML once instead of once per recipient",
+    )
+    parser.add_argument(
+        "--server-side", action="store_true", help="For every job, " + SERVER_SIDE_HELP
+    )
+    add_delivery_arguments(parser, "each batch")
+    return parser
 
+
+def create_worker_parser() -> argparse.ArgumentParser:
+    """Create the argument parser of the worker command."""
+    parser = argparse.ArgumentParser(
+        prog=f"swecc-email-sender {WORKER_COMMAND}",
+        description="Send the emails stored in a durable queue, e.g. by an interrupted --queue "
+        "run\nor by producers using SendQueue.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("queue", metavar="DB", help="Queue database")
+    add_connection_arguments(parser)
+    parser.add_argument(
+        "--follow",
+        action="store_true",
+        help="Keep waiting for new emails instead of exiting once the queue is drained",
+    )
+    parser.add_argument(
+        "--workers",
+        type=positive_int,
+        default=1,
+        help="Number of threads taking and sending queued emails (default: 1)",
+    )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="Pack queued emails whose rendered bodies are identical into multi-recipient "
+        "requests",
+    )
+    parser.add_argument(
+        "--server-side", action="store_true", help="With --batch, " + SERVER_SIDE_HELP
+    )
+    parser.add_argument(
+        "--render-once",
+        action="store_true",
+        help="Convert Markdown templates to HTML once instead of once per recipient",
+    )
+    add_delivery_arguments(parser, "the whole run")
+    add_queue_arguments(parser)
+    parser.add_argument(
+        "--metrics-out",
+        metavar="PATH",
+        help="Time each sending stage and write the metrics in Prometheus text format to PATH",
+    )
     return parser
 
 
+def preview_email(
+    sender: EmailSender, args: argparse.Namespace, content: str, item: Mapping[str, str]
+) -> int:
+    """Print the first rendered email without sending it."""
+    print("\nPreview of first email:")
+    print("-" * 40)
+    preview_content = sender.format_with_fallback(content, item)
+    if args.markdown:
+        print("Markdown content:")
+        print(preview_content)
+        print("\nConverted HTML:")
+        print(convert_markdown_to_html(preview_content))
+    else:
+        print(preview_content)
+    return 0
+
+
+def validate_templates(
+    args: argparse.Namespace, content: str, data: Iterable[Mapping[str, str]]
+) -> int:
+    """Check the data for keys missing from the body and subject templates."""
+    logger.info("Validating templates...")
+    templates = {"body": content}
+    if args.subject:
+        templates["subject"] = args.subject
+
+    if isinstance(data, RecipientTable):
+        report = validate_records(templates, data)
+    else:
+        report = validate_file(templates, args.src)
+
+    summary, *groups = report.format()
+    logger.info(summary)
+    for line in groups:
+        logger.error(line)
+    return 0 if report.is_valid else 1
+
+
+def bounded_map(
+    executor: Executor, fn: Callable[[T], R], items: Iterable[T], max_pending: int
+) -> Iterator[R]:
+    """Like Executor.map, but only pulls items from the iterable as results are consumed."""
+    pending: Deque[Future[R]] = deque()
+    for item in items:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def send_all(
+    sender: EmailSender,
+    args: argparse.Namespace,
+    content: str,
+    data: Iterable[Mapping[str, str]],
+    journal: Optional["SendJournal"] = None,
+    sharded: Optional[ShardedSender] = None,
+) -> int:
+    """Send the templated email to every record and report the success count."""
+    skipped = 0
+    if journal is not None:
+
+        def pending_records(items: Iterable[Mapping[str, str]]) -> Iterator[Mapping[str, str]]:
+            nonlocal skipped
+            for item in items:
+                if journal.is_completed(item):
+                    skipped += 1
+                else:
+                    yield item
+
+        data = pending_records(data)
+
+    if sharded is not None:
+        results = []
+        for item, success in sharded.iter_send(
+            data,
+            args.subject,
+            content,
+            args.from_email,
+            args.markdown,
+            batch=args.batch,
+            server_side=args.server_side,
+        ):
+            if journal is not None and "to_email" in item:
+                journal.record(item, success)
+            results.append(success)
+    elif args.batch:
+        records = data if isinstance(data, RecipientTable) else list(data)
+        on_result = None
+        if journal is not None:
+
+            def on_result(indices: List[int], outcome: SendOutcome) -> None:
+                # Committed per request, so a crash mid-batch cannot re-send recipients
+                # whose request had already been accepted
+                for index in indices:
+                    if "to_email" in records[index]:
+                        journal.record(records[index], outcome.success)
+                journal.flush()
+
+        results = sender.send_batch(
+            records,
+            args.subject,
+            content,
+            args.from_email,
+            args.markdown,
+            server_side=args.server_side,
+            on_result=on_result,
+        )
+    else:
+
+        def send_record(item: Mapping[str, str]) -> bool:
+            if "to_email" not in item:
+                logger.warning("Skipping record: missing to_email field")
+                return False
+
+            success = sender.send_email(
+                item["to_email"],
+                args.subject,
+                content,
+                args.from_email,
+                args.markdown,
+                template_data=item,
+            )
+            if journal is not None:
+                journal.record(item, success)
+            return success
+
+        if args.workers > 1:
+            with ThreadPoolExecutor(max_workers=args.workers) as executor:
+                results = list(bounded_map(executor, send_record, data, args.workers * 4))
+        else:
+            results = [send_record(item) for item in data]
+
+    if skipped:
+        logger.info(f"Skipped {skipped} recipients already sent according to the journal")
+    success_count = sum(results)
+    logger.info(f"Sent {success_count}/{len(results)} emails successfully")
+    return 0 if success_count == len(results) else 1
+
+
+def open_queue(args: argparse.Namespace) -> "SendQueue":
+    """Open the durable send queue, loading sqlite3 only for runs that use one."""
+    from swecc_email_sender.core.send_queue import (
+        DEFAULT_REDELIVERY_BACKOFF,
+        DEFAULT_REDELIVERY_CAP,
+        SendQueue,
+    )
+
+    redelivery_policy = RetryPolicy(
+        max_attempts=args.max_deliveries,
+        backoff_base=DEFAULT_REDELIVERY_BACKOFF,
+        backoff_cap=DEFAULT_REDELIVERY_CAP,
+    )
+    return SendQueue(args.queue, redelivery_policy, args.visibility_timeout)
+
+
+def drain_queue(
+    queue: "SendQueue",
+    sender: EmailSender,
+    args: argparse.Namespace,
+    dead_before: int,
+    follow: bool = False,
+    stop: Optional[threading.Event] = None,
+) -> int:
+    """Send queued emails until the queue is drained or stopped and report the outcome."""
+    from swecc_email_sender.core.send_queue import QueueWorker
+
+    worker = QueueWorker(
+        queue,
+        sender,
+        threads=args.workers,
+        claim_size=args.claim_size,
+        batch=args.batch,
+        server_side=args.server_side,
+    )
+    worker.run(follow, stop)
+    counts = queue.counts()
+    logger.info(
+        f"Sent {worker.sent} queued emails successfully; {counts['pending']} still queued, "
+        f"{counts['dead']} dead-lettered"
+    )
+    return 0 if counts["dead"] == dead_before and not counts["pending"] else 1
+
+
+def open_journal(path: str) -> "SendJournal":
+    """Open the send journal, loading sqlite3 only for runs that use one."""
+    from swecc_email_sender.core.journal import SendJournal
+
+    return SendJournal(path)
+
+
+def write_metrics(metrics: SenderMetrics, path: str) -> None:
+    """Log a per-stage timing summary and write the metrics in Prometheus format."""
+    snapshot = metrics.snapshot()
+    for stage, summary in snapshot["stages"].items():
+        if summary["count"]:
+            logger.info(
+                f"{stage}: {summary['count']} x {summary['mean'] * 1000:.3f} ms mean, "
+                f"{summary['sum']:.3f} s total"
+            )
+    try:
+        with open(path, "w") as f:
+            f.write(metrics.to_prometheus())
+    except OSError as e:
+        logger.error(f"Could not write metrics to {path}: {e!s}")
+
+
+def configure_logging(verbose: bool) -> None:
+    """Set up logging to stderr, at debug level if requested."""
+    # Configured here rather than at import, so importing the module has no side effects
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+    # Configure logging based on verbose flag
+    if verbose:
+        logging.getLogger().setLevel(logging.DEBUG)
+        logger.debug("Verbose logging enabled")
+        logger.debug(f"Current environment variables: {list(os.environ.keys())}")
+
+
 def main(argv: Optional[Sequence[str]] = None) -> int:
     """
     Main entry point for the email sender CLI.
@@ -71,17 +599,182 @@ def main(argv: Optional[Sequence[str]] = None) -> int:
     Returns:
         Exit code (0 for success, non-zero for failure)
     """
+    argv = sys.argv[1:] if argv is None else argv
+    commands = {
+        SERVE_COMMAND: (create_serve_parser, serve),
+        WORKER_COMMAND: (create_worker_parser, work),
+    }
+    if argv and argv[0] in commands:
+        create_command_parser, command = commands[argv[0]]
+        command_parser = create_command_parser()
+        command_args = command_parser.parse_args(argv[1:])
+        if argv[0] == WORKER_COMMAND and command_args.server_side and not command_args.batch:
+            command_parser.error("--server-side requires --batch")
+        configure_logging(command_args.verbose)
+        return command(command_args)
+
     parser = create_parser()
     args = parser.parse_args(argv)
+    if args.queue and (not args.src or args.resume or args.processes > 1):
+        parser.error("--queue requires --src and cannot be combined with --resume or --processes")
+    # Reject options that would otherwise be silently ignored
+    if args.to:
+        src_options = {
+            "--batch": args.batch,
+            "--workers": args.workers > 1,
+            "--resume": bool(args.resume),
+            "--compact": args.compact,
+            "--processes": args.processes > 1,
+        }
+        used = [option for option, is_set in src_options.items() if is_set]
+        if used:
+            parser.error(f"{', '.join(used)} cannot be used with --to, only with --src")
+    if args.server_side and not args.batch:
+        parser.error("--server-side requires --batch")
+    if args.render_once and not args.markdown:
+        parser.error("--render-once requires --markdown")
+    if args.render_once and args.batch and not args.server_side:
+        parser.error("--render-once has no effect with --batch, which renders each body once")
+    if args.workers > 1 and args.batch and args.processes == 1 and not args.queue:
+        parser.error(
+            "--workers has no effect with --batch; use --processes to send batches concurrently"
+        )
+    configure_logging(args.verbose)
 
-    # Configure logging based on verbose flag
-    if args.verbose:
-        logging.getLogger().setLevel(logging.DEBUG)
-        logger.debug("Verbose logging enabled")
-        logger.debug(f"Current environment variables: {list(os.environ.keys())}")
+    if args.profile:
+        from swecc_email_sender.utils.profiling import profile_call
+
+        return profile_call(lambda: run(args), args.profile)
+    return run(args)
+
+
+def create_sender(args: argparse.Namespace, metrics: Optional[SenderMetrics]) -> EmailSender:
+    """Sender configured by the connection and delivery options of a command."""
+    return EmailSender(
+        args.api_key,
+        pool_size=max(args.workers, DEFAULT_POOL_SIZE),
+        rate_limiter=RateLimiter(args.rate, args.burst) if args.rate else None,
+        retry_policy=RetryPolicy(max_attempts=args.max_attempts, retry_budget=args.retry_budget),
+        precompile_markdown=args.render_once,
+        api_url=args.api_url,
+        metrics=metrics,
+    )
+
+
+def work(args: argparse.Namespace) -> int:
+    """
+    Send the emails of a durable queue until it is drained, or until stopped with --follow.
+
+    Args:
+        args: Parsed worker command arguments
+
+    Returns:
+        Exit code (0 if every email was sent, non-zero if any were dead-lettered,
+        are still queued or the queue could not be opened)
+    """
+    import signal
+
+    stop = threading.Event()
+
+    def request_stop(signum: int, frame: Any) -> None:
+        logger.info("Stopping once the emails being sent are acknowledged")
+        stop.set()
+
+    metrics = SenderMetrics() if args.metrics_out else None
+    sender = create_sender(args, metrics)
+    queue: Optional[SendQueue] = None
+    previous_handlers = {
+        signum: signal.signal(signum, request_stop) for signum in (signal.SIGINT, signal.SIGTERM)
+    }
+    try:
+        queue = open_queue(args)
+        return drain_queue(queue, sender, args, queue.counts()["dead"], args.follow, stop)
+
+    except Exception as e:
+        logger.error(f"Error: {e!s}")
+        return 1
+
+    finally:
+        for signum, handler in previous_handlers.items():
+            signal.signal(signum, handler)
+        sender.close()
+        if queue is not None:
+            queue.close()
+        if metrics is not None:
+            write_metrics(metrics, args.metrics_out)
+
+
+def serve(args: argparse.Namespace) -> int:
+    """
+    Run the send server until interrupted or terminated.
+
+    Args:
+        args: Parsed serve command arguments
 
+    Returns:
+        Exit code (0 after a clean shutdown, non-zero if the server could not start)
+    """
+    import signal
+
+    from swecc_email_sender.core.credentials import default_credential_provider
+    from swecc_email_sender.core.server import SendServer
+
+    # Nobody is there to answer a prompt once the server is running
+    if not args.api_key and not default_credential_provider().get_api_key():
+        logger.error("No SendGrid API key: set SENDGRID_API_KEY or pass --api-key")
+        return 1
+
+    metrics = SenderMetrics()
+    sender = create_sender(args, metrics)
+    address = args.socket or (args.host, args.port)
     try:
-        sender = EmailSender(args.api_key)
+        server = SendServer(
+            sender,
+            address,
+            max_batch=args.max_batch,
+            max_delay=args.max_delay,
+            workers=args.workers,
+            server_side=args.server_side,
+            metrics=metrics,
+            allow_remote=args.allow_remote,
+            max_request_bytes=args.max_request_bytes,
+        )
+    except (OSError, ValueError) as e:
+        logger.error(f"Could not serve on {address}: {e!s}")
+        sender.close()
+        return 1
+
+    def terminate(signum: int, frame: Any) -> None:
+        raise KeyboardInterrupt
+
+    previous_handler = signal.signal(signal.SIGTERM, terminate)
+    try:
+        with server:
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                logger.info("Shutting down after sending queued jobs")
+    finally:
+        signal.signal(signal.SIGTERM, previous_handler)
+    return 0
+
+
+def run(args: argparse.Namespace) -> int:
+    """
+    Send, preview or validate emails as requested by parsed CLI arguments.
+
+    Args:
+        args: Parsed command line arguments
+
+    Returns:
+        Exit code (0 for success, non-zero for failure)
+    """
+    sender: Optional[EmailSender] = None
+    journal: Optional[SendJournal] = None
+    queue: Optional[SendQueue] = None
+    metrics = SenderMetrics() if args.metrics_out else None
+    try:
+        sender = create_sender(args, metrics)
         content = DataLoader.load_template(args.template) if args.template else args.content
 
         if args.to:
@@ -90,65 +783,64 @@ def main(argv: Optional[Sequence[str]] = None) -> int:
             )
             return 0 if success else 1
 
-        data = DataLoader.load_data(args.src)
-
-        if args.preview and data:
-            print("\nPreview of first email:")
-            print("-" * 40)
-            preview_content = sender.format_with_fallback(content, data[0])
-            if args.markdown:
-                print("Markdown content:")
-                print(preview_content)
-                print("\nConverted HTML:")
-                print(convert_markdown_to_html(preview_content))
-            else:
-                print(preview_content)
-            return 0
+        data: Iterable[Mapping[str, str]]
+        if args.compact:
+            data = DataLoader.load_table(args.src)
+        else:
+            data = DataLoader.iter_data(args.src)
+
+        if args.preview:
+            first = next(iter(data), None)
+            return preview_email(sender, args, content, first) if first is not None else 0
 
         if args.validate:
-            logger.info("Validating templates...")
-            has_errors = False
-            for item in data:
-                missing_keys = sender.validate_template_keys(content, item)
-                if missing_keys:
-                    has_errors = True
-                    logger.error(
-                        f"Missing keys for {item.get('to_email', 'unknown')}: "
-                        f"{', '.join(missing_keys)}"
-                    )
-                if args.subject:
-                    missing_subject_keys = sender.validate_template_keys(args.subject, item)
-                    if missing_subject_keys:
-                        has_errors = True
-                        logger.error(
-                            f"Missing subject keys for {item.get('to_email', 'unknown')}: "
-                            f"{', '.join(missing_subject_keys)}"
-                        )
-            return 1 if has_errors else 0
-
-        success_count = 0
-        for item in data:
-            if "to_email" not in item:
-                logger.warning("Skipping record: missing to_email field")
-                continue
+            return validate_templates(args, content, data)
 
-            if sender.send_email(
-                item["to_email"],
+        if args.queue:
+            queue = open_queue(args)
+            dead_before = queue.counts()["dead"]
+            queued = queue.enqueue(
+                data,
                 args.subject,
                 content,
                 args.from_email,
                 args.markdown,
-                template_data=item,
-            ):
-                success_count += 1
+                job_key=os.path.abspath(args.src),
+            )
+            logger.info(f"Queued {queued} emails in {args.queue}")
+            return drain_queue(queue, sender, args, dead_before)
 
-        logger.info(f"Sent {success_count}/{len(data)} emails successfully")
-        return 0 if success_count == len(data) else 1
+        if args.resume:
+            journal = open_journal(args.resume)
+
+        sharded = None
+        if args.processes > 1:
+            sharded = ShardedSender(
+                args.processes,
+                args.api_key,
+                threads=args.workers,
+                rate_limiter=sender.rate_limiter,
+                retry_policy=sender.retry_policy,
+                precompile_markdown=args.render_once,
+                api_url=args.api_url,
+                metrics=metrics,
+            )
+        return send_all(sender, args, content, data, journal, sharded)
 
     except Exception as e:
         logger.error(f"Error: {e!s}")
         return 1
 
+    finally:
+        if sender is not None:
+            sender.close()
+        if journal is not None:
+            journal.close()
+        if queue is not None:
+            queue.close()
+        if metrics is not None:
+            write_metrics(metrics, args.metrics_out)
+
 
 if __name__ == "__main__":
     sys.exit(main())
@@ -2,7 +2,57 @@
 Core functionality.
 """
 
-from swecc_email_sender.core.loader import DataLoader
-from swecc_email_sender.core.sender import EmailSender
+from typing import TYPE_CHECKING
 
-__all__ = ["DataLoader", "EmailSender"]
+from swecc_email_sender.utils.lazy import lazy_exports
+
+if TYPE_CHECKING:
+    from swecc_email_sender.core.async_sender import AsyncEmailSender
+    from swecc_email_sender.core.credentials import (
+        ChainCredentialProvider,
+        ConfigFileCredentialProvider,
+        CredentialProvider,
+        EnvCredentialProvider,
+    )
+    from swecc_email_sender.core.loader import DataLoader
+    from swecc_email_sender.core.metrics import SenderMetrics
+    from swecc_email_sender.core.ratelimit import RateLimiter
+    from swecc_email_sender.core.retry import RetryPolicy
+    from swecc_email_sender.core.send_queue import QueueWorker, SendQueue
+    from swecc_email_sender.core.sender import EmailSender
+    from swecc_email_sender.core.sharded import ShardedSender
+
+__all__ = [
+    "AsyncEmailSender",
+    "ChainCredentialProvider",
+    "ConfigFileCredentialProvider",
+    "CredentialProvider",
+    "DataLoader",
+    "EmailSender",
+    "EnvCredentialProvider",
+    "QueueWorker",
+    "RateLimiter",
+    "RetryPolicy",
+    "SendQueue",
+    "SenderMetrics",
+    "ShardedSender",
+]
+
+__getattr__, __dir__ = lazy_exports(
+    __name__,
+    {
+        "AsyncEmailSender": "swecc_email_sender.core.async_sender",
+        "ChainCredentialProvider": "swecc_email_sender.core.credentials",
+        "ConfigFileCredentialProvider": "swecc_email_sender.core.credentials",
+        "CredentialProvider": "swecc_email_sender.core.credentials",
+        "DataLoader": "swecc_email_sender.core.loader",
+        "EmailSender": "swecc_email_sender.core.sender",
+        "EnvCredentialProvider": "swecc_email_sender.core.credentials",
+        "QueueWorker": "swecc_email_sender.core.send_queue",
+        "RateLimiter": "swecc_email_sender.core.ratelimit",
+        "RetryPolicy": "swecc_email_sender.core.retry",
+        "SendQueue": "swecc_email_sender.core.send_queue",
+        "SenderMetrics": "swecc_email_sender.core.metrics",
+        "ShardedSender": "swecc_email_sender.core.sharded",
+    },
+)
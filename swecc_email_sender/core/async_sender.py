@@ -0,0 +1,428 @@
+"""
+Asyncio email sender using non-blocking keep-alive connections to the SendGrid API.
+"""
+
+import asyncio
+import logging
+import ssl
+import time
+from types import TracebackType
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple, Type
+
+from swecc_email_sender.core.credentials import CredentialProvider
+from swecc_email_sender.core.metrics import (
+    COUNTER_BYTES_OUT,
+    COUNTER_FAILED,
+    COUNTER_REQUESTS,
+    COUNTER_RETRIED,
+    COUNTER_SENT,
+    STAGE_CONNECT,
+    STAGE_RESPONSE,
+    SenderMetrics,
+)
+from swecc_email_sender.core.pool import (
+    DEFAULT_MAX_IDLE_TIME,
+    DEFAULT_POOL_SIZE,
+    DEFAULT_TIMEOUT,
+    SENDGRID_API_URL,
+    SENDGRID_HOST,
+    PoolResponse,
+)
+from swecc_email_sender.core.ratelimit import RateLimiter
+from swecc_email_sender.core.retry import RetryPolicy
+from swecc_email_sender.core.sender import SENDGRID_SUCCESS_STATUS, BaseSender
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 10
+
+_Connection = Tuple[asyncio.StreamReader, asyncio.StreamWriter]
+
+
+class AsyncConnectionPool:
+    """
+    Bounded pool of keep-alive HTTP/1.1 connections built on asyncio streams.
+
+    Mirrors ConnectionPool: idle connections are reused for up to ``max_idle_time``
+    seconds and a request that cannot be written to a reused connection is sent again
+    on a fresh one, but never replayed once written. A pool must only be used from a
+    single event loop.
+    """
+
+    def __init__(
+        self,
+        host: str = SENDGRID_HOST,
+        port: int = 443,
+        use_ssl: bool = True,
+        max_size: int = DEFAULT_POOL_SIZE,
+        max_idle_time: float = DEFAULT_MAX_IDLE_TIME,
+        timeout: float = DEFAULT_TIMEOUT,
+        metrics: Optional[SenderMetrics] = None,
+    ):
+        """Initialize the pool; no connection is opened until first use."""
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.host = host
+        self.port = port
+        self.use_ssl = use_ssl
+        self.max_size = max_size
+        self.max_idle_time = max_idle_time
+        self.timeout = timeout
+        self._metrics = metrics
+        # Loading the CA certificates is slow, so every connection shares one context
+        self._ssl_context = ssl.create_default_context() if use_ssl else None
+        self._idle: List[Tuple[_Connection, float]] = []
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._closed = False
+
+    async def _new_connection(self) -> _Connection:
+        """Open a new connection to the configured host."""
+        if self._metrics is not None:
+            start = time.perf_counter()
+            conn = await self._open_connection()
+            self._metrics.observe(STAGE_CONNECT, time.perf_counter() - start)
+            return conn
+        return await self._open_connection()
+
+    async def _open_connection(self) -> _Connection:
+        """Connect to the configured host, performing the TLS handshake if needed."""
+        if self._ssl_context is not None:
+            return await asyncio.open_connection(
+                self.host, self.port, ssl=self._ssl_context, server_hostname=self.host
+            )
+        return await asyncio.open_connection(self.host, self.port)
+
+    @staticmethod
+    def _close_connection(conn: _Connection) -> None:
+        """Close a connection without waiting for the transport to shut down."""
+        conn[1].close()
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        body: bytes = b"",
+        headers: Optional[Dict[str, str]] = None,
+    ) -> PoolResponse:
+        """
+        Perform a request on a pooled connection and read the full response.
+
+        Args:
+            method: HTTP method
+            url: Request path
+            body: Request body
+            headers: Optional request headers
+
+        Returns:
+            PoolResponse with status, body and headers
+        """
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_size)
+
+        # asyncio.TimeoutError only became the builtin TimeoutError, an OSError that
+        # retry policies treat as transient, in Python 3.11
+        try:
+            async with self._slots:
+                conn, reused = await self._acquire()
+                reusable = False
+                try:
+                    start = time.perf_counter()
+                    try:
+                        await asyncio.wait_for(
+                            self._write_request(conn, method, url, body, headers or {}),
+                            self.timeout,
+                        )
+                    except ConnectionError:
+                        if not reused:
+                            raise
+                        logger.debug(f"Pooled connection to {self.host} went stale, reconnecting")
+                        self._close_connection(conn)
+                        conn = await asyncio.wait_for(self._new_connection(), self.timeout)
+                        start = time.perf_counter()
+                        await asyncio.wait_for(
+                            self._write_request(conn, method, url, body, headers or {}),
+                            self.timeout,
+                        )
+                    # Once written, SendGrid may have accepted the request, so errors
+                    # from here on are left to the caller's retry policy
+                    response, reusable = await asyncio.wait_for(
+                        self._read_response(conn), self.timeout
+                    )
+                    if self._metrics is not None:
+                        self._metrics.observe(STAGE_RESPONSE, time.perf_counter() - start)
+                    return response
+                finally:
+                    if reusable and not self._closed:
+                        self._idle.append((conn, time.monotonic()))
+                    else:
+                        self._close_connection(conn)
+        except asyncio.TimeoutError:
+            raise TimeoutError(
+                f"Request to {self.host} timed out after {self.timeout:g} seconds"
+            ) from None
+
+    async def _acquire(self) -> Tuple[_Connection, bool]:
+        """Take an idle connection if one is fresh enough, otherwise open a new one."""
+        now = time.monotonic()
+        while self._idle:
+            conn, last_used = self._idle.pop()
+            if now - last_used <= self.max_idle_time and not conn[0].at_eof():
+                return conn, True
+            self._close_connection(conn)
+        return await asyncio.wait_for(self._new_connection(), self.timeout), False
+
+    async def _write_request(
+        self,
+        conn: _Connection,
+        method: str,
+        url: str,
+        body: bytes,
+        headers: Dict[str, str],
+    ) -> None:
+        """Write a request to a connection."""
+        writer = conn[1]
+        lines = [
+            f"{method} {url} HTTP/1.1",
+            f"Host: {self.host}",
+            f"Content-Length: {len(body)}",
+            *(f"{name}: {value}" for name, value in headers.items()),
+        ]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    async def _read_response(self, conn: _Connection) -> Tuple[PoolResponse, bool]:
+        """Read a response, returning it and whether to keep the socket."""
+        reader = conn[0]
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Connection closed before response")
+        status = int(status_line.split()[1])
+
+        response_headers: Dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            response_headers[name.strip()] = value.strip()
+
+        lowered = {name.lower(): value for name, value in response_headers.items()}
+        keep_alive = lowered.get("connection", "").lower() != "close"
+        if lowered.get("transfer-encoding", "").lower() == "chunked":
+            data = await self._read_chunked(reader)
+        elif "content-length" in lowered:
+            data = await reader.readexactly(int(lowered["content-length"]))
+        else:
+            data = await reader.read()
+            keep_alive = False
+
+        return PoolResponse(status, data, response_headers), keep_alive
+
+    @staticmethod
+    async def _read_chunked(reader: asyncio.StreamReader) -> bytes:
+        """Read a body sent with chunked transfer encoding."""
+        chunks: List[bytes] = []
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            if size == 0:
+                # Skip optional trailers up to the terminating blank line
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                return b"".join(chunks)
+            chunks.append(await reader.readexactly(size))
+            await reader.readline()
+
+    async def close(self) -> None:
+        """Close all idle connections and refuse further requests."""
+        self._closed = True
+        idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._close_connection(conn)
+
+
+class AsyncEmailSender(BaseSender):
+    """Asyncio counterpart of EmailSender for use inside an event loop."""
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        max_idle_time: float = DEFAULT_MAX_IDLE_TIME,
+        rate_limiter: Optional[RateLimiter] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        precompile_markdown: bool = False,
+        api_url: str = SENDGRID_API_URL,
+        metrics: Optional[SenderMetrics] = None,
+        credential_provider: Optional[CredentialProvider] = None,
+    ):
+        """
+        Initialize AsyncEmailSender with optional API key.
+
+        Args:
+            api_key: SendGrid API key (loaded from env or config file if omitted)
+            pool_size: Maximum number of keep-alive connections to SendGrid
+            max_idle_time: Seconds an idle connection may be kept before reconnecting
+            rate_limiter: Optional limiter shared with other senders using the same key
+            retry_policy: Optional policy for retrying transient failures
+            precompile_markdown: Convert Markdown templates to HTML once per template
+            api_url: SendGrid API base URL, e.g. to target a local test server
+            metrics: Optional collector for per-stage timings and send counters
+            credential_provider: Source of the API key when none is given (defaults
+                to the environment, then the config file, cached process-wide)
+        """
+        super().__init__(
+            api_key,
+            rate_limiter,
+            retry_policy,
+            precompile_markdown,
+            api_url,
+            metrics,
+            credential_provider,
+        )
+        self._pool = AsyncConnectionPool(
+            self.endpoint.host,
+            self.endpoint.port,
+            use_ssl=self.endpoint.secure,
+            max_size=pool_size,
+            max_idle_time=max_idle_time,
+            metrics=metrics,
+        )
+
+    async def close(self) -> None:
+        """Close all pooled connections."""
+        await self._pool.close()
+
+    async def __aenter__(self) -> "AsyncEmailSender":
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        await self.close()
+
+    async def send_email(
+        self,
+        to_email: str,
+        subject: str,
+        content: str,
+        from_email: str,
+        is_markdown: bool = False,
+        template_data: Optional[Mapping[str, str]] = None,
+    ) -> bool:
+        """
+        Send a single email using SendGrid's API.
+
+        Args:
+            to_email: Recipient email address
+            subject: Email subject
+            content: Email body content (can include format specifiers)
+            from_email: Sender email address
+            is_markdown: Whether the content is Markdown
+            template_data: Dictionary of values to format the content with
+
+        Returns:
+            bool: True if email was sent successfully, False otherwise
+        """
+        self._ensure_api_key()
+        payload = self._render_payload(
+            to_email, subject, content, from_email, is_markdown, template_data
+        )
+
+        attempt = 1
+        while True:
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire_async()
+
+            self._count(COUNTER_REQUESTS)
+            self._count(COUNTER_BYTES_OUT, len(payload))
+            try:
+                response = await self._pool.request(
+                    "POST", self.mail_send_path, body=payload, headers=self._request_headers()
+                )
+            except Exception as e:
+                delay = self._retry_delay(attempt, error=e)
+                if delay is None:
+                    logger.error(f"Failed to send email to {to_email}: {e!s}")
+                    self._count(COUNTER_FAILED)
+                    return False
+                logger.warning(f"Failed to send email to {to_email}, retrying: {e!s}")
+            else:
+                if self.rate_limiter is not None:
+                    self.rate_limiter.update(response.status, response.headers)
+
+                if response.status == SENDGRID_SUCCESS_STATUS:
+                    logger.info(f"Email sent successfully to {to_email}")
+                    self._count(COUNTER_SENT)
+                    return True
+
+                error_msg = response.body.decode()
+                delay = self._retry_delay(attempt, response=response)
+                if delay is None:
+                    logger.error(f"SendGrid API error (status {response.status}): {error_msg}")
+                    self._count(COUNTER_FAILED)
+                    return False
+                logger.warning(
+                    f"SendGrid API error (status {response.status}), retrying {to_email}"
+                )
+
+            self._count(COUNTER_RETRIED)
+            attempt += 1
+            if delay > 0:
+                # Only this send waits; other in-flight sends keep running
+                await asyncio.sleep(delay)
+
+    async def send_many(
+        self,
+        records: Iterable[Mapping[str, str]],
+        subject: str,
+        content: str,
+        from_email: str,
+        is_markdown: bool = False,
+        concurrency: int = DEFAULT_CONCURRENCY,
+    ) -> List[bool]:
+        """
+        Send a templated email to every record with at most ``concurrency`` in flight.
+
+        Args:
+            records: Template data for each recipient; each must contain ``to_email``
+            subject: Email subject (can include format specifiers)
+            content: Email body content (can include format specifiers)
+            from_email: Sender email address
+            is_markdown: Whether the content is Markdown
+            concurrency: Maximum number of concurrent requests
+
+        Returns:
+            List of booleans, one per record, True if that recipient's email was accepted
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        if self.retry_policy is not None:
+            self.retry_policy.reset_budget()
+
+        results: List[bool] = []
+        pending = iter(enumerate(records))
+
+        async def worker() -> None:
+            # Workers share one iterator; the slot is appended before awaiting so that
+            # results stay aligned with record order.
+            for index, record in pending:
+                results.append(False)
+                if "to_email" not in record:
+                    logger.warning("Skipping record: missing to_email field")
+                    continue
+                results[index] = await self.send_email(
+                    record["to_email"],
+                    subject,
+                    content,
+                    from_email,
+                    is_markdown,
+                    template_data=record,
+                )
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return results
@@ -0,0 +1,151 @@
+"""
+SendGrid API key resolution with a process-wide cache.
+"""
+
+import functools
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Optional, Tuple, Union
+
+API_KEY_ENV_VAR = "SENDGRID_API_KEY"
+CONFIG_DIR = Path.home() / ".config" / "swecc-email-sender"
+CONFIG_FILE = CONFIG_DIR / "email_sender_config.json"
+# Seconds between checks of the config file for a rotated key
+DEFAULT_CHECK_INTERVAL = 1.0
+
+
+class CredentialProvider(ABC):
+    """Source of the SendGrid API key used by senders created without one."""
+
+    @abstractmethod
+    def get_api_key(self) -> Optional[str]:
+        """
+        Current API key.
+
+        Called before every request, so implementations should be cheap and cache
+        whatever they read.
+
+        Returns:
+            The API key, or None if this provider has none
+        """
+
+    def invalidate(self) -> None:  # noqa: B027 - optional for providers without a cache
+        """Forget any cached key so that the next lookup reads it afresh."""
+
+
+class EnvCredentialProvider(CredentialProvider):
+    """Reads the API key from an environment variable."""
+
+    def __init__(self, variable: str = API_KEY_ENV_VAR):
+        """
+        Initialize the provider.
+
+        Args:
+            variable: Name of the environment variable holding the key
+        """
+        self.variable = variable
+
+    def get_api_key(self) -> Optional[str]:
+        return os.getenv(self.variable) or None
+
+
+class ConfigFileCredentialProvider(CredentialProvider):
+    """
+    Reads the API key from the JSON config file written by ``save_api_key``.
+
+    The parsed key is cached and the file is only read again once its modification
+    time or size changes, so a long-running process picks up a rotated key without
+    reparsing the file for every request. The file is stat'ed at most once every
+    ``check_interval`` seconds.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path] = CONFIG_FILE,
+        check_interval: float = DEFAULT_CHECK_INTERVAL,
+    ):
+        """
+        Initialize the provider.
+
+        Args:
+            path: Config file holding a ``SENDGRID_API_KEY`` entry
+            check_interval: Seconds a cached key is used before checking the file again
+        """
+        self.path = Path(path)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._api_key: Optional[str] = None
+        # Modification time and size of the file the cached key was read from
+        self._signature: Optional[Tuple[int, int]] = None
+        self._checked: Optional[float] = None
+
+    def get_api_key(self) -> Optional[str]:
+        with self._lock:
+            now = time.monotonic()
+            if self._checked is not None and now - self._checked < self.check_interval:
+                return self._api_key
+            self._checked = now
+
+            try:
+                stat = self.path.stat()
+            except OSError:
+                self._api_key = self._signature = None
+                return None
+            signature = (stat.st_mtime_ns, stat.st_size)
+            if signature != self._signature:
+                self._api_key = self._read()
+                self._signature = signature
+            return self._api_key
+
+    def _read(self) -> Optional[str]:
+        """Parse the key from the config file."""
+        import json
+
+        try:
+            config = json.loads(self.path.read_text())
+        except (json.JSONDecodeError, OSError):
+            return None
+        api_key = config.get(API_KEY_ENV_VAR) if isinstance(config, dict) else None
+        return api_key if isinstance(api_key, str) and api_key else None
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._api_key = self._signature = self._checked = None
+
+
+class ChainCredentialProvider(CredentialProvider):
+    """Returns the key of the first provider that has one."""
+
+    def __init__(self, *providers: CredentialProvider):
+        """
+        Initialize the provider.
+
+        Args:
+            providers: Providers to consult, in order of precedence
+        """
+        self.providers = providers
+
+    def get_api_key(self) -> Optional[str]:
+        for provider in self.providers:
+            if api_key := provider.get_api_key():
+                return api_key
+        return None
+
+    def invalidate(self) -> None:
+        for provider in self.providers:
+            provider.invalidate()
+
+
+@functools.lru_cache(maxsize=None)
+def default_credential_provider() -> CredentialProvider:
+    """
+    Provider shared by every sender in the process that was not given one.
+
+    Returns:
+        Provider reading the ``SENDGRID_API_KEY`` environment variable, then the
+        config file
+    """
+    return ChainCredentialProvider(EnvCredentialProvider(), ConfigFileCredentialProvider())
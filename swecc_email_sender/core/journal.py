@@ -0,0 +1,135 @@
+"""
+Crash-safe journal of per-recipient send outcomes for resuming batch runs.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from types import TracebackType
+from typing import Any, Mapping, Optional, Set, Type, Union
+
+DEFAULT_COMMIT_INTERVAL = 100
+DEFAULT_COMMIT_SECONDS = 1.0
+
+STATUS_SENT = "sent"
+STATUS_FAILED = "failed"
+
+
+def record_hash(record: Mapping[str, Any]) -> bytes:
+    """Stable digest identifying a recipient record regardless of key order."""
+    canonical = json.dumps(dict(record), sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(canonical.encode(), digest_size=16).digest()
+
+
+class SendJournal:
+    """
+    Append-only record of which recipients of a batch have already been emailed.
+
+    Outcomes are stored in a SQLite database in WAL mode. Writes are committed (and
+    fsynced) in groups of ``commit_interval`` outcomes or every ``commit_seconds``,
+    whichever comes first, so at most one group can be lost in a crash. The hashes of
+    completed records are held in memory for O(1) lookups when resuming.
+
+    Use a separate journal for each campaign: records are identified by their data
+    alone, not by the template they were sent with.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        commit_interval: int = DEFAULT_COMMIT_INTERVAL,
+        commit_seconds: float = DEFAULT_COMMIT_SECONDS,
+    ):
+        """Open or create a journal database."""
+        self.path = Path(path)
+        self.commit_interval = commit_interval
+        self.commit_seconds = commit_seconds
+        self._lock = threading.Lock()
+        self._uncommitted = 0
+        self._last_commit = time.monotonic()
+
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS outcomes (
+                record_hash BLOB PRIMARY KEY,
+                to_email TEXT,
+                status TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )"""
+        )
+        self._conn.commit()
+        self._completed: Set[bytes] = {
+            row[0]
+            for row in self._conn.execute(
+                "SELECT record_hash FROM outcomes WHERE status = ?", (STATUS_SENT,)
+            )
+        }
+
+    def __len__(self) -> int:
+        """Number of records already sent successfully."""
+        return len(self._completed)
+
+    def is_completed(self, record: Mapping[str, Any]) -> bool:
+        """Whether the record was already sent successfully."""
+        return record_hash(record) in self._completed
+
+    def record(self, record: Mapping[str, Any], success: bool) -> None:
+        """
+        Record the outcome of sending to a recipient.
+
+        Args:
+            record: The recipient record that was sent
+            success: Whether SendGrid accepted the email
+        """
+        digest = record_hash(record)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO outcomes VALUES (?, ?, ?, ?)",
+                (
+                    digest,
+                    record.get("to_email"),
+                    STATUS_SENT if success else STATUS_FAILED,
+                    time.time(),
+                ),
+            )
+            if success:
+                self._completed.add(digest)
+            self._uncommitted += 1
+            if (
+                self._uncommitted >= self.commit_interval
+                or time.monotonic() - self._last_commit >= self.commit_seconds
+            ):
+                self._commit()
+
+    def _commit(self) -> None:
+        """Commit pending outcomes; the caller must hold the lock."""
+        self._conn.commit()
+        self._uncommitted = 0
+        self._last_commit = time.monotonic()
+
+    def flush(self) -> None:
+        """Durably write all recorded outcomes."""
+        with self._lock:
+            self._commit()
+
+    def close(self) -> None:
+        """Flush outstanding outcomes and close the database."""
+        with self._lock:
+            self._commit()
+            self._conn.close()
+
+    def __enter__(self) -> "SendJournal":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
@@ -2,10 +2,17 @@
 Data loading module for handling email templates and recipient data.
 """
 
-import csv
-import json
 from pathlib import Path
-from typing import Dict, List, Union
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+from swecc_email_sender.core.recipients import RecipientTable
+
+# The csv and json modules are imported by the methods that need them, so that
+# commands which never read a data file do not load them
+
+# Characters read at a time when streaming JSON records
+JSON_READ_SIZE = 64 * 1024
+_JSON_WHITESPACE = " \t\n\r"
 
 
 class DataLoader:
@@ -22,6 +29,52 @@ class DataLoader:
         Returns:
             List of dictionaries containing email data
 
+        Raises:
+            FileNotFoundError: If the file doesn't exist
+            ValueError: If the file format is not supported
+        """
+        return list(DataLoader.iter_data(filepath))
+
+    @staticmethod
+    def load_table(filepath: Union[str, Path]) -> RecipientTable:
+        """
+        Load data from either CSV or JSON file into a compact columnar table.
+
+        Records are streamed from the file, so only the table itself is held in
+        memory. Rows of the table can be used wherever a record dictionary is accepted.
+
+        Args:
+            filepath: Path to the data file (CSV or JSON)
+
+        Returns:
+            RecipientTable containing email data
+
+        Raises:
+            FileNotFoundError: If the file doesn't exist
+            ValueError: If the file format is not supported
+        """
+        filepath = Path(filepath)
+        if filepath.suffix == ".csv" and filepath.exists():
+            import csv
+
+            with filepath.open("r") as f:
+                reader = csv.reader(f)
+                header = next(reader, [])
+                return RecipientTable.from_rows([column.strip() for column in header], reader)
+        return RecipientTable.from_records(DataLoader.iter_data(filepath))
+
+    @staticmethod
+    def read_columns(filepath: Union[str, Path]) -> Optional[List[str]]:
+        """
+        Read the column names from a CSV file's header.
+
+        Args:
+            filepath: Path to the data file (CSV or JSON)
+
+        Returns:
+            Column names with surrounding whitespace stripped, or None for JSON files,
+            whose records need not share the same keys
+
         Raises:
             FileNotFoundError: If the file doesn't exist
             ValueError: If the file format is not supported
@@ -31,19 +84,137 @@ class DataLoader:
         if not filepath.exists():
             raise FileNotFoundError(f"File not found: {filepath}")
 
-        result: List[Dict[str, str]] = []
-
         if filepath.suffix == ".json":
+            return None
+        if filepath.suffix == ".csv":
+            import csv
+
             with filepath.open("r") as f:
-                result = json.load(f)
-        elif filepath.suffix == ".csv":
+                return [column.strip() for column in next(csv.reader(f), [])]
+        raise ValueError("Unsupported file format. Use .json or .csv")
+
+    @staticmethod
+    def count_rows(filepath: Union[str, Path]) -> int:
+        """
+        Count the records in a data file without building them.
+
+        Args:
+            filepath: Path to the data file (CSV or JSON)
+
+        Returns:
+            Number of records
+
+        Raises:
+            FileNotFoundError: If the file doesn't exist
+            ValueError: If the file format is not supported
+        """
+        filepath = Path(filepath)
+        if filepath.suffix == ".csv" and filepath.exists():
+            import csv
+
             with filepath.open("r") as f:
-                reader = csv.DictReader(f)
-                result = [{k.strip(): str(v).strip() for k, v in row.items()} for row in reader]
-        else:
-            raise ValueError("Unsupported file format. Use .json or .csv")
+                reader = csv.reader(f)
+                next(reader, None)
+                # DictReader skips blank lines, so they are not records
+                return sum(1 for row in reader if row)
+        return sum(1 for _ in DataLoader.iter_data(filepath))
 
-        return result
+    @staticmethod
+    def iter_data(filepath: Union[str, Path]) -> Iterator[Dict[str, str]]:
+        """
+        Lazily yield records from either CSV or JSON file.
+
+        CSV files are read row by row and JSON arrays are parsed incrementally, so
+        memory use does not grow with the size of the file.
+
+        Args:
+            filepath: Path to the data file (CSV or JSON)
+
+        Returns:
+            Iterator over dictionaries containing email data
+
+        Raises:
+            FileNotFoundError: If the file doesn't exist
+            ValueError: If the file format is not supported
+        """
+        filepath = Path(filepath)
+
+        if not filepath.exists():
+            raise FileNotFoundError(f"File not found: {filepath}")
+
+        if filepath.suffix == ".json":
+            return DataLoader._iter_json(filepath)
+        if filepath.suffix == ".csv":
+            return DataLoader._iter_csv(filepath)
+        raise ValueError("Unsupported file format. Use .json or .csv")
+
+    @staticmethod
+    def _iter_csv(filepath: Path) -> Iterator[Dict[str, str]]:
+        """Yield CSV rows with surrounding whitespace stripped from keys and values."""
+        import csv
+
+        with filepath.open("r") as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield {k.strip(): str(v).strip() for k, v in row.items()}
+
+    @staticmethod
+    def _iter_json(filepath: Path) -> Iterator[Any]:
+        """Yield the elements of a top-level JSON array one at a time."""
+        import json
+
+        decoder = json.JSONDecoder()
+        with filepath.open("r") as f:
+            buffer = ""
+            pos = 0
+            eof = False
+
+            def skip_whitespace() -> bool:
+                """Advance past whitespace, reading more input as needed; False at EOF."""
+                nonlocal buffer, pos, eof
+                while True:
+                    while pos < len(buffer) and buffer[pos] in _JSON_WHITESPACE:
+                        pos += 1
+                    if pos < len(buffer):
+                        return True
+                    if eof:
+                        return False
+                    chunk = f.read(JSON_READ_SIZE)
+                    eof = not chunk
+                    buffer, pos = buffer[pos:] + chunk, 0
+
+            if not skip_whitespace() or buffer[pos] != "[":
+                raise ValueError("JSON data file must contain an array of records")
+            pos += 1
+
+            expect_value = True
+            while skip_whitespace():
+                if buffer[pos] == "]":
+                    return
+                if not expect_value:
+                    if buffer[pos] != ",":
+                        raise ValueError(f"Invalid JSON in {filepath}: expected ',' or ']'")
+                    pos += 1
+                    skip_whitespace()
+
+                # Decode the next element, reading more input while it is incomplete
+                while True:
+                    try:
+                        record, end = decoder.raw_decode(buffer, pos)
+                        if end < len(buffer) or eof:
+                            break
+                    except json.JSONDecodeError:
+                        if eof:
+                            raise
+                    chunk = f.read(JSON_READ_SIZE)
+                    eof = not chunk
+                    buffer, pos = buffer[pos:] + chunk, 0
+
+                yield record
+                pos = end
+                expect_value = False
+
+            raise ValueError(f"Invalid JSON in {filepath}: unterminated array")
 
     @staticmethod
     def load_template(filepath: Union[str, Path]) -> str:
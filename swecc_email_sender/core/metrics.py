@@ -0,0 +1,227 @@
+"""
+Opt-in per-stage timing and counters for email senders.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, ContextManager, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Stages of sending an email, in the order they happen
+STAGE_RENDER = "render"
+STAGE_MARKDOWN = "markdown"
+STAGE_SERIALIZE = "serialize"
+STAGE_CONNECT = "connect"
+STAGE_RESPONSE = "response"
+STAGES = (STAGE_RENDER, STAGE_MARKDOWN, STAGE_SERIALIZE, STAGE_CONNECT, STAGE_RESPONSE)
+
+COUNTER_SENT = "sent"
+COUNTER_FAILED = "failed"
+COUNTER_RETRIED = "retried"
+COUNTER_REQUESTS = "requests"
+COUNTER_BYTES_OUT = "bytes_out"
+COUNTERS = (COUNTER_SENT, COUNTER_FAILED, COUNTER_RETRIED, COUNTER_REQUESTS, COUNTER_BYTES_OUT)
+
+# Upper bounds in seconds, from in-process rendering up to slow network round trips
+DEFAULT_BUCKETS = (
+    0.00001,
+    0.0001,
+    0.0005,
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+COUNTER_HELP = {
+    COUNTER_SENT: "Recipients whose email SendGrid accepted",
+    COUNTER_FAILED: "Recipients whose email could not be sent",
+    COUNTER_RETRIED: "Requests retried after a transient failure",
+    COUNTER_REQUESTS: "HTTP requests made to SendGrid, including retries",
+    COUNTER_BYTES_OUT: "Request body bytes sent to SendGrid",
+}
+
+
+class Histogram:
+    """Cumulative histogram of durations with fixed bucket bounds."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """Create an empty histogram."""
+        self.bounds: Tuple[float, ...] = tuple(sorted(buckets))
+        # One count per bound plus an overflow bucket for +Inf
+        self.counts: List[int] = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        """Record a single duration in seconds."""
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def merge(self, other: "Histogram") -> None:
+        """Add the durations recorded by another histogram with the same bounds."""
+        if other.bounds != self.bounds:
+            raise ValueError("cannot merge histograms with different buckets")
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    def quantile(self, fraction: float) -> float:
+        """Estimate a quantile as the upper bound of the bucket containing it."""
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Summary statistics of the recorded durations."""
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+        }
+
+
+class SenderMetrics:
+    """
+    Thread-safe collection of stage durations and send counters.
+
+    Pass an instance to a sender to enable instrumentation; senders created without
+    one skip all timing. A single instance may be shared by several senders.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """Create empty histograms for every stage and zeroed counters."""
+        self.buckets = tuple(buckets)
+        self.histograms: Dict[str, Histogram] = {stage: Histogram(buckets) for stage in STAGES}
+        self.counters: Dict[str, int] = dict.fromkeys(COUNTERS, 0)
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Metrics are sent between processes by ShardedSender; locks cannot be pickled
+        with self._lock:
+            state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float) -> None:
+        """Record how long a stage took."""
+        with self._lock:
+            self.histograms[stage].observe(seconds)
+
+    @contextmanager
+    def time(self, stage: str) -> Iterator[None]:
+        """Context manager recording the duration of its body for a stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def increment(self, counter: str, amount: int = 1) -> None:
+        """Add to a counter."""
+        with self._lock:
+            self.counters[counter] += amount
+
+    def merge(self, other: "SenderMetrics") -> None:
+        """Add the durations and counts collected by another instance."""
+        with self._lock:
+            for stage, histogram in other.histograms.items():
+                if stage in self.histograms:
+                    self.histograms[stage].merge(histogram)
+                else:
+                    self.histograms[stage] = histogram
+            for counter, value in other.counters.items():
+                self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def drain(self) -> "SenderMetrics":
+        """
+        Move everything collected so far into a new instance and start again from zero.
+
+        Returns:
+            The metrics collected before the call
+        """
+        drained = SenderMetrics(self.buckets)
+        with self._lock:
+            drained.histograms, self.histograms = self.histograms, drained.histograms
+            drained.counters, self.counters = self.counters, drained.counters
+        return drained
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Copy of the current metrics.
+
+        Returns:
+            Dictionary with ``counters`` and per-stage ``stages`` summaries
+        """
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "stages": {
+                    stage: histogram.snapshot() for stage, histogram in self.histograms.items()
+                },
+            }
+
+    def to_prometheus(self, prefix: str = "swecc_email") -> str:
+        """
+        Render the metrics in the Prometheus text exposition format.
+
+        Args:
+            prefix: Prefix for every metric name
+
+        Returns:
+            Text suitable for a node_exporter textfile collector or a /metrics endpoint
+        """
+        lines: List[str] = []
+        with self._lock:
+            for counter, value in self.counters.items():
+                name = f"{prefix}_{counter}_total"
+                lines.append(f"# HELP {name} {COUNTER_HELP.get(counter, counter)}")
+                lines.append(f"# TYPE {name} counter")
+                lines.append(f"{name} {value}")
+
+            name = f"{prefix}_stage_duration_seconds"
+            lines.append(f"# HELP {name} Time spent in each stage of sending an email")
+            lines.append(f"# TYPE {name} histogram")
+            for stage, histogram in self.histograms.items():
+                cumulative = 0
+                for bound, count in zip(histogram.bounds, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="{bound:g}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{name}_sum{{stage="{stage}"}} {histogram.sum!r}')
+                lines.append(f'{name}_count{{stage="{stage}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+
+_NO_TIMING: ContextManager[None] = nullcontext()
+
+
+def timed(metrics: Optional[SenderMetrics], stage: str) -> ContextManager[None]:
+    """Time a stage if metrics are enabled, otherwise do nothing."""
+    return _NO_TIMING if metrics is None else metrics.time(stage)
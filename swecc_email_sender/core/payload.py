@@ -0,0 +1,194 @@
+"""
+SendGrid request bodies assembled from pre-serialized JSON fragments.
+"""
+
+from functools import lru_cache
+from json.encoder import encode_basestring_ascii
+from typing import Callable, Iterable, List, Mapping, Tuple
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None  # type: ignore[assignment]
+
+PAYLOAD_BUILDER_CACHE_SIZE = 64
+
+
+def _encode_string_stdlib(value: str) -> bytes:
+    """Encode a string as a JSON string literal, escaping non-ASCII like json.dumps."""
+    return encode_basestring_ascii(value).encode("ascii")
+
+
+def _encode_string_orjson(value: str) -> bytes:
+    """Encode a string as a JSON string literal with orjson, falling back for surrogates."""
+    try:
+        encoded: bytes = orjson.dumps(value)
+        return encoded
+    except orjson.JSONEncodeError:
+        return _encode_string_stdlib(value)
+
+
+encode_string: Callable[[str], bytes] = (
+    _encode_string_orjson if orjson is not None else _encode_string_stdlib
+)
+
+
+class PayloadBuilder:
+    """
+    Serializer for mail/send bodies that share a sender and content type.
+
+    The JSON surrounding the per-recipient fields never changes within a batch, so it
+    is encoded once. Building a body then only encodes the recipient, subject and
+    content strings and joins them with the precomputed fragments. String encoding uses
+    orjson when it is installed (``pip install swecc-email-sender[fast]``); otherwise the
+    C-accelerated stdlib encoder produces exactly what ``json.dumps`` would for the
+    equivalent dict.
+    """
+
+    def __init__(self, from_email: str, content_type: str):
+        """Pre-serialize the fragments around the per-recipient fields."""
+        self.from_email = from_email
+        self.content_type = content_type
+        self._personalizations_start = b'{"personalizations": ['
+        self._to_start = b'{"to": [{"email": '
+        self._to_end = b"}]}"
+        self._substitutions_start = b'}], "substitutions": {'
+        self._personalization_subject = b'}], "subject": '
+        self._from = b'], "from": {"email": ' + encode_string(from_email) + b"}"
+        self._subject_start = self._from + b', "subject": '
+        self._content_start = (
+            b', "content": [{"type": ' + encode_string(content_type) + b', "value": '
+        )
+        self._end = b"}]}"
+
+    def _personalization(self, to_email: str) -> bytes:
+        """Serialized personalization addressed to a single recipient."""
+        return self._to_start + encode_string(to_email) + self._to_end
+
+    def build(self, to_email: str, subject: str, content: str) -> bytes:
+        """
+        Serialize a request addressed to a single recipient.
+
+        Args:
+            to_email: Recipient email address
+            subject: Rendered subject
+            content: Rendered body
+
+        Returns:
+            The JSON request body
+        """
+        return b"".join(
+            (
+                self._personalizations_start,
+                self._to_start,
+                encode_string(to_email),
+                self._to_end,
+                self._subject_start,
+                encode_string(subject),
+                self._content_start,
+                encode_string(content),
+                self._end,
+            )
+        )
+
+    def build_many(self, to_emails: Iterable[str], subject: str, content: str) -> bytes:
+        """
+        Serialize a request with one personalization per recipient.
+
+        Args:
+            to_emails: Recipient email addresses
+            subject: Rendered subject shared by every recipient
+            content: Rendered body shared by every recipient
+
+        Returns:
+            The JSON request body
+        """
+        parts: List[bytes] = [self._personalizations_start]
+        parts.append(b", ".join(self._personalization(email) for email in to_emails))
+        parts.extend(
+            (
+                self._subject_start,
+                encode_string(subject),
+                self._content_start,
+                encode_string(content),
+                self._end,
+            )
+        )
+        return b"".join(parts)
+
+    def build_personalized(
+        self, personalizations: Iterable[Tuple[str, str]], content: str
+    ) -> bytes:
+        """
+        Serialize a request sharing a body, with each recipient's own subject.
+
+        Args:
+            personalizations: Recipient email address and rendered subject for each
+                recipient
+            content: Rendered body shared by every recipient
+
+        Returns:
+            The JSON request body
+        """
+        parts: List[bytes] = [self._personalizations_start]
+        parts.append(
+            b", ".join(
+                self._to_start
+                + encode_string(to_email)
+                + self._personalization_subject
+                + encode_string(subject)
+                + b"}"
+                for to_email, subject in personalizations
+            )
+        )
+        parts.extend((self._from, self._content_start, encode_string(content), self._end))
+        return b"".join(parts)
+
+    def build_substitutions(
+        self,
+        personalizations: Iterable[Tuple[str, Mapping[str, str]]],
+        subject: str,
+        content: str,
+    ) -> bytes:
+        """
+        Serialize a request whose values SendGrid substitutes into the templates.
+
+        Args:
+            personalizations: Recipient email address and substitutions by tag for
+                each recipient
+            subject: Subject containing substitution tags
+            content: Body containing substitution tags
+
+        Returns:
+            The JSON request body
+        """
+        parts: List[bytes] = [self._personalizations_start]
+        for i, (to_email, substitutions) in enumerate(personalizations):
+            if i:
+                parts.append(b", ")
+            parts.append(self._to_start)
+            parts.append(encode_string(to_email))
+            parts.append(self._substitutions_start)
+            parts.append(
+                b", ".join(
+                    encode_string(tag) + b": " + encode_string(value)
+                    for tag, value in substitutions.items()
+                )
+            )
+            parts.append(b"}}")
+        parts.extend(
+            (
+                self._subject_start,
+                encode_string(subject),
+                self._content_start,
+                encode_string(content),
+                self._end,
+            )
+        )
+        return b"".join(parts)
+
+
+@lru_cache(maxsize=PAYLOAD_BUILDER_CACHE_SIZE)
+def payload_builder(from_email: str, content_type: str) -> PayloadBuilder:
+    """Builder for a sender and content type, reused across sends."""
+    return PayloadBuilder(from_email, content_type)
@@ -0,0 +1,192 @@
+"""
+Keep-alive HTTPS connection pool for the SendGrid API.
+"""
+
+import http.client
+import logging
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlsplit
+
+from swecc_email_sender.core.metrics import STAGE_CONNECT, STAGE_RESPONSE, SenderMetrics
+
+logger = logging.getLogger(__name__)
+
+SENDGRID_API_URL = "https://api.sendgrid.com"
+SENDGRID_HOST = "api.sendgrid.com"
+MAIL_SEND_PATH = "/v3/mail/send"
+DEFAULT_POOL_SIZE = 4
+DEFAULT_MAX_IDLE_TIME = 30.0
+DEFAULT_TIMEOUT = 30.0
+
+# Errors raised when writing to a pooled socket the server closed while idle
+STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.BadStatusLine,
+    BrokenPipeError,
+    ConnectionResetError,
+    ConnectionAbortedError,
+)
+
+
+class ApiEndpoint(NamedTuple):
+    """Connection details parsed from an API base URL."""
+
+    host: str
+    port: int
+    secure: bool
+    path_prefix: str
+
+
+def parse_api_url(url: str) -> ApiEndpoint:
+    """
+    Split an API base URL such as ``https://api.sendgrid.com`` into connection details.
+
+    Raises:
+        ValueError: If the URL is not an absolute http(s) URL
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise ValueError(f"Invalid API URL: {url}")
+    secure = parts.scheme == "https"
+    port = parts.port or (443 if secure else 80)
+    return ApiEndpoint(parts.hostname, port, secure, parts.path.rstrip("/"))
+
+
+class PoolResponse(NamedTuple):
+    """Fully read HTTP response returned by the pool."""
+
+    status: int
+    body: bytes
+    headers: Dict[str, str]
+
+
+class ConnectionPool:
+    """
+    Thread-safe, bounded pool of keep-alive HTTP(S) connections to a single host.
+
+    Connections are reused until they have been idle for longer than
+    ``max_idle_time`` seconds. A request that cannot be written to a reused connection
+    because the server dropped the socket is transparently sent again on a fresh one.
+    Once the request has been written it is never replayed, since the server may
+    already have acted on it; a dropped connection then raises, leaving the decision
+    to retry to the caller's retry policy.
+    """
+
+    def __init__(
+        self,
+        host: str = SENDGRID_HOST,
+        max_size: int = DEFAULT_POOL_SIZE,
+        max_idle_time: float = DEFAULT_MAX_IDLE_TIME,
+        timeout: float = DEFAULT_TIMEOUT,
+        port: Optional[int] = None,
+        secure: bool = True,
+        metrics: Optional[SenderMetrics] = None,
+    ):
+        """Initialize the pool; no connection is opened until first use."""
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.host = host
+        self.port = port
+        self.secure = secure
+        self.max_size = max_size
+        self.max_idle_time = max_idle_time
+        self.timeout = timeout
+        self._metrics = metrics
+        self._idle: List[Tuple[http.client.HTTPConnection, float]] = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._closed = False
+
+    def _new_connection(self) -> http.client.HTTPConnection:
+        """Create a connection to the configured host; it connects on first use."""
+        if self.secure:
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def _connect(self, conn: http.client.HTTPConnection) -> None:
+        """Establish a new connection, timing the TCP and TLS handshake when measured."""
+        if self._metrics is not None:
+            with self._metrics.time(STAGE_CONNECT):
+                conn.connect()
+
+    def _acquire(self) -> Tuple[http.client.HTTPConnection, bool]:
+        """Take a connection from the pool, returning it and whether it was reused."""
+        self._slots.acquire()
+        now = time.monotonic()
+        with self._lock:
+            if self._closed:
+                self._slots.release()
+                raise RuntimeError("Connection pool is closed")
+            while self._idle:
+                conn, last_used = self._idle.pop()
+                if now - last_used <= self.max_idle_time:
+                    return conn, True
+                conn.close()
+        return self._new_connection(), False
+
+    def _release(self, conn: http.client.HTTPConnection, reusable: bool) -> None:
+        """Return a connection to the pool, or close it if it cannot be reused."""
+        try:
+            with self._lock:
+                if reusable and not self._closed:
+                    self._idle.append((conn, time.monotonic()))
+                    return
+            conn.close()
+        finally:
+            self._slots.release()
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        body: Optional[bytes] = None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> PoolResponse:
+        """
+        Perform a request on a pooled connection and read the full response.
+
+        Args:
+            method: HTTP method
+            url: Request path
+            body: Optional request body
+            headers: Optional request headers
+
+        Returns:
+            PoolResponse with status, body and headers
+        """
+        conn, reused = self._acquire()
+        reusable = False
+        try:
+            if not reused:
+                self._connect(conn)
+            start = time.perf_counter()
+            try:
+                conn.request(method, url, body=body, headers=headers or {})
+            except STALE_CONNECTION_ERRORS:
+                if not reused:
+                    raise
+                logger.debug(f"Pooled connection to {self.host} went stale, reconnecting")
+                conn.close()
+                conn = self._new_connection()
+                self._connect(conn)
+                start = time.perf_counter()
+                conn.request(method, url, body=body, headers=headers or {})
+
+            response = conn.getresponse()
+            data = response.read()
+            if self._metrics is not None:
+                self._metrics.observe(STAGE_RESPONSE, time.perf_counter() - start)
+            reusable = not response.will_close
+            return PoolResponse(response.status, data, dict(response.getheaders()))
+        finally:
+            self._release(conn, reusable)
+
+    def close(self) -> None:
+        """Close all idle connections and refuse further requests."""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            conn.close()
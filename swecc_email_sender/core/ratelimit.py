@@ -0,0 +1,134 @@
+"""
+Token-bucket rate limiting that adapts to SendGrid's rate-limit response headers.
+"""
+
+import threading
+import time
+from typing import Mapping, Optional
+
+SENDGRID_RATE_LIMITED_STATUS = 429
+# Pause applied after a 429 that carries no usable reset information
+DEFAULT_THROTTLE_PAUSE = 1.0
+# Upper bound on any single pause requested by the server
+MAX_THROTTLE_PAUSE = 60.0
+
+
+def _header(headers: Mapping[str, str], name: str) -> Optional[str]:
+    """Case-insensitive header lookup."""
+    name = name.lower()
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _float_header(headers: Mapping[str, str], name: str) -> Optional[float]:
+    """Parse a numeric header, returning None if it is absent or malformed."""
+    value = _header(headers, name)
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket shared by every sender that should respect one budget.
+
+    Tokens refill at ``rate`` per second up to ``burst``. Responses from SendGrid are
+    fed back through ``update`` so that the effective rate drops to whatever the
+    ``X-RateLimit-Remaining``/``X-RateLimit-Reset`` headers allow, and sending pauses
+    entirely until the reset time after a 429.
+    """
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        """
+        Initialize the limiter.
+
+        Args:
+            rate: Sustained requests per second
+            burst: Maximum number of requests that may be sent back to back
+                (defaults to one second's worth of requests)
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1, int(rate))
+        if self.burst < 1:
+            raise ValueError("burst must be at least 1")
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._window_rate: Optional[float] = None
+        self._window_end = 0.0
+        self._lock = threading.Lock()
+
+    def _current_rate(self, now: float) -> float:
+        """Configured rate, lowered while a server-advertised window is in effect."""
+        if self._window_rate is not None and now < self._window_end:
+            return min(self.rate, self._window_rate)
+        return self.rate
+
+    def reserve(self) -> float:
+        """
+        Take one token.
+
+        Returns:
+            Seconds the caller must wait before sending
+        """
+        with self._lock:
+            now = time.monotonic()
+            rate = self._current_rate(now)
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / rate if self._tokens < 0 else 0.0
+            return max(wait, self._paused_until - now)
+
+    def acquire(self) -> None:
+        """Block until a request may be sent."""
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self) -> None:
+        """Wait without blocking the event loop until a request may be sent."""
+        # Already loaded by the running event loop; not imported at module level so
+        # blocking senders do not pay for it
+        import asyncio
+
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def update(self, status: int, headers: Mapping[str, str]) -> None:
+        """
+        Adapt to the rate-limit information in a SendGrid response.
+
+        Args:
+            status: HTTP status of the response
+            headers: Response headers
+        """
+        remaining = _float_header(headers, "X-RateLimit-Remaining")
+        reset = _float_header(headers, "X-RateLimit-Reset")
+        retry_after = _float_header(headers, "Retry-After")
+
+        with self._lock:
+            now = time.monotonic()
+            seconds_to_reset = None
+            if reset is not None:
+                seconds_to_reset = min(max(reset - time.time(), 0.0), MAX_THROTTLE_PAUSE)
+
+            if status == SENDGRID_RATE_LIMITED_STATUS or remaining == 0:
+                if retry_after is not None:
+                    pause = min(retry_after, MAX_THROTTLE_PAUSE)
+                elif seconds_to_reset is not None:
+                    pause = seconds_to_reset
+                else:
+                    pause = DEFAULT_THROTTLE_PAUSE
+                self._paused_until = max(self._paused_until, now + pause)
+                self._tokens = min(self._tokens, 0.0)
+            elif remaining is not None and seconds_to_reset:
+                # Spread the remaining allowance evenly over the rest of the window
+                self._window_rate = max(remaining / seconds_to_reset, 1e-3)
+                self._window_end = now + seconds_to_reset
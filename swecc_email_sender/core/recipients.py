@@ -0,0 +1,355 @@
+"""
+Compact columnar storage for large recipient lists.
+"""
+
+from array import array
+from itertools import islice
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+    overload,
+)
+
+# Code stored for a row that has no value in a column
+MISSING_CODE = 0
+# Rows transposed at a time when building a table from rows
+ROW_CHUNK_SIZE = 4096
+
+
+class _Missing:
+    """Placeholder decoded from MISSING_CODE."""
+
+    __slots__ = ()
+
+    def __repr__(self) -> str:
+        return "<missing>"
+
+
+_MISSING: Any = _Missing()
+
+
+class _StringPool(Sequence[Any]):
+    """
+    Distinct strings of one column packed into a single UTF-8 buffer.
+
+    Used for mostly-unique columns such as email addresses, where a separate ``str``
+    object per value would cost several times the length of its text.
+    """
+
+    __slots__ = ("_data", "_offsets")
+
+    def __init__(self, strings: Sequence[str]):
+        encoded = [value.encode("utf-8") for value in strings]
+        offsets = array("Q", [0])
+        total = 0
+        for value in encoded:
+            total += len(value)
+            offsets.append(total)
+        self._data = b"".join(encoded)
+        self._offsets = offsets if total > 0xFFFFFFFF else array("I", offsets)
+
+    def __len__(self) -> int:
+        # Code 0 is reserved for missing values
+        return len(self._offsets)
+
+    @overload
+    def __getitem__(self, code: int) -> Any: ...
+
+    @overload
+    def __getitem__(self, code: slice) -> Sequence[Any]: ...
+
+    def __getitem__(self, code: Union[int, slice]) -> Any:
+        if isinstance(code, slice):
+            return [self[i] for i in range(*code.indices(len(self)))]
+        if code == MISSING_CODE:
+            return _MISSING
+        return self._data[self._offsets[code - 1] : self._offsets[code]].decode("utf-8")
+
+
+def _pack_values(values: List[Any], rows: int) -> Sequence[Any]:
+    """Pack a mostly-unique column of strings; other columns keep their list."""
+    if len(values) * 2 > rows and all(type(value) is str for value in values[1:]):
+        return _StringPool(values[1:])
+    return values
+
+
+def _narrow(codes: "array[int]", distinct: int) -> "array[int]":
+    """Store codes in the smallest unsigned type that can hold every code."""
+    if distinct <= 0xFF:
+        return array("B", codes)
+    if distinct <= 0xFFFF:
+        return array("H", codes)
+    return codes
+
+
+class RecipientRow(Mapping[str, Any]):
+    """
+    Read-only mapping view of one row of a RecipientTable.
+
+    Rows hold only a reference to their table and a row number, so creating them is
+    cheap and they can be passed anywhere a record dictionary is accepted.
+    """
+
+    __slots__ = ("_row", "_table")
+
+    def __init__(self, table: "RecipientTable", row: int):
+        self._table = table
+        self._row = row
+
+    def __getitem__(self, key: str) -> Any:
+        value = self._table.value(self._row, key)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Value for key, or default if the row has none."""
+        value = self._table.value(self._row, key)
+        return default if value is _MISSING else value
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and self._table.value(self._row, key) is not _MISSING
+
+    def __iter__(self) -> Iterator[str]:
+        row = self._row
+        for column, codes in zip(self._table.columns, self._table._codes):
+            if codes[row] != MISSING_CODE:
+                yield column
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Copy of the row as a plain dictionary."""
+        return dict(self.items())
+
+    def __repr__(self) -> str:
+        return f"RecipientRow({self.to_dict()!r})"
+
+
+class RecipientTable(Sequence[RecipientRow]):
+    """
+    Recipient records stored column by column with dictionary encoding.
+
+    Each column keeps every distinct value once and one small integer code per row,
+    so repeated values (names of majors, years, template constants) cost a byte or
+    two per row and column names are not repeated at all. Mostly-unique string
+    columns such as email addresses are packed into one UTF-8 buffer per column.
+
+    Indexing the table returns RecipientRow views that behave like the dictionaries
+    DataLoader.load_data returns. Records may have different keys; a row simply has
+    no value in columns it lacks.
+    """
+
+    def __init__(
+        self, columns: Sequence[str], values: List[Sequence[Any]], codes: List["array[int]"]
+    ):
+        """Wrap prebuilt column data; use from_records to build a table."""
+        self.columns: Tuple[str, ...] = tuple(columns)
+        self._column_index = {column: i for i, column in enumerate(self.columns)}
+        self._values = values
+        self._codes = codes
+        self._length = len(codes[0]) if codes else 0
+
+    @classmethod
+    def from_records(cls, records: Iterable[Mapping[str, Any]]) -> "RecipientTable":
+        """
+        Build a table from record mappings, consuming them one at a time.
+
+        Args:
+            records: Records such as those yielded by DataLoader.iter_data
+
+        Returns:
+            A table holding the same data
+        """
+        columns: List[str] = []
+        values: List[List[Any]] = []
+        codes: List[array[int]] = []
+        # Per column: value -> code lookup, distinct values and row codes
+        builders: Dict[str, Tuple[Dict[Any, int], List[Any], array[int]]] = {}
+        length = 0
+
+        for record in records:
+            for key, value in record.items():
+                builder = builders.get(key)
+                if builder is None:
+                    # A new column: earlier rows have no value for it
+                    builder = builders[key] = (
+                        {},
+                        [_MISSING],
+                        array("I", [MISSING_CODE]) * length,
+                    )
+                    columns.append(key)
+                    values.append(builder[1])
+                    codes.append(builder[2])
+                lookup, column_values, column_codes = builder
+                try:
+                    code = lookup.get(value)
+                    if code is None:
+                        code = lookup[value] = len(column_values)
+                        column_values.append(value)
+                except TypeError:
+                    # Unhashable values (e.g. JSON lists) are stored without deduplication
+                    code = len(column_values)
+                    column_values.append(value)
+                column_codes.append(code)
+
+            length += 1
+            if len(record) < len(columns):
+                for column_codes in codes:
+                    if len(column_codes) < length:
+                        column_codes.append(MISSING_CODE)
+
+        return cls(
+            columns,
+            [_pack_values(v, length) for v in values],
+            [_narrow(c, len(v)) for c, v in zip(codes, values)],
+        )
+
+    @classmethod
+    def from_rows(
+        cls,
+        columns: Sequence[str],
+        rows: Iterable[Sequence[Optional[str]]],
+        chunk_size: int = ROW_CHUNK_SIZE,
+    ) -> "RecipientTable":
+        """
+        Build a table from string rows aligned with a fixed list of columns.
+
+        Rows are processed in chunks, column by column, which avoids creating a
+        dictionary per row. Surrounding whitespace is stripped from values; cells
+        missing from short rows (or None) have no value and extra cells are ignored.
+        Empty rows, such as the blank lines csv.reader returns, are skipped like
+        csv.DictReader skips them.
+
+        Args:
+            columns: Column names, e.g. a CSV header
+            rows: Row values, e.g. from csv.reader
+            chunk_size: Rows transposed at a time
+
+        Returns:
+            A table holding the same data
+        """
+        width = len(columns)
+        lookups: List[Dict[Optional[str], int]] = [{None: MISSING_CODE} for _ in columns]
+        codes: List[array[int]] = [array("I") for _ in columns]
+        length = 0
+
+        iterator = filter(None, rows)
+        while True:
+            chunk = list(islice(iterator, chunk_size))
+            if not chunk:
+                break
+            length += len(chunk)
+            if all(len(row) == width and None not in row for row in chunk):
+                for lookup, column_codes, cells in zip(lookups, codes, zip(*chunk)):
+                    add = lookup.setdefault
+                    column_codes.extend([add(cell, len(lookup)) for cell in map(str.strip, cells)])
+            else:
+                padded = [(list(row) + [None] * width)[:width] for row in chunk]
+                for lookup, column_codes, cells in zip(lookups, codes, zip(*padded)):
+                    add = lookup.setdefault
+                    column_codes.extend(
+                        [
+                            MISSING_CODE if cell is None else add(cell.strip(), len(lookup))
+                            for cell in cells
+                        ]
+                    )
+
+        values: List[List[Any]] = []
+        for lookup in lookups:
+            # Codes were assigned in insertion order, with None as the missing code
+            column_values: List[Any] = list(lookup)
+            column_values[MISSING_CODE] = _MISSING
+            values.append(column_values)
+
+        return cls(
+            columns,
+            [_pack_values(v, length) for v in values],
+            [_narrow(c, len(v)) for c, v in zip(codes, values)],
+        )
+
+    def __len__(self) -> int:
+        return self._length
+
+    @overload
+    def __getitem__(self, index: int) -> RecipientRow: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[RecipientRow]: ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[RecipientRow, List[RecipientRow]]:
+        if isinstance(index, slice):
+            return [RecipientRow(self, i) for i in range(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("RecipientTable index out of range")
+        return RecipientRow(self, index)
+
+    def __iter__(self) -> Iterator[RecipientRow]:
+        for i in range(self._length):
+            yield RecipientRow(self, i)
+
+    def value(self, row: int, column: str) -> Any:
+        """Value of a cell, or a missing-value placeholder if the row has none."""
+        i = self._column_index.get(column)
+        if i is None:
+            return _MISSING
+        return self._values[i][self._codes[i][row]]
+
+    def column(self, name: str, default: Any = None) -> List[Any]:
+        """
+        Decode a whole column.
+
+        Args:
+            name: Column name
+            default: Value for rows without one
+
+        Returns:
+            One value per row
+        """
+        i = self._column_index.get(name)
+        if i is None:
+            return [default] * self._length
+        decoded = [default if v is _MISSING else v for v in self._values[i]]
+        return [decoded[code] for code in self._codes[i]]
+
+    def distinct_count(self, name: str) -> int:
+        """Number of distinct values stored for a column."""
+        i = self._column_index.get(name)
+        return len(self._values[i]) - 1 if i is not None else 0
+
+    def rows_missing(self, keys: Iterable[str]) -> Dict[str, List[int]]:
+        """
+        Find rows lacking each key, scanning column codes rather than rows.
+
+        Args:
+            keys: Keys to check, e.g. a template's required keys
+
+        Returns:
+            Mapping from each key that some rows lack to those row numbers
+        """
+        missing: Dict[str, List[int]] = {}
+        for key in keys:
+            i = self._column_index.get(key)
+            if i is None:
+                if self._length:
+                    missing[key] = list(range(self._length))
+                continue
+            codes = self._codes[i]
+            if MISSING_CODE not in codes:
+                continue
+            missing[key] = [row for row, code in enumerate(codes) if code == MISSING_CODE]
+        return missing
+
+    def __repr__(self) -> str:
+        return f"RecipientTable({self._length} rows, columns={list(self.columns)!r})"
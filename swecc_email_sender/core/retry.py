@@ -0,0 +1,124 @@
+"""
+Retry policy with exponential backoff, jitter and a shared retry budget.
+"""
+
+import http.client
+import random
+import threading
+from typing import AbstractSet, Optional, Tuple, Type
+
+DEFAULT_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+DEFAULT_RETRY_EXCEPTIONS: Tuple[Type[BaseException], ...] = (
+    OSError,  # includes timeouts and connection errors
+    http.client.HTTPException,
+)
+
+
+class RetryPolicy:
+    """
+    Decide whether and when a failed SendGrid request should be retried.
+
+    Delays grow exponentially from ``backoff_base`` up to ``backoff_cap`` seconds; with
+    ``jitter`` enabled a uniformly random delay up to that bound is used ("full
+    jitter") so that concurrent senders do not retry in lockstep. An optional
+    ``retry_budget`` caps the total number of retries across every send that shares
+    this policy, so a batch cannot spend unbounded time retrying during an outage.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        backoff_base: float = 0.5,
+        backoff_cap: float = 30.0,
+        jitter: bool = True,
+        retry_statuses: AbstractSet[int] = DEFAULT_RETRY_STATUSES,
+        retry_exceptions: Tuple[Type[BaseException], ...] = DEFAULT_RETRY_EXCEPTIONS,
+        retry_budget: Optional[int] = None,
+    ):
+        """
+        Initialize the policy.
+
+        Args:
+            max_attempts: Total attempts per request, including the first
+            backoff_base: Delay before the first retry, doubled for each further retry
+            backoff_cap: Maximum delay between attempts
+            jitter: Whether to randomize delays
+            retry_statuses: HTTP statuses that are worth retrying
+            retry_exceptions: Exception types that are worth retrying
+            retry_budget: Maximum total retries shared by all sends using this policy
+        """
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+        if retry_budget is not None and retry_budget < 0:
+            raise ValueError("retry_budget cannot be negative")
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.jitter = jitter
+        self.retry_statuses = retry_statuses
+        self.retry_exceptions = retry_exceptions
+        self.retry_budget = retry_budget
+        self._retries_used = 0
+        self._lock = threading.Lock()
+
+    @property
+    def retries_used(self) -> int:
+        """Number of retries granted so far."""
+        return self._retries_used
+
+    def reset_budget(self) -> None:
+        """Start a new batch with the full retry budget."""
+        with self._lock:
+            self._retries_used = 0
+
+    def is_retryable(
+        self, status: Optional[int] = None, error: Optional[BaseException] = None
+    ) -> bool:
+        """Whether a response status or exception indicates a transient failure."""
+        if error is not None:
+            return isinstance(error, self.retry_exceptions)
+        return status in self.retry_statuses
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Delay to wait before the next attempt.
+
+        Args:
+            attempt: Number of attempts already made
+
+        Returns:
+            Delay in seconds
+        """
+        delay = min(self.backoff_cap, self.backoff_base * 2 ** (attempt - 1))
+        return random.uniform(0, delay) if self.jitter else delay
+
+    def next_delay(
+        self,
+        attempt: int,
+        status: Optional[int] = None,
+        error: Optional[BaseException] = None,
+    ) -> Optional[float]:
+        """
+        Decide whether to retry a failed attempt, consuming budget if so.
+
+        Args:
+            attempt: Number of attempts already made
+            status: HTTP status of the failed response
+            error: Exception raised by the failed attempt
+
+        Returns:
+            Seconds to wait before retrying, or None to give up
+        """
+        if attempt >= self.max_attempts or not self.is_retryable(status, error):
+            return None
+        if not self._consume_budget():
+            return None
+        return self.backoff(attempt)
+
+    def _consume_budget(self) -> bool:
+        """Take one retry from the budget, returning False if it is used up."""
+        with self._lock:
+            if self.retry_budget is not None and self._retries_used >= self.retry_budget:
+                return False
+            self._retries_used += 1
+        return True
@@ -0,0 +1,664 @@
+"""
+Durable on-disk queue of emails decoupling producers from sending.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from types import TracebackType
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Type,
+    Union,
+)
+
+from swecc_email_sender.core.retry import RetryPolicy
+from swecc_email_sender.core.sender import EmailSender, SendOutcome
+
+if TYPE_CHECKING:
+    import sqlite3
+
+logger = logging.getLogger(__name__)
+
+# sqlite3 is imported when a queue is opened, so that reading the defaults below,
+# e.g. to build the CLI's options, does not load it
+
+# Records inserted per transaction when enqueueing
+DEFAULT_INSERT_BATCH = 1000
+# Messages leased by a single claim
+DEFAULT_CLAIM_SIZE = 100
+# Seconds a claimed message stays invisible to other workers before it is redelivered
+DEFAULT_VISIBILITY_TIMEOUT = 300.0
+# Leases being sent are renewed this many times per visibility timeout
+LEASE_RENEWALS_PER_TIMEOUT = 3
+# Longest a draining worker sleeps before looking for newly available messages
+DEFAULT_POLL_INTERVAL = 1.0
+# Deliveries before a message is dead-lettered, and the backoff between them
+DEFAULT_MAX_DELIVERIES = 5
+DEFAULT_REDELIVERY_BACKOFF = 10.0
+DEFAULT_REDELIVERY_CAP = 600.0
+# Seconds SQLite waits for another process's write transaction to finish
+BUSY_TIMEOUT = 30.0
+
+STATUS_PENDING = "pending"
+STATUS_DEAD = "dead"
+
+MISSING_TO_EMAIL = "missing to_email field"
+
+
+def default_redelivery_policy() -> RetryPolicy:
+    """Policy deciding how often and how soon failed messages are delivered again."""
+    return RetryPolicy(
+        max_attempts=DEFAULT_MAX_DELIVERIES,
+        backoff_base=DEFAULT_REDELIVERY_BACKOFF,
+        backoff_cap=DEFAULT_REDELIVERY_CAP,
+    )
+
+
+class QueuedMessage(NamedTuple):
+    """A message leased to a worker by ``SendQueue.claim``."""
+
+    id: int
+    lease: str
+    attempts: int
+    record: Dict[str, str]
+    subject: str
+    content: str
+    from_email: str
+    is_markdown: bool
+
+    @property
+    def template_key(self) -> Tuple[str, str, str, bool]:
+        """Messages with equal keys can be sent together in one batch."""
+        return (self.subject, self.content, self.from_email, self.is_markdown)
+
+
+class SendQueue:
+    """
+    Durable queue of templated emails stored in a SQLite database in WAL mode.
+
+    Producers ``enqueue`` records in batched transactions and return immediately;
+    workers ``claim`` batches of messages under a lease, ``renew`` the lease while
+    sending takes long, then ``ack`` the ones that were sent and ``nack`` the rest. A
+    claimed message whose lease is not renewed, acked or nacked within
+    ``visibility_timeout`` seconds, e.g. because its worker died, is delivered again.
+    Failed messages are retried with the backoff of ``retry_policy`` and dead-lettered
+    once its ``max_attempts`` deliveries are used up. Sent messages are deleted; dead
+    letters stay until requeued.
+
+    Several threads and processes may share one database file.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        retry_policy: Optional[RetryPolicy] = None,
+        visibility_timeout: float = DEFAULT_VISIBILITY_TIMEOUT,
+    ):
+        """
+        Open or create a queue database.
+
+        Args:
+            path: Database file
+            retry_policy: Redelivery limit and backoff (default: 5 deliveries starting
+                10 seconds apart)
+            visibility_timeout: Seconds before an unacknowledged message is redelivered
+        """
+        self.path = Path(path)
+        self.retry_policy = retry_policy or default_redelivery_policy()
+        self.visibility_timeout = visibility_timeout
+        self._lock = threading.Lock()
+        self._template_ids: Dict[Tuple[str, str, str, bool], int] = {}
+
+        import sqlite3
+
+        # Transactions are managed explicitly so that claims can take the write lock
+        # before reading, which keeps concurrent processes from claiming the same rows
+        self._conn = sqlite3.connect(
+            str(self.path), timeout=BUSY_TIMEOUT, isolation_level=None, check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        with self._transaction() as conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS templates (
+                    id INTEGER PRIMARY KEY,
+                    subject TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    from_email TEXT NOT NULL,
+                    is_markdown INTEGER NOT NULL,
+                    UNIQUE (subject, content, from_email, is_markdown)
+                )"""
+            )
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS messages (
+                    id INTEGER PRIMARY KEY,
+                    template_id INTEGER NOT NULL REFERENCES templates (id),
+                    record TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    available_at REAL NOT NULL,
+                    lease TEXT,
+                    last_error TEXT
+                )"""
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS messages_available "
+                "ON messages (status, available_at)"
+            )
+            # Recipients of each job, kept after their messages are sent or deleted
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS enqueued (
+                    job_key TEXT NOT NULL,
+                    template_id INTEGER NOT NULL REFERENCES templates (id),
+                    recipient TEXT NOT NULL,
+                    PRIMARY KEY (job_key, template_id, recipient)
+                ) WITHOUT ROWID"""
+            )
+
+    @contextmanager
+    def _transaction(self) -> Iterator["sqlite3.Connection"]:
+        """Run statements in a write transaction, committed durably on success."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _template_id(
+        self,
+        conn: "sqlite3.Connection",
+        subject: str,
+        content: str,
+        from_email: str,
+        is_markdown: bool,
+    ) -> int:
+        """Row id of a template, inserting it if new; the caller must hold the lock."""
+        key = (subject, content, from_email, is_markdown)
+        template_id = self._template_ids.get(key)
+        if template_id is None:
+            conn.execute(
+                "INSERT OR IGNORE INTO templates (subject, content, from_email, is_markdown) "
+                "VALUES (?, ?, ?, ?)",
+                (subject, content, from_email, int(is_markdown)),
+            )
+            template_id = conn.execute(
+                "SELECT id FROM templates "
+                "WHERE subject = ? AND content = ? AND from_email = ? AND is_markdown = ?",
+                (subject, content, from_email, int(is_markdown)),
+            ).fetchone()[0]
+            self._template_ids[key] = template_id
+        return template_id
+
+    def enqueue(
+        self,
+        records: Iterable[Mapping[str, str]],
+        subject: str,
+        content: str,
+        from_email: str,
+        is_markdown: bool = False,
+        batch_size: int = DEFAULT_INSERT_BATCH,
+        job_key: Optional[str] = None,
+    ) -> int:
+        """
+        Durably add an email for each record.
+
+        Records are inserted ``batch_size`` per transaction, so a large burst costs
+        one fsync per batch rather than per message. Records without ``to_email``
+        go straight to the dead letters.
+
+        With a ``job_key``, a recipient already enqueued under the same key and
+        templates is skipped, even if that email was sent long ago, so enqueueing an
+        interrupted job again only adds the recipients it had not reached.
+
+        Args:
+            records: Template data for each recipient; each must contain ``to_email``
+            subject: Email subject (can include format specifiers)
+            content: Email body content (can include format specifiers)
+            from_email: Sender email address
+            is_markdown: Whether the content is Markdown
+            batch_size: Records inserted per transaction
+            job_key: Identifies the job the records belong to, e.g. their source file
+
+        Returns:
+            Number of messages queued for sending
+        """
+        queued = 0
+        iterator = iter(records)
+        while True:
+            rows: List[Tuple[str, str, Optional[str], str]] = []
+            for record in iterator:
+                data = json.dumps(dict(record))
+                if "to_email" in record:
+                    rows.append((data, STATUS_PENDING, None, record["to_email"]))
+                else:
+                    logger.warning("Dead-lettering record: missing to_email field")
+                    rows.append((data, STATUS_DEAD, MISSING_TO_EMAIL, data))
+                if len(rows) >= batch_size:
+                    break
+            if not rows:
+                return queued
+
+            now = time.time()
+            with self._transaction() as conn:
+                template_id = self._template_id(conn, subject, content, from_email, is_markdown)
+                if job_key is not None:
+                    rows = [
+                        row
+                        for row in rows
+                        if conn.execute(
+                            "INSERT OR IGNORE INTO enqueued (job_key, template_id, recipient) "
+                            "VALUES (?, ?, ?)",
+                            (job_key, template_id, row[3]),
+                        ).rowcount
+                    ]
+                conn.executemany(
+                    "INSERT INTO messages (template_id, record, status, available_at, last_error) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (template_id, record, status, now, error)
+                        for record, status, error, _ in rows
+                    ],
+                )
+            queued += sum(status == STATUS_PENDING for _, status, _, _ in rows)
+
+    def claim(self, limit: int = DEFAULT_CLAIM_SIZE) -> List[QueuedMessage]:
+        """
+        Lease up to ``limit`` messages that are due for delivery.
+
+        Messages whose lease expired after their last allowed delivery are
+        dead-lettered instead of being claimed again.
+
+        Args:
+            limit: Maximum number of messages to lease
+
+        Returns:
+            Leased messages, oldest first
+        """
+        now = time.time()
+        lease = os.urandom(8).hex()
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE messages SET status = ?, last_error = ? "
+                "WHERE status = ? AND available_at <= ? AND attempts >= ?",
+                (
+                    STATUS_DEAD,
+                    "lease expired",
+                    STATUS_PENDING,
+                    now,
+                    self.retry_policy.max_attempts,
+                ),
+            )
+            rows = conn.execute(
+                "SELECT m.id, m.attempts, m.record, t.subject, t.content, t.from_email, "
+                "t.is_markdown FROM messages m JOIN templates t ON t.id = m.template_id "
+                "WHERE m.status = ? AND m.available_at <= ? ORDER BY m.available_at, m.id LIMIT ?",
+                (STATUS_PENDING, now, limit),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE messages SET attempts = attempts + 1, available_at = ?, lease = ? "
+                "WHERE id = ?",
+                [(now + self.visibility_timeout, lease, row[0]) for row in rows],
+            )
+        return [
+            QueuedMessage(
+                id=message_id,
+                lease=lease,
+                attempts=attempts + 1,
+                record=json.loads(record),
+                subject=subject,
+                content=content,
+                from_email=from_email,
+                is_markdown=bool(is_markdown),
+            )
+            for message_id, attempts, record, subject, content, from_email, is_markdown in rows
+        ]
+
+    def renew(self, messages: Iterable[QueuedMessage]) -> int:
+        """
+        Keep messages that are still being sent invisible for another visibility timeout.
+
+        Args:
+            messages: Claimed messages; those whose lease expired are left alone
+
+        Returns:
+            Number of leases renewed
+        """
+        available_at = time.time() + self.visibility_timeout
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany(
+                "UPDATE messages SET available_at = ? WHERE id = ? AND lease = ?",
+                [(available_at, message.id, message.lease) for message in messages],
+            )
+            return conn.total_changes - before
+
+    def ack(self, messages: Iterable[QueuedMessage]) -> None:
+        """Remove messages that were sent; messages whose lease expired are left alone."""
+        with self._transaction() as conn:
+            conn.executemany(
+                "DELETE FROM messages WHERE id = ? AND lease = ?",
+                [(message.id, message.lease) for message in messages],
+            )
+
+    def nack(
+        self,
+        messages: Iterable[QueuedMessage],
+        error: str = "send failed",
+        permanent: bool = False,
+    ) -> int:
+        """
+        Schedule failed messages for redelivery, dead-lettering those out of attempts.
+
+        Args:
+            messages: Messages that could not be sent
+            error: Reason recorded with the messages
+            permanent: Dead-letter the messages now, because delivering them again
+                would fail the same way
+
+        Returns:
+            Number of messages dead-lettered
+        """
+        now = time.time()
+        retries = []
+        dead = []
+        for message in messages:
+            if permanent or message.attempts >= self.retry_policy.max_attempts:
+                dead.append((STATUS_DEAD, error, message.id, message.lease))
+            else:
+                available_at = now + self.retry_policy.backoff(message.attempts)
+                retries.append((available_at, error, message.id, message.lease))
+        with self._transaction() as conn:
+            conn.executemany(
+                "UPDATE messages SET available_at = ?, lease = NULL, last_error = ? "
+                "WHERE id = ? AND lease = ?",
+                retries,
+            )
+            conn.executemany(
+                "UPDATE messages SET status = ?, lease = NULL, last_error = ? "
+                "WHERE id = ? AND lease = ?",
+                dead,
+            )
+        return len(dead)
+
+    def counts(self) -> Dict[str, int]:
+        """
+        Number of messages in each state.
+
+        Returns:
+            Dictionary with ``pending`` (including leased) and ``dead`` counts
+        """
+        counts = dict.fromkeys((STATUS_PENDING, STATUS_DEAD), 0)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM messages GROUP BY status"
+            ).fetchall()
+        counts.update(rows)
+        return counts
+
+    def next_available(self) -> Optional[float]:
+        """Time at which the next pending message becomes due, None if there are none."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MIN(available_at) FROM messages WHERE status = ?", (STATUS_PENDING,)
+            ).fetchone()
+        return row[0] if row is not None else None
+
+    def dead_letters(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Messages that were given up on.
+
+        Args:
+            limit: Maximum number of messages to return (all if omitted)
+
+        Returns:
+            Dictionaries with each message's ``id``, ``record``, ``attempts`` and
+            ``error``, oldest first
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, record, attempts, last_error FROM messages "
+                "WHERE status = ? ORDER BY id LIMIT ?",
+                (STATUS_DEAD, -1 if limit is None else limit),
+            ).fetchall()
+        return [
+            {"id": message_id, "record": json.loads(record), "attempts": attempts, "error": error}
+            for message_id, record, attempts, error in rows
+        ]
+
+    def requeue_dead(self) -> int:
+        """
+        Give every dead letter a fresh set of delivery attempts.
+
+        Returns:
+            Number of messages requeued
+        """
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE messages SET status = ?, attempts = 0, available_at = ?, lease = NULL "
+                "WHERE status = ?",
+                (STATUS_PENDING, time.time(), STATUS_DEAD),
+            )
+        return cursor.rowcount
+
+    def close(self) -> None:
+        """Close the database."""
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self) -> "SendQueue":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+
+class QueueWorker:
+    """
+    Pool of threads draining a SendQueue through one sender.
+
+    Each thread repeatedly claims a batch of messages, sends them and acknowledges
+    the outcome, so a crash loses at most the leases of the batches in flight; those
+    messages are delivered again once their visibility timeout expires. While a batch
+    is being sent, e.g. slowly because of a rate limit or retries, its leases are
+    renewed so that no other worker claims and sends the same messages. Failures that
+    the queue's retry policy does not consider transient, such as a 400 or 401
+    response, are dead-lettered without further deliveries.
+    """
+
+    def __init__(
+        self,
+        queue: SendQueue,
+        sender: EmailSender,
+        threads: int = 1,
+        claim_size: int = DEFAULT_CLAIM_SIZE,
+        batch: bool = False,
+        server_side: bool = False,
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+    ):
+        """
+        Initialize the worker.
+
+        Args:
+            queue: Queue to drain
+            sender: Sender shared by every thread
+            threads: Number of threads claiming and sending concurrently
+            claim_size: Messages leased by each claim
+            batch: Pack messages with identical bodies into multi-recipient requests
+            server_side: With batch, let SendGrid substitute each recipient's values
+            poll_interval: Longest a thread sleeps before looking for due messages
+        """
+        self.queue = queue
+        self.sender = sender
+        self.threads = threads
+        self.claim_size = claim_size
+        self.batch = batch
+        self.server_side = server_side
+        self.poll_interval = poll_interval
+        self.sent = 0
+        self.failed = 0
+        self.dead = 0
+        self._counts_lock = threading.Lock()
+
+    def _send(self, messages: List[QueuedMessage]) -> List[SendOutcome]:
+        """Send claimed messages, returning each one's outcome."""
+        if not self.batch:
+            return [
+                self.sender.send_email_outcome(
+                    message.record["to_email"],
+                    message.subject,
+                    message.content,
+                    message.from_email,
+                    is_markdown=message.is_markdown,
+                    template_data=message.record,
+                )
+                for message in messages
+            ]
+
+        groups: Dict[Tuple[str, str, str, bool], List[int]] = {}
+        for index, message in enumerate(messages):
+            groups.setdefault(message.template_key, []).append(index)
+        results = [SendOutcome(False)] * len(messages)
+        for indexes in groups.values():
+
+            def on_result(
+                positions: List[int], outcome: SendOutcome, indexes: List[int] = indexes
+            ) -> None:
+                for position in positions:
+                    results[indexes[position]] = outcome
+
+            first = messages[indexes[0]]
+            self.sender.send_batch(
+                [messages[index].record for index in indexes],
+                first.subject,
+                first.content,
+                first.from_email,
+                first.is_markdown,
+                server_side=self.server_side,
+                on_result=on_result,
+                # The budget covers the whole run, not each claimed batch
+                reset_budget=False,
+            )
+        return results
+
+    def _failure(self, outcome: SendOutcome) -> Tuple[str, bool]:
+        """Reason recorded for a failed send, and whether retrying it is pointless."""
+        if outcome.error is not None:
+            reason = f"{type(outcome.error).__name__}: {outcome.error!s}"
+        elif outcome.status is not None:
+            reason = f"status {outcome.status}"
+        else:
+            reason = "send failed"
+        policy = self.queue.retry_policy
+        return reason, not policy.is_retryable(outcome.status, outcome.error)
+
+    def _keep_leases(self, messages: List[QueuedMessage], done: threading.Event) -> None:
+        """Renew the leases of messages until they have been sent."""
+        interval = self.queue.visibility_timeout / LEASE_RENEWALS_PER_TIMEOUT
+        if interval <= 0:
+            return
+        while not done.wait(interval):
+            try:
+                self.queue.renew(messages)
+            except Exception as e:
+                logger.error(f"Could not renew the leases of queued messages: {e!s}")
+
+    def run_once(self) -> int:
+        """
+        Claim, send and acknowledge one batch of messages.
+
+        Returns:
+            Number of messages claimed
+        """
+        messages = self.queue.claim(self.claim_size)
+        if not messages:
+            return 0
+        done = threading.Event()
+        keeper = threading.Thread(target=self._keep_leases, args=(messages, done), daemon=True)
+        keeper.start()
+        try:
+            results = self._send(messages)
+        except Exception as e:
+            logger.error(f"Error sending {len(messages)} queued messages: {e!s}")
+            results = [SendOutcome(False, error=e)] * len(messages)
+        finally:
+            done.set()
+            keeper.join()
+
+        sent = [message for message, outcome in zip(messages, results) if outcome.success]
+        failed = [message for message, outcome in zip(messages, results) if not outcome.success]
+        if sent:
+            self.queue.ack(sent)
+        failures: Dict[Tuple[str, bool], List[QueuedMessage]] = {}
+        for message, outcome in zip(messages, results):
+            if not outcome.success:
+                failures.setdefault(self._failure(outcome), []).append(message)
+        dead = sum(
+            self.queue.nack(group, reason, permanent)
+            for (reason, permanent), group in failures.items()
+        )
+        with self._counts_lock:
+            self.sent += len(sent)
+            self.failed += len(failed)
+            self.dead += dead
+        return len(messages)
+
+    def _loop(self, follow: bool, stop: Optional[threading.Event]) -> None:
+        """Claim batches until stopped, or until the queue is drained."""
+        while stop is None or not stop.is_set():
+            if self.run_once():
+                continue
+            next_available = self.queue.next_available()
+            if next_available is None and not follow:
+                return
+            delay = self.poll_interval
+            if next_available is not None:
+                delay = min(delay, max(0.0, next_available - time.time()))
+            if stop is not None:
+                stop.wait(delay)
+            else:
+                time.sleep(delay)
+
+    def run(self, follow: bool = False, stop: Optional[threading.Event] = None) -> int:
+        """
+        Send queued messages from every thread.
+
+        Args:
+            follow: Keep waiting for new messages instead of returning once no message
+                is left pending (sent and dead-lettered messages are not pending)
+            stop: Event that makes every thread return after its current batch
+
+        Returns:
+            Number of messages sent
+        """
+        sent_before = self.sent
+        if self.threads > 1:
+            with ThreadPoolExecutor(max_workers=self.threads) as executor:
+                futures = [executor.submit(self._loop, follow, stop) for _ in range(self.threads)]
+                for future in futures:
+                    future.result()
+        else:
+            self._loop(follow, stop)
+        return self.sent - sent_before
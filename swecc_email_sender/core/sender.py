@@ -2,50 +2,108 @@
 Email sender module using SendGrid API.
 """
 
-import getpass
-import http.client
-import json
 import logging
-import os
-from pathlib import Path
-from string import Formatter
-from typing import Dict, List, Optional
-
+import threading
+import time
+from types import TracebackType
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+)
+
+from swecc_email_sender.core.credentials import (
+    CONFIG_DIR,
+    CONFIG_FILE,
+    CredentialProvider,
+    default_credential_provider,
+)
+from swecc_email_sender.core.metrics import (
+    COUNTER_BYTES_OUT,
+    COUNTER_FAILED,
+    COUNTER_REQUESTS,
+    COUNTER_RETRIED,
+    COUNTER_SENT,
+    STAGE_MARKDOWN,
+    STAGE_RENDER,
+    STAGE_SERIALIZE,
+    SenderMetrics,
+    timed,
+)
+from swecc_email_sender.core.payload import payload_builder
+from swecc_email_sender.core.pool import (
+    DEFAULT_MAX_IDLE_TIME,
+    DEFAULT_POOL_SIZE,
+    MAIL_SEND_PATH,
+    SENDGRID_API_URL,
+    ConnectionPool,
+    PoolResponse,
+    parse_api_url,
+)
+from swecc_email_sender.core.ratelimit import SENDGRID_RATE_LIMITED_STATUS, RateLimiter
+from swecc_email_sender.core.retry import RetryPolicy
+from swecc_email_sender.core.template import (
+    compile_markdown_template,
+    compile_substitution_template,
+    compile_template,
+)
 from swecc_email_sender.utils.markdown_utils import convert_markdown_to_html
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
 SENDGRID_SUCCESS_STATUS = 202
-CONFIG_DIR = Path.home() / ".config" / "swecc-email-sender"
-CONFIG_FILE = CONFIG_DIR / "email_sender_config.json"
+# SendGrid accepts at most 1000 personalizations and 30MB per mail/send request;
+# the byte limit leaves headroom for JSON escaping of the body
+MAX_PERSONALIZATIONS = 1000
+MAX_REQUEST_BYTES = 20 * 1024 * 1024
+PERSONALIZATION_OVERHEAD_BYTES = 25
+# Quotes, colon and separator around each serialized substitution
+SUBSTITUTION_OVERHEAD_BYTES = 6
+# Times a request rejected with 429 is re-sent once the rate limiter allows it
+MAX_THROTTLE_RETRIES = 5
+
+
+class SendOutcome(NamedTuple):
+    """Outcome of a SendGrid request, after any retries."""
+
+    success: bool
+    # Status of the last response, if one was received
+    status: Optional[int] = None
+    # Exception raised by the last attempt, if it did not get a response
+    error: Optional[BaseException] = None
 
 
 def save_api_key(api_key: str) -> None:
     """Save API key to config file."""
+    import json
+
     CONFIG_DIR.mkdir(parents=True, exist_ok=True)
     CONFIG_FILE.write_text(json.dumps({"SENDGRID_API_KEY": api_key}))
     CONFIG_FILE.chmod(0o600)  # Read/write for owner only
+    default_credential_provider().invalidate()
 
 
 def load_api_key() -> Optional[str]:
-    """Load API key from config file or environment."""
-    # First check environment
-    if api_key := os.getenv("SENDGRID_API_KEY"):
-        return api_key
-
-    # Then check config file
-    if CONFIG_FILE.exists():
-        try:
-            config = json.loads(CONFIG_FILE.read_text())
-            return str(config.get("SENDGRID_API_KEY"))
-        except (json.JSONDecodeError, OSError):
-            return None
-
-    return None
+    """Load API key from environment or config file, using the process-wide cache."""
+    return default_credential_provider().get_api_key()
 
 
 def prompt_for_api_key() -> str:
     """Prompt user for SendGrid API key."""
+    import getpass
+
     print(
         "\nSendGrid API key not found. You can get one from https://app.sendgrid.com/settings/api_keys"
     )
@@ -65,50 +123,201 @@ def prompt_for_api_key() -> str:
     return api_key
 
 
-class EmailSender:
-    """Class to handle email sending operations using SendGrid API."""
+class BaseSender:
+    """Rendering and payload logic shared by the blocking and asyncio senders."""
 
-    def __init__(self, api_key: Optional[str] = None):
-        """Initialize EmailSender with optional API key."""
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        precompile_markdown: bool = False,
+        api_url: str = SENDGRID_API_URL,
+        metrics: Optional[SenderMetrics] = None,
+        credential_provider: Optional[CredentialProvider] = None,
+    ):
+        """Initialize the sender with optional API key, rate limiter and retry policy."""
+        self.endpoint = parse_api_url(api_url)
+        self.mail_send_path = self.endpoint.path_prefix + MAIL_SEND_PATH
         self.api_key = api_key
-        self._api_key_loaded = bool(api_key)
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy
+        self.precompile_markdown = precompile_markdown
+        self.credential_provider = credential_provider or default_credential_provider()
+        self._metrics = metrics
+        self._explicit_api_key = bool(api_key)
+        self._api_key_lock = threading.Lock()
 
     def _ensure_api_key(self) -> None:
         """Ensure API key is available, prompting user if necessary."""
-        if self._api_key_loaded:
+        if self._explicit_api_key:
             return
 
-        # try to load from config or env
-        if api_key := load_api_key():
+        # Providers cache the key, so asking before every request costs no I/O and
+        # picks up a rotated key
+        if api_key := self.credential_provider.get_api_key():
             self.api_key = api_key
-            self._api_key_loaded = True
             return
 
-        # prompt user for API key
-        self.api_key = prompt_for_api_key()
-        self._api_key_loaded = True
+        with self._api_key_lock:
+            # prompt user for API key
+            if not self.api_key:
+                self.api_key = prompt_for_api_key()
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Snapshot of the per-stage timings and counters collected so far.
+
+        Returns:
+            Dictionary with ``counters`` and ``stages``, empty if the sender was
+            created without a SenderMetrics instance
+        """
+        return self._metrics.snapshot() if self._metrics is not None else {}
+
+    def _count(self, counter: str, amount: int = 1) -> None:
+        """Add to a metrics counter if instrumentation is enabled."""
+        if self._metrics is not None:
+            self._metrics.increment(counter, amount)
 
     @staticmethod
-    def validate_template_keys(template: str, data: Dict[str, str]) -> List[str]:
+    def validate_template_keys(template: str, data: Mapping[str, str]) -> List[str]:
         """Validate that all format specifiers in template have matching keys in data."""
-        required_keys = {
-            fname for _, fname, _, _ in Formatter().parse(template) if fname is not None
-        }
-        return [key for key in required_keys if key not in data]
+        return compile_template(template).missing_keys(data)
 
     @staticmethod
-    def format_with_fallback(template: str, data: Dict[str, str], fallback: str = "") -> str:
+    def format_with_fallback(template: str, data: Mapping[str, str], fallback: str = "") -> str:
         """Format string with dict data, replacing missing values with fallback."""
+        return compile_template(template).render(data, fallback)
+
+    def _render_payload(
+        self,
+        to_email: str,
+        subject: str,
+        content: str,
+        from_email: str,
+        is_markdown: bool = False,
+        template_data: Optional[Mapping[str, str]] = None,
+    ) -> bytes:
+        """Render the templates for a single recipient and serialize the request body."""
+        html = None
+        if is_markdown and template_data and self.precompile_markdown:
+            with timed(self._metrics, STAGE_MARKDOWN):
+                html = compile_markdown_template(content).render(template_data)
+
+        if template_data:
+            with timed(self._metrics, STAGE_RENDER):
+                subject = self.format_with_fallback(subject, template_data)
+                if html is None:
+                    content = self.format_with_fallback(content, template_data)
+
+        content_type = "text/html" if is_markdown else "text/plain"
+        if is_markdown:
+            if html is None:
+                with timed(self._metrics, STAGE_MARKDOWN):
+                    html = convert_markdown_to_html(content)
+            content = html
+
+        with timed(self._metrics, STAGE_SERIALIZE):
+            return payload_builder(from_email, content_type).build(to_email, subject, content)
+
+    def _request_headers(self) -> Dict[str, str]:
+        """Headers sent with every mail/send request."""
+        return {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
+
+    def _retry_delay(
+        self,
+        attempt: int,
+        response: Optional[PoolResponse] = None,
+        error: Optional[BaseException] = None,
+    ) -> Optional[float]:
+        """
+        Decide whether a failed attempt should be retried.
+
+        Args:
+            attempt: Number of attempts already made
+            response: Response of the failed attempt, if one was received
+            error: Exception raised by the failed attempt, if any
+
+        Returns:
+            Seconds to wait before retrying, or None to give up
+        """
+        status = response.status if response is not None else None
+        if self.retry_policy is not None:
+            return self.retry_policy.next_delay(attempt, status, error)
+        # Without a policy only throttled requests are re-sent, paced by the rate limiter
+        if (
+            self.rate_limiter is not None
+            and status == SENDGRID_RATE_LIMITED_STATUS
+            and attempt <= MAX_THROTTLE_RETRIES
+        ):
+            return 0.0
+        return None
+
+
+class EmailSender(BaseSender):
+    """Class to handle email sending operations using SendGrid API."""
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        max_idle_time: float = DEFAULT_MAX_IDLE_TIME,
+        rate_limiter: Optional[RateLimiter] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        precompile_markdown: bool = False,
+        api_url: str = SENDGRID_API_URL,
+        metrics: Optional[SenderMetrics] = None,
+        credential_provider: Optional[CredentialProvider] = None,
+    ):
+        """
+        Initialize EmailSender with optional API key.
+
+        Args:
+            api_key: SendGrid API key (loaded from env or config file if omitted)
+            pool_size: Maximum number of keep-alive connections to SendGrid
+            max_idle_time: Seconds an idle connection may be kept before reconnecting
+            rate_limiter: Optional limiter shared with other senders using the same key
+            retry_policy: Optional policy for retrying transient failures
+            precompile_markdown: Convert Markdown templates to HTML once and substitute
+                escaped values into the HTML, falling back to per-recipient conversion
+                for values that Markdown would interpret
+            api_url: SendGrid API base URL, e.g. to target a local test server
+            metrics: Optional collector for per-stage timings and send counters
+            credential_provider: Source of the API key when none is given (defaults
+                to the environment, then the config file, cached process-wide)
+        """
+        super().__init__(
+            api_key,
+            rate_limiter,
+            retry_policy,
+            precompile_markdown,
+            api_url,
+            metrics,
+            credential_provider,
+        )
+        self._pool = ConnectionPool(
+            self.endpoint.host,
+            max_size=pool_size,
+            max_idle_time=max_idle_time,
+            port=self.endpoint.port,
+            secure=self.endpoint.secure,
+            metrics=metrics,
+        )
 
-        class DefaultDict(Dict[str, str]):
-            def __missing__(self, _: str) -> str:
-                return fallback
+    def close(self) -> None:
+        """Close all pooled connections."""
+        self._pool.close()
 
-        try:
-            return template.format_map(DefaultDict(data))
-        except ValueError as e:
-            logger.warning(f"Format error in template: {e}")
-            return template
+    def __enter__(self) -> "EmailSender":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
 
     def send_email(
         self,
@@ -117,7 +326,7 @@ class EmailSender:
         content: str,
         from_email: str,
         is_markdown: bool = False,
-        template_data: Optional[Dict[str, str]] = None,
+        template_data: Optional[Mapping[str, str]] = None,
     ) -> bool:
         """
         Send a single email using SendGrid's API.
@@ -133,40 +342,267 @@ class EmailSender:
         Returns:
             bool: True if email was sent successfully, False otherwise
         """
+        return self.send_email_outcome(
+            to_email,
+            subject,
+            content,
+            from_email,
+            is_markdown=is_markdown,
+            template_data=template_data,
+        ).success
+
+    def send_email_outcome(
+        self,
+        to_email: str,
+        subject: str,
+        content: str,
+        from_email: str,
+        *,
+        is_markdown: bool = False,
+        template_data: Optional[Mapping[str, str]] = None,
+    ) -> SendOutcome:
+        """
+        Send a single email like ``send_email``, reporting why it failed.
+
+        Args:
+            to_email: Recipient email address
+            subject: Email subject
+            content: Email body content (can include format specifiers)
+            from_email: Sender email address
+            is_markdown: Whether the content is Markdown
+            template_data: Dictionary of values to format the content with
+
+        Returns:
+            SendOutcome with the last response status or exception
+        """
         self._ensure_api_key()
+        payload = self._render_payload(
+            to_email, subject, content, from_email, is_markdown, template_data
+        )
+        return self._post(payload, to_email)
 
-        if template_data:
-            content = self.format_with_fallback(content, template_data)
-            subject = self.format_with_fallback(subject, template_data)
+    def send_batch(
+        self,
+        records: Iterable[Mapping[str, str]],
+        subject: str,
+        content: str,
+        from_email: str,
+        is_markdown: bool = False,
+        server_side: bool = False,
+        on_result: Optional[Callable[[List[int], SendOutcome], None]] = None,
+        reset_budget: bool = True,
+    ) -> List[bool]:
+        """
+        Send templated emails to many recipients using as few API requests as possible.
 
-        content_type = "text/html" if is_markdown else "text/plain"
-        if is_markdown:
-            content = convert_markdown_to_html(content)
+        Records whose rendered bodies are identical are packed into a single request with
+        one personalization per recipient, so recipients never see each other; recipients
+        whose subjects differ get their own subject in their personalization. Bodies are
+        grouped by the values of the fields they use (or a digest of the rendered text for
+        templates with format specs), so each distinct body is rendered only once. Requests
+        are split to stay within SendGrid's personalization and size limits.
+
+        With ``server_side``, the templates are rewritten once with SendGrid substitution
+        tags (``{name}`` becomes ``-name-``) and sent once per request, while each
+        personalization carries only its recipient's values. Records whose values cannot
+        be substituted safely, and templates that cannot be rewritten, are rendered
+        client-side as usual.
+
+        Args:
+            records: Template data for each recipient; each must contain ``to_email``
+            subject: Email subject (can include format specifiers)
+            content: Email body content (can include format specifiers)
+            from_email: Sender email address
+            is_markdown: Whether the content is Markdown
+            server_side: Let SendGrid substitute each recipient's values
+            on_result: Called with the indices of the records of each request and its
+                SendOutcome as soon as the request completes, e.g. to journal outcomes
+                before the rest of the batch is sent
+            reset_budget: Give the batch the retry policy's full budget; pass False
+                when the batch is one of many sends the budget should cover
 
-        payload = {
-            "personalizations": [{"to": [{"email": to_email}]}],
-            "from": {"email": from_email},
-            "subject": subject,
-            "content": [{"type": content_type, "value": content}],
-        }
+        Returns:
+            List of booleans, one per record, True if that recipient's email was accepted
+        """
+        self._ensure_api_key()
+        if reset_budget and self.retry_policy is not None:
+            self.retry_policy.reset_budget()
 
-        headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
+        template = (
+            compile_substitution_template(subject, content, is_markdown) if server_side else None
+        )
+        if template is not None and not template.is_supported:
+            logger.info("Templates cannot use server-side substitutions, rendering client-side")
+            template = None
+
+        content_template = compile_template(content)
+        results: List[bool] = []
+        # Per distinct body: a record rendering it and each recipient's index, address
+        # and rendered subject
+        groups: Dict[Hashable, Tuple[Mapping[str, str], List[Tuple[int, str, str]]]] = {}
+        substituted: List[Tuple[int, str, Dict[str, str]]] = []
+        for index, record in enumerate(records):
+            results.append(False)
+            if "to_email" not in record:
+                logger.warning("Skipping record: missing to_email field")
+                if on_result is not None:
+                    on_result([index], SendOutcome(False))
+                continue
+            if template is not None:
+                with timed(self._metrics, STAGE_RENDER):
+                    substitutions = template.substitutions(record)
+                if substitutions is not None:
+                    substituted.append((index, record["to_email"], substitutions))
+                    continue
+            with timed(self._metrics, STAGE_RENDER):
+                record_subject = self.format_with_fallback(subject, record)
+                key = content_template.render_key(record)
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = (record, [])
+            group[1].append((index, record["to_email"], record_subject))
+
+        builder = payload_builder(from_email, "text/html" if is_markdown else "text/plain")
+        for example, recipients in groups.values():
+            with timed(self._metrics, STAGE_RENDER):
+                body = content_template.render(example)
+            if is_markdown:
+                with timed(self._metrics, STAGE_MARKDOWN):
+                    body = convert_markdown_to_html(body)
+            for chunk in self._chunk_recipients(
+                recipients, len(body), lambda recipient: len(recipient[1]) + len(recipient[2])
+            ):
+                with timed(self._metrics, STAGE_SERIALIZE):
+                    subjects = {recipient_subject for _, _, recipient_subject in chunk}
+                    if len(subjects) == 1:
+                        payload = builder.build_many(
+                            (email for _, email, _ in chunk), subjects.pop(), body
+                        )
+                    else:
+                        payload = builder.build_personalized(
+                            ((email, recipient_subject) for _, email, recipient_subject in chunk),
+                            body,
+                        )
+                self._record_chunk(
+                    results,
+                    [index for index, _, _ in chunk],
+                    self._post(payload, f"{len(chunk)} recipients", len(chunk)),
+                    on_result,
+                )
+
+        if template is not None:
+            base_size = len(template.subject) + len(template.content)
+            for substituted_chunk in self._chunk_recipients(
+                substituted, base_size, self._substituted_size
+            ):
+                with timed(self._metrics, STAGE_SERIALIZE):
+                    payload = builder.build_substitutions(
+                        ((email, values) for _, email, values in substituted_chunk),
+                        template.subject,
+                        template.content,
+                    )
+                count = len(substituted_chunk)
+                self._record_chunk(
+                    results,
+                    [index for index, _, _ in substituted_chunk],
+                    self._post(payload, f"{count} recipients", count),
+                    on_result,
+                )
+
+        return results
 
-        try:
-            conn = http.client.HTTPSConnection("api.sendgrid.com")
-            conn.request("POST", "/v3/mail/send", body=json.dumps(payload), headers=headers)
+    @staticmethod
+    def _record_chunk(
+        results: List[bool],
+        indices: List[int],
+        outcome: SendOutcome,
+        on_result: Optional[Callable[[List[int], SendOutcome], None]],
+    ) -> None:
+        """Store the outcome of one request for each of its records and report it."""
+        if outcome.success:
+            for index in indices:
+                results[index] = True
+        if on_result is not None:
+            on_result(indices, outcome)
 
-            response = conn.getresponse()
-            conn.close()
+    @staticmethod
+    def _substituted_size(recipient: Tuple[int, str, Dict[str, str]]) -> int:
+        """Approximate serialized size of a personalization carrying substitutions."""
+        return len(recipient[1]) + sum(
+            len(tag) + len(value) + SUBSTITUTION_OVERHEAD_BYTES
+            for tag, value in recipient[2].items()
+        )
 
-            if response.status == SENDGRID_SUCCESS_STATUS:
-                logger.info(f"Email sent successfully to {to_email}")
-                return True
+    @staticmethod
+    def _chunk_recipients(
+        recipients: List[T], base_size: int, recipient_size: Callable[[T], int]
+    ) -> Iterator[List[T]]:
+        """Split recipients into chunks that respect SendGrid's request limits."""
+        chunk: List[T] = []
+        size = base_size
+        for recipient in recipients:
+            entry_size = recipient_size(recipient) + PERSONALIZATION_OVERHEAD_BYTES
+            if chunk and (
+                len(chunk) >= MAX_PERSONALIZATIONS or size + entry_size > MAX_REQUEST_BYTES
+            ):
+                yield chunk
+                chunk, size = [], base_size
+            chunk.append(recipient)
+            size += entry_size
+        if chunk:
+            yield chunk
+
+    def _post(self, payload: bytes, recipient: str, recipient_count: int = 1) -> SendOutcome:
+        """
+        POST a serialized payload to SendGrid.
 
-            error_msg = response.read().decode()
-            logger.error(f"SendGrid API error (status {response.status}): {error_msg}")
-            return False
+        Args:
+            payload: Serialized request body
+            recipient: Description of the recipient(s) used in log messages
+            recipient_count: Number of recipients in the request, for metrics
 
-        except Exception as e:
-            logger.error(f"Failed to send email to {to_email}: {e!s}")
-            return False
+        Returns:
+            SendOutcome: Whether SendGrid accepted the request, with the last response
+            status or exception
+        """
+        attempt = 1
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+
+            self._count(COUNTER_REQUESTS)
+            self._count(COUNTER_BYTES_OUT, len(payload))
+            try:
+                response = self._pool.request(
+                    "POST", self.mail_send_path, body=payload, headers=self._request_headers()
+                )
+            except Exception as e:
+                delay = self._retry_delay(attempt, error=e)
+                if delay is None:
+                    logger.error(f"Failed to send email to {recipient}: {e!s}")
+                    self._count(COUNTER_FAILED, recipient_count)
+                    return SendOutcome(False, error=e)
+                logger.warning(f"Failed to send email to {recipient}, retrying: {e!s}")
+            else:
+                if self.rate_limiter is not None:
+                    self.rate_limiter.update(response.status, response.headers)
+
+                if response.status == SENDGRID_SUCCESS_STATUS:
+                    logger.info(f"Email sent successfully to {recipient}")
+                    self._count(COUNTER_SENT, recipient_count)
+                    return SendOutcome(True, response.status)
+
+                error_msg = response.body.decode()
+                delay = self._retry_delay(attempt, response=response)
+                if delay is None:
+                    logger.error(f"SendGrid API error (status {response.status}): {error_msg}")
+                    self._count(COUNTER_FAILED, recipient_count)
+                    return SendOutcome(False, response.status)
+                logger.warning(
+                    f"SendGrid API error (status {response.status}), retrying {recipient}"
+                )
+
+            self._count(COUNTER_RETRIED)
+            attempt += 1
+            if delay > 0:
+                time.sleep(delay)
@@ -0,0 +1,724 @@
+"""
+Long-running send server accepting jobs over localhost HTTP or a Unix socket.
+"""
+
+import http.client
+import ipaddress
+import json
+import logging
+import os
+import queue
+import socket
+import socketserver
+import stat
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import TracebackType
+from typing import (
+    Any,
+    ClassVar,
+    Dict,
+    Hashable,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    Type,
+    Union,
+    cast,
+)
+from urllib.parse import parse_qs, urlsplit
+
+from swecc_email_sender.core.metrics import SenderMetrics
+from swecc_email_sender.core.sender import EmailSender
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8025
+# Recipients after which a micro-batch is sent without waiting for more jobs
+DEFAULT_MAX_BATCH = 1000
+# Seconds the first job of a micro-batch waits for others to join it
+DEFAULT_MAX_DELAY = 0.05
+# Jobs whose status can still be looked up, oldest forgotten first
+DEFAULT_MAX_JOBS = 10000
+# Largest job request body accepted, in bytes
+DEFAULT_MAX_REQUEST_BYTES = 32 * 1024 * 1024
+
+# Longest identifier a client may choose for its job
+MAX_JOB_ID_LENGTH = 128
+
+JOB_QUEUED = "queued"
+JOB_SENDING = "sending"
+JOB_DONE = "done"
+
+
+def new_job_id() -> str:
+    """Random job identifier."""
+    return os.urandom(8).hex()
+
+
+def is_loopback_host(host: str) -> bool:
+    """
+    Whether every address a host name or address resolves to is a loopback address.
+
+    Raises:
+        OSError: If the host cannot be resolved
+    """
+    if not host:
+        # Binding to the empty host listens on every interface
+        return False
+    addresses = {info[4][0] for info in socket.getaddrinfo(host, None, type=socket.SOCK_STREAM)}
+    # IPv6 addresses may carry a "%interface" scope
+    return all(
+        ipaddress.ip_address(str(address).split("%")[0]).is_loopback for address in addresses
+    )
+
+
+class Job:
+    """An email template and the recipients to send it to, submitted to a SendServer."""
+
+    def __init__(
+        self,
+        subject: str,
+        content: str,
+        from_email: str,
+        records: List[Dict[str, str]],
+        is_markdown: bool = False,
+        job_id: Optional[str] = None,
+    ):
+        """
+        Create a queued job.
+
+        Args:
+            subject: Email subject (can include format specifiers)
+            content: Email body content (can include format specifiers)
+            from_email: Sender email address
+            records: Template data for each recipient; each must contain ``to_email``
+            is_markdown: Whether the content is Markdown
+            job_id: Identifier chosen by the client (random if omitted); a server only
+                accepts a job once per identifier, so a submission can be safely retried
+        """
+        self.id = job_id or new_job_id()
+        self.subject = subject
+        self.content = content
+        self.from_email = from_email
+        self.records = records
+        self.is_markdown = is_markdown
+        self.state = JOB_QUEUED
+        self.results: Optional[List[bool]] = None
+        self.submitted = time.time()
+        self._done = threading.Event()
+
+    @classmethod
+    def from_dict(cls, data: Any) -> "Job":
+        """
+        Create a job from a decoded JSON request.
+
+        Args:
+            data: Object with ``subject``, ``content``, ``from_email`` and ``recipients``
+                (a list of objects), and optionally ``markdown`` and ``id``
+
+        Returns:
+            The job, with every recipient value converted to a string
+
+        Raises:
+            ValueError: If a field is missing or has the wrong type
+        """
+        if not isinstance(data, dict):
+            raise ValueError("job must be a JSON object")
+        for field in ("subject", "content", "from_email"):
+            if not isinstance(data.get(field), str):
+                raise ValueError(f"job field {field!r} must be a string")
+        recipients = data.get("recipients")
+        if not isinstance(recipients, list) or not all(
+            isinstance(record, dict) for record in recipients
+        ):
+            raise ValueError("job field 'recipients' must be a list of objects")
+        is_markdown = data.get("markdown", False)
+        if not isinstance(is_markdown, bool):
+            raise ValueError("job field 'markdown' must be a boolean")
+        job_id = data.get("id")
+        if job_id is not None and not (
+            isinstance(job_id, str) and 0 < len(job_id) <= MAX_JOB_ID_LENGTH
+        ):
+            raise ValueError(
+                f"job field 'id' must be a non-empty string of at most {MAX_JOB_ID_LENGTH} "
+                "characters"
+            )
+        return cls(
+            data["subject"],
+            data["content"],
+            data["from_email"],
+            [{str(k): str(v) for k, v in record.items()} for record in recipients],
+            is_markdown,
+            job_id,
+        )
+
+    @property
+    def template_key(self) -> Hashable:
+        """Jobs with equal keys are sent together in one batch."""
+        return (self.subject, self.content, self.from_email, self.is_markdown)
+
+    def finish(self, results: List[bool]) -> None:
+        """Record each recipient's outcome and wake up waiters."""
+        self.results = results
+        self.state = JOB_DONE
+        self._done.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until every recipient has been sent to.
+
+        Args:
+            timeout: Maximum seconds to wait (forever if omitted)
+
+        Returns:
+            True if the job is done
+        """
+        return self._done.wait(timeout)
+
+    def status(self) -> Dict[str, Any]:
+        """
+        Progress of the job.
+
+        Returns:
+            Dictionary with the job ``id``, ``state`` and recipient count, plus the
+            ``sent`` count and ``failed`` addresses once it is done
+        """
+        status: Dict[str, Any] = {
+            "id": self.id,
+            "state": self.state,
+            "recipients": len(self.records),
+        }
+        if self.results is not None:
+            status["sent"] = sum(self.results)
+            status["failed"] = [
+                record.get("to_email")
+                for record, success in zip(self.records, self.results)
+                if not success
+            ]
+        return status
+
+
+class MicroBatcher:
+    """
+    Collects jobs arriving close together and sends them with as few requests as possible.
+
+    The first job of a batch waits up to ``max_delay`` seconds for others to arrive,
+    or until ``max_batch`` recipients are queued. Jobs using the same templates are
+    then merged into a single ``send_batch`` call, so small jobs from many clients
+    share multi-recipient requests.
+    """
+
+    def __init__(
+        self,
+        sender: EmailSender,
+        max_batch: int = DEFAULT_MAX_BATCH,
+        max_delay: float = DEFAULT_MAX_DELAY,
+        workers: int = 1,
+        server_side: bool = False,
+    ):
+        """
+        Start the batching thread.
+
+        Args:
+            sender: Sender shared by every batch
+            max_batch: Recipients after which a batch is sent without further waiting
+            max_delay: Seconds a batch waits for more jobs
+            workers: Batches that may be sent concurrently
+            server_side: Let SendGrid substitute each recipient's values
+        """
+        if max_batch < 1:
+            raise ValueError("max_batch must be at least 1")
+        self.sender = sender
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.server_side = server_side
+        self._queue: queue.Queue[Optional[Job]] = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, job: Job) -> None:
+        """Queue a job for the next batch."""
+        self._queue.put(job)
+
+    def close(self) -> None:
+        """Send every queued job, then stop."""
+        self._queue.put(None)
+        self._thread.join()
+        self._executor.shutdown(wait=True)
+
+    def _run(self) -> None:
+        """Gather jobs into batches until closed."""
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            jobs = [job]
+            size = len(job.records)
+            deadline = time.monotonic() + self.max_delay
+            closing = False
+            while size < self.max_batch:
+                timeout = deadline - time.monotonic()
+                try:
+                    job = (
+                        self._queue.get(timeout=timeout)
+                        if timeout > 0
+                        else self._queue.get_nowait()
+                    )
+                except queue.Empty:
+                    break
+                if job is None:
+                    closing = True
+                    break
+                jobs.append(job)
+                size += len(job.records)
+            self._flush(jobs)
+            if closing:
+                return
+
+    def _flush(self, jobs: List[Job]) -> None:
+        """Hand each group of jobs sharing templates to a sending thread."""
+        groups: Dict[Hashable, List[Job]] = {}
+        for job in jobs:
+            job.state = JOB_SENDING
+            groups.setdefault(job.template_key, []).append(job)
+        for group in groups.values():
+            self._executor.submit(self._send, group)
+
+    def _send(self, jobs: List[Job]) -> None:
+        """Send the recipients of jobs sharing templates in one batch."""
+        first = jobs[0]
+        records = [record for job in jobs for record in job.records]
+        try:
+            results = self.sender.send_batch(
+                records,
+                first.subject,
+                first.content,
+                first.from_email,
+                first.is_markdown,
+                server_side=self.server_side,
+            )
+        except Exception as e:
+            logger.error(f"Error sending batch of {len(jobs)} jobs: {e!s}")
+            results = [False] * len(records)
+
+        logger.info(f"Sent {sum(results)}/{len(records)} emails from {len(jobs)} jobs")
+        offset = 0
+        for job in jobs:
+            job.finish(results[offset : offset + len(job.records)])
+            offset += len(job.records)
+
+
+class _JobRequestHandler(BaseHTTPRequestHandler):
+    """
+    Job API requests.
+
+    ``POST /jobs`` submits a job (``?wait=1`` answers once it is done),
+    ``GET /jobs/<id>`` returns its status, and ``GET /health`` and ``GET /metrics``
+    report on the server.
+    """
+
+    protocol_version = "HTTP/1.1"
+    send_server: ClassVar["SendServer"]
+
+    def log_message(self, format: str, *args: Any) -> None:
+        """Log requests at debug level; Unix socket clients have no address to print."""
+        logger.debug(format % args)
+
+    def _reply(
+        self,
+        status: int,
+        body: Any,
+        content_type: str = "application/json",
+        close: bool = False,
+    ) -> None:
+        """
+        Send a complete response with a Content-Length so the connection stays open.
+
+        Args:
+            status: HTTP status
+            body: Text, or an object to send as JSON
+            content_type: Content type of the body
+            close: Close the connection afterwards, e.g. because the request body
+                was not read
+        """
+        data = body.encode() if isinstance(body, str) else json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        if close:
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_body(self) -> Optional[bytes]:
+        """Read the request body, or reply with an error and return None."""
+        header = self.headers.get("Content-Length")
+        if header is None or "Transfer-Encoding" in self.headers:
+            self._reply(411, {"error": "Content-Length required"}, close=True)
+            return None
+        try:
+            length = int(header)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self._reply(400, {"error": "invalid Content-Length"}, close=True)
+            return None
+        max_bytes = self.send_server.max_request_bytes
+        if length > max_bytes:
+            self._reply(413, {"error": f"request body exceeds {max_bytes} bytes"}, close=True)
+            return None
+        return self.rfile.read(length)
+
+    def do_POST(self) -> None:
+        """Submit a job."""
+        url = urlsplit(self.path)
+        body = self._read_body()
+        if body is None:
+            return
+        if url.path != "/jobs":
+            self._reply(404, {"error": "not found"})
+            return
+
+        try:
+            job = Job.from_dict(json.loads(body))
+        except ValueError as e:
+            self._reply(400, {"error": str(e)})
+            return
+
+        job = self.send_server.submit(job)
+        if parse_qs(url.query).get("wait", ["0"])[0] in ("1", "true"):
+            job.wait()
+            self._reply(200, job.status())
+        else:
+            self._reply(202, job.status())
+
+    def do_GET(self) -> None:
+        """Report a job's status, the server's health or its metrics."""
+        path = urlsplit(self.path).path
+        if path == "/health":
+            self._reply(200, {"status": "ok"})
+        elif path == "/metrics":
+            self._reply(200, self.send_server.metrics_text(), "text/plain; version=0.0.4")
+        elif path.startswith("/jobs/"):
+            job = self.send_server.get_job(path[len("/jobs/") :])
+            if job is None:
+                self._reply(404, {"error": "unknown job"})
+            else:
+                self._reply(200, job.status())
+        else:
+            self._reply(404, {"error": "not found"})
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+
+if sys.platform != "win32":
+
+    class _UnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+
+
+class SendServer:
+    """
+    Long-lived sending process serving a job API.
+
+    One EmailSender, and so one pool of warm connections, rate limiter and set of
+    compiled templates, serves every job. Jobs are accepted over localhost HTTP or a
+    Unix socket and micro-batched into multi-recipient SendGrid requests.
+    """
+
+    def __init__(
+        self,
+        sender: EmailSender,
+        address: Union[Tuple[str, int], str] = (DEFAULT_HOST, DEFAULT_PORT),
+        max_batch: int = DEFAULT_MAX_BATCH,
+        max_delay: float = DEFAULT_MAX_DELAY,
+        workers: int = 1,
+        server_side: bool = False,
+        metrics: Optional[SenderMetrics] = None,
+        max_jobs: int = DEFAULT_MAX_JOBS,
+        allow_remote: bool = False,
+        max_request_bytes: int = DEFAULT_MAX_REQUEST_BYTES,
+    ):
+        """
+        Bind the server and start batching.
+
+        Args:
+            sender: Sender shared by every job
+            address: (host, port) to serve HTTP on, or the path of a Unix socket
+            max_batch: Recipients after which a batch is sent without further waiting
+            max_delay: Seconds a batch waits for more jobs
+            workers: Batches that may be sent concurrently
+            server_side: Let SendGrid substitute each recipient's values
+            metrics: Collector passed to the sender, served at ``/metrics``
+            max_jobs: Jobs whose status is kept for lookups
+            allow_remote: Serve HTTP on a non-loopback address; the job API has no
+                authentication, so anyone who can reach it sends with the sender's key
+            max_request_bytes: Largest job request body accepted
+
+        Raises:
+            FileExistsError: If the socket path exists and is not a socket
+            ValueError: If the HTTP address is not a loopback address and
+                ``allow_remote`` is not set
+        """
+        self.sender = sender
+        self.metrics = metrics
+        self.max_jobs = max_jobs
+        self.max_request_bytes = max_request_bytes
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        self._jobs_lock = threading.Lock()
+
+        # Responses are written as headers then body; without TCP_NODELAY Nagle's
+        # algorithm holds the body back until the client's delayed ACK
+        handler = type(
+            "JobRequestHandler",
+            (_JobRequestHandler,),
+            {"send_server": self, "disable_nagle_algorithm": not isinstance(address, str)},
+        )
+        self.socket_path: Optional[str] = None
+        self._server: socketserver.BaseServer
+        if isinstance(address, str):
+            if sys.platform == "win32":
+                raise ValueError("Unix sockets are not supported on Windows")
+            # A socket left behind by a previous run would make binding fail, but any
+            # other file at the path is not ours to remove
+            try:
+                mode = os.lstat(address).st_mode
+            except FileNotFoundError:
+                pass
+            else:
+                if not stat.S_ISSOCK(mode):
+                    raise FileExistsError(f"{address} exists and is not a socket")
+                os.unlink(address)
+            # Only the owner may submit jobs; the umask applies the permissions as the
+            # socket is created, leaving no window in which others could connect
+            previous_umask = os.umask(0o177)
+            try:
+                self._server = _UnixHTTPServer(address, handler)
+            finally:
+                os.umask(previous_umask)
+            self.socket_path = address
+        else:
+            # Checked before binding, so a refused address is never listened on
+            host = address[0]
+            if not is_loopback_host(host):
+                if not allow_remote:
+                    raise ValueError(
+                        f"Refusing to serve on non-loopback address {host!r} without "
+                        "allow_remote"
+                    )
+                logger.warning(
+                    f"Serving on non-loopback address {host!r}: the job API has no "
+                    "authentication, so anyone who can reach it sends with this API key"
+                )
+            self._server = _HTTPServer(address, handler)
+        self.batcher = MicroBatcher(sender, max_batch, max_delay, workers, server_side)
+
+    @property
+    def address(self) -> Union[Tuple[str, int], str]:
+        """Address the server is listening on, with the port chosen if 0 was given."""
+        if self.socket_path is not None:
+            return self.socket_path
+        host, port = cast(Tuple[str, int], self._server.server_address)[:2]
+        return host, port
+
+    def submit(self, job: Job) -> Job:
+        """
+        Queue a job for sending, unless a job with the same id was already submitted.
+
+        Args:
+            job: Job to send
+
+        Returns:
+            The queued job, or the earlier job with the same id, whose ``wait`` and
+            ``status`` methods follow its progress
+        """
+        with self._jobs_lock:
+            existing = self._jobs.get(job.id)
+            if existing is not None:
+                logger.debug(f"Job {job.id} was already submitted")
+                return existing
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+        self.batcher.submit(job)
+        return job
+
+    def get_job(self, job_id: str) -> Optional[Job]:
+        """Look up a recently submitted job."""
+        with self._jobs_lock:
+            return self._jobs.get(job_id)
+
+    def metrics_text(self) -> str:
+        """Metrics in the Prometheus text format, empty without a collector."""
+        return self.metrics.to_prometheus() if self.metrics is not None else ""
+
+    def serve_forever(self) -> None:
+        """Handle requests until ``shutdown`` is called from another thread."""
+        logger.info(f"Serving jobs on {self.address}")
+        self._server.serve_forever()
+
+    def shutdown(self) -> None:
+        """Stop ``serve_forever``; must not be called from the thread running it."""
+        self._server.shutdown()
+
+    def close(self) -> None:
+        """Stop accepting requests, send every queued job and close the sender."""
+        self._server.server_close()
+        if self.socket_path is not None and os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self.batcher.close()
+        self.sender.close()
+
+    def __enter__(self) -> "SendServer":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP connection over a Unix socket."""
+
+    def __init__(self, path: str, timeout: Optional[float] = None):
+        super().__init__("localhost", timeout=timeout)
+        self.path = path
+
+    def connect(self) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+class ServerClient:
+    """
+    Client submitting jobs to a SendServer over one keep-alive connection.
+
+    Not thread-safe; give each thread its own client.
+    """
+
+    def __init__(
+        self,
+        port: int = DEFAULT_PORT,
+        host: str = DEFAULT_HOST,
+        socket_path: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ):
+        """
+        Initialize the client; the connection is opened on first use.
+
+        Args:
+            port: Port of a server listening on HTTP
+            host: Host of a server listening on HTTP
+            socket_path: Path of a server's Unix socket, used instead of host and port
+            timeout: Socket timeout in seconds
+        """
+        self._connection: http.client.HTTPConnection
+        if socket_path is not None:
+            self._connection = _UnixHTTPConnection(socket_path, timeout)
+        else:
+            self._connection = http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def _request(self, method: str, path: str, body: Optional[bytes] = None) -> Dict[str, Any]:
+        """
+        Make a request, reconnecting once if the server closed the idle connection.
+
+        Only requests that are safe to repeat may be made: a failed request may have
+        reached the server before the connection broke.
+        """
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        for attempt in range(2):
+            try:
+                self._connection.request(method, path, body, headers)
+                response = self._connection.getresponse()
+                data = response.read()
+                break
+            except (http.client.RemoteDisconnected, ConnectionError):
+                self._connection.close()
+                if attempt:
+                    raise
+        result: Dict[str, Any] = json.loads(data)
+        if response.status >= 400:
+            raise RuntimeError(f"Server returned {response.status}: {result.get('error')}")
+        return result
+
+    def submit(
+        self,
+        recipients: List[Mapping[str, Any]],
+        subject: str,
+        content: str,
+        from_email: str,
+        is_markdown: bool = False,
+        wait: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        Submit a job.
+
+        The job carries an id chosen here, so that the server ignores it if a retry
+        after a broken connection repeats a submission it already received.
+
+        Args:
+            recipients: Template data for each recipient; each must contain ``to_email``
+            subject: Email subject (can include format specifiers)
+            content: Email body content (can include format specifiers)
+            from_email: Sender email address
+            is_markdown: Whether the content is Markdown
+            wait: Return only once every recipient has been sent to
+
+        Returns:
+            The job's status, including its ``id``
+
+        Raises:
+            RuntimeError: If the server rejected the job
+        """
+        body = json.dumps(
+            {
+                "id": new_job_id(),
+                "subject": subject,
+                "content": content,
+                "from_email": from_email,
+                "markdown": is_markdown,
+                "recipients": recipients,
+            }
+        ).encode()
+        return self._request("POST", "/jobs?wait=1" if wait else "/jobs", body)
+
+    def status(self, job_id: str) -> Dict[str, Any]:
+        """
+        Look up a job's status.
+
+        Raises:
+            RuntimeError: If the server does not know the job
+        """
+        return self._request("GET", f"/jobs/{job_id}")
+
+    def close(self) -> None:
+        """Close the connection."""
+        self._connection.close()
+
+    def __enter__(self) -> "ServerClient":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        self.close()
@@ -0,0 +1,364 @@
+"""
+Sending from several worker processes to use every CPU core.
+"""
+
+import logging
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    ClassVar,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+
+from swecc_email_sender.core.credentials import CredentialProvider, default_credential_provider
+from swecc_email_sender.core.metrics import SenderMetrics
+from swecc_email_sender.core.pool import DEFAULT_POOL_SIZE, SENDGRID_API_URL
+from swecc_email_sender.core.ratelimit import RateLimiter
+from swecc_email_sender.core.retry import RetryPolicy
+from swecc_email_sender.core.sender import EmailSender, prompt_for_api_key
+
+if TYPE_CHECKING:
+    from multiprocessing.sharedctypes import Synchronized
+
+logger = logging.getLogger(__name__)
+
+# Records sent to a worker process at a time
+DEFAULT_CHUNK_SIZE = 200
+# Chunks queued per process ahead of the results being consumed
+CHUNKS_IN_FLIGHT_PER_PROCESS = 2
+
+
+class _WorkerConfig(NamedTuple):
+    """Everything a worker process needs to build its sender; must be picklable."""
+
+    api_key: str
+    api_url: str
+    pool_size: int
+    threads: int
+    rate: Optional[float]
+    burst: Optional[int]
+    retry_kwargs: Optional[Dict[str, Any]]
+    precompile_markdown: bool
+    collect_metrics: bool
+    subject: str
+    content: str
+    from_email: str
+    is_markdown: bool
+    batch: bool
+    server_side: bool
+
+
+class _SharedBudgetRetryPolicy(RetryPolicy):
+    """Retry policy whose budget is shared by every worker process of a send."""
+
+    def __init__(self, retries_used: "Synchronized[int]", **kwargs: Any):
+        super().__init__(**kwargs)
+        self._shared_retries_used = retries_used
+
+    @property
+    def retries_used(self) -> int:
+        """Number of retries granted so far by every process."""
+        return self._shared_retries_used.value
+
+    def reset_budget(self) -> None:
+        """Keep the budget: it covers the whole send, not each chunk sent as a batch."""
+
+    def _consume_budget(self) -> bool:
+        """Take one retry from the budget shared between processes."""
+        with self._shared_retries_used.get_lock():
+            used = self._shared_retries_used.value
+            if self.retry_budget is not None and used >= self.retry_budget:
+                return False
+            self._shared_retries_used.value = used + 1
+        return True
+
+
+class _Worker:
+    """Sender state of one worker process."""
+
+    # The worker of the current process, created by the pool initializer
+    current: ClassVar[Optional["_Worker"]] = None
+
+    def __init__(self, config: _WorkerConfig, retries_used: "Synchronized[int]"):
+        self.config = config
+        self.metrics = SenderMetrics() if config.collect_metrics else None
+        retry_policy = None
+        if config.retry_kwargs is not None:
+            retry_policy = _SharedBudgetRetryPolicy(retries_used, **config.retry_kwargs)
+        self.sender = EmailSender(
+            config.api_key,
+            pool_size=config.pool_size,
+            rate_limiter=RateLimiter(config.rate, config.burst) if config.rate else None,
+            retry_policy=retry_policy,
+            precompile_markdown=config.precompile_markdown,
+            api_url=config.api_url,
+            metrics=self.metrics,
+        )
+        self.executor = (
+            ThreadPoolExecutor(max_workers=config.threads) if config.threads > 1 else None
+        )
+
+    def send_one(self, record: Mapping[str, str]) -> bool:
+        if "to_email" not in record:
+            logger.warning("Skipping record: missing to_email field")
+            return False
+        config = self.config
+        return self.sender.send_email(
+            record["to_email"],
+            config.subject,
+            config.content,
+            config.from_email,
+            config.is_markdown,
+            template_data=record,
+        )
+
+    def send(self, records: List[Dict[str, Any]]) -> Tuple[List[bool], Optional[SenderMetrics]]:
+        config = self.config
+        if config.batch:
+            results = self.sender.send_batch(
+                records,
+                config.subject,
+                config.content,
+                config.from_email,
+                config.is_markdown,
+                server_side=config.server_side,
+            )
+        elif self.executor is not None:
+            results = list(self.executor.map(self.send_one, records))
+        else:
+            results = [self.send_one(record) for record in records]
+        return results, self.metrics.drain() if self.metrics is not None else None
+
+
+def _init_worker(config: _WorkerConfig, retries_used: "Synchronized[int]") -> None:
+    """Process pool initializer creating the process's sender."""
+    _Worker.current = _Worker(config, retries_used)
+
+
+def _send_chunk(records: List[Dict[str, Any]]) -> Tuple[List[bool], Optional[SenderMetrics]]:
+    """Send a chunk of records from a worker process."""
+    worker = _Worker.current
+    if worker is None:
+        raise RuntimeError("worker process was not initialized")
+    return worker.send(records)
+
+
+def _retry_kwargs(policy: Optional[RetryPolicy]) -> Optional[Dict[str, Any]]:
+    """Arguments recreating a retry policy in each process."""
+    if policy is None:
+        return None
+    return {
+        "max_attempts": policy.max_attempts,
+        "backoff_base": policy.backoff_base,
+        "backoff_cap": policy.backoff_cap,
+        "jitter": policy.jitter,
+        "retry_statuses": policy.retry_statuses,
+        "retry_exceptions": policy.retry_exceptions,
+        "retry_budget": policy.retry_budget,
+    }
+
+
+class ShardedSender:
+    """
+    Sends templated emails from several worker processes.
+
+    Rendering and Markdown conversion hold the GIL, so a single process cannot use
+    more than one core however many threads send. ShardedSender reads records in the
+    parent, hands them to worker processes in chunks and yields the results back in
+    record order. Each process has its own EmailSender and connection pool; a rate
+    limiter is split evenly between the processes, while a retry budget is shared by
+    all of them and covers the whole send.
+    """
+
+    def __init__(
+        self,
+        processes: int,
+        api_key: Optional[str] = None,
+        threads: int = 1,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        rate_limiter: Optional[RateLimiter] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        precompile_markdown: bool = False,
+        api_url: str = SENDGRID_API_URL,
+        metrics: Optional[SenderMetrics] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        credential_provider: Optional[CredentialProvider] = None,
+    ):
+        """
+        Initialize the sender; worker processes are started for each send.
+
+        Args:
+            processes: Number of worker processes
+            api_key: SendGrid API key (loaded from env or config file if omitted)
+            threads: Concurrent sending threads in each process
+            pool_size: Maximum keep-alive connections in each process
+            rate_limiter: Limiter whose rate and burst are divided between the processes
+            retry_policy: Policy recreated in each process; its retry budget is spent
+                jointly by every process over the whole send
+            precompile_markdown: Convert Markdown templates to HTML once per process
+            api_url: SendGrid API base URL, e.g. to target a local test server
+            metrics: Optional collector receiving every process's timings and counters
+            chunk_size: Records handed to a process at a time
+            credential_provider: Source of the API key when none is given, asked
+                again at the start of every send
+        """
+        if processes < 1:
+            raise ValueError("processes must be at least 1")
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        self.processes = processes
+        self.api_key = api_key
+        self.threads = threads
+        self.pool_size = max(pool_size, threads)
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy
+        self.precompile_markdown = precompile_markdown
+        self.api_url = api_url
+        self.metrics = metrics
+        self.chunk_size = chunk_size
+        self.credential_provider = credential_provider or default_credential_provider()
+
+    def _config(
+        self,
+        subject: str,
+        content: str,
+        from_email: str,
+        is_markdown: bool,
+        batch: bool,
+        server_side: bool,
+    ) -> _WorkerConfig:
+        """Settings for the worker processes of one send."""
+        # Worker processes cannot prompt, so the key is resolved up front
+        api_key = self.api_key or self.credential_provider.get_api_key()
+        if not api_key:
+            api_key = self.api_key = prompt_for_api_key()
+
+        rate = burst = None
+        if self.rate_limiter is not None:
+            rate = self.rate_limiter.rate / self.processes
+            burst = max(1, self.rate_limiter.burst // self.processes)
+
+        return _WorkerConfig(
+            api_key=api_key,
+            api_url=self.api_url,
+            pool_size=self.pool_size,
+            threads=self.threads,
+            rate=rate,
+            burst=burst,
+            retry_kwargs=_retry_kwargs(self.retry_policy),
+            precompile_markdown=self.precompile_markdown,
+            collect_metrics=self.metrics is not None,
+            subject=subject,
+            content=content,
+            from_email=from_email,
+            is_markdown=is_markdown,
+            batch=batch,
+            server_side=server_side,
+        )
+
+    def iter_send(
+        self,
+        records: Iterable[Mapping[str, str]],
+        subject: str,
+        content: str,
+        from_email: str,
+        is_markdown: bool = False,
+        batch: bool = False,
+        server_side: bool = False,
+    ) -> Iterator[Tuple[Mapping[str, str], bool]]:
+        """
+        Send to every record, yielding each record with its outcome in record order.
+
+        Records are read lazily, a few chunks ahead of the results being consumed.
+
+        Args:
+            records: Template data for each recipient; each must contain ``to_email``
+            subject: Email subject (can include format specifiers)
+            content: Email body content (can include format specifiers)
+            from_email: Sender email address
+            is_markdown: Whether the content is Markdown
+            batch: Pack identical emails within each chunk into multi-recipient requests
+            server_side: With batch, let SendGrid substitute each recipient's values
+
+        Yields:
+            (record, success) pairs
+        """
+        # Loads multiprocessing, which other senders never need
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        config = self._config(subject, content, from_email, is_markdown, batch, server_side)
+        context = multiprocessing.get_context()
+        retries_used = context.Value("i", 0)
+        max_pending = self.processes * CHUNKS_IN_FLIGHT_PER_PROCESS
+        pending: Deque[Tuple[List[Mapping[str, str]], Future[Any]]] = deque()
+        iterator = iter(records)
+
+        with ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(config, retries_used),
+        ) as executor:
+
+            def collect() -> Iterator[Tuple[Mapping[str, str], bool]]:
+                chunk, future = pending.popleft()
+                results, metrics = future.result()
+                if metrics is not None and self.metrics is not None:
+                    self.metrics.merge(metrics)
+                yield from zip(chunk, results)
+
+            while True:
+                chunk = list(islice(iterator, self.chunk_size))
+                if not chunk:
+                    break
+                # Plain dictionaries pickle compactly, unlike e.g. RecipientTable rows
+                payload = [dict(record) for record in chunk]
+                pending.append((chunk, executor.submit(_send_chunk, payload)))
+                if len(pending) >= max_pending:
+                    yield from collect()
+            while pending:
+                yield from collect()
+
+    def send_all(
+        self,
+        records: Iterable[Mapping[str, str]],
+        subject: str,
+        content: str,
+        from_email: str,
+        is_markdown: bool = False,
+        batch: bool = False,
+        server_side: bool = False,
+    ) -> List[bool]:
+        """
+        Send to every record.
+
+        Args:
+            records: Template data for each recipient; each must contain ``to_email``
+            subject: Email subject (can include format specifiers)
+            content: Email body content (can include format specifiers)
+            from_email: Sender email address
+            is_markdown: Whether the content is Markdown
+            batch: Pack identical emails within each chunk into multi-recipient requests
+            server_side: With batch, let SendGrid substitute each recipient's values
+
+        Returns:
+            List of booleans, one per record, True if that recipient's email was accepted
+        """
+        return [
+            success
+            for _, success in self.iter_send(
+                records, subject, content, from_email, is_markdown, batch, server_side
+            )
+        ]
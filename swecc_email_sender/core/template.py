@@ -0,0 +1,417 @@
+"""
+Compiled email templates using ``str.format`` field syntax.
+"""
+
+import hashlib
+import html
+import logging
+import os
+import re
+from functools import lru_cache
+from string import Formatter
+from typing import Any, Dict, Hashable, List, Mapping, Optional, Tuple
+
+from swecc_email_sender.utils.markdown_utils import convert_markdown_to_html
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_CACHE_SIZE = 256
+# Bytes of the digest identifying rendered text in render_key
+RENDER_KEY_DIGEST_SIZE = 16
+
+
+class _FallbackDict(Dict[str, Any]):
+    """Mapping that returns a fallback value for missing keys."""
+
+    def __init__(self, data: Mapping[str, Any], fallback: str):
+        super().__init__(data)
+        self.fallback = fallback
+
+    def __missing__(self, _: str) -> str:
+        return self.fallback
+
+
+def _field_value(data: Mapping[str, Any], field_name: str, fallback: str) -> str:
+    """Value of a field as the string that would be substituted into a template."""
+    value = data.get(field_name, fallback)
+    return value if type(value) is str else format(value, "")
+
+
+def _is_simple_field(
+    field_name: str, format_spec: Optional[str], conversion: Optional[str]
+) -> bool:
+    """Whether a field is a plain key lookup with no conversion, spec, index or attribute."""
+    return (
+        not format_spec
+        and conversion is None
+        and field_name != ""
+        and not field_name.isdigit()
+        and "." not in field_name
+        and "[" not in field_name
+    )
+
+
+class CompiledTemplate:
+    """
+    A template parsed once into literal text and field segments.
+
+    Rendering a template whose fields are all plain ``{key}`` lookups is a single join
+    over the precomputed segments. Templates using conversions, format specs, indexing
+    or attribute access fall back to ``str.format_map`` with identical results.
+    """
+
+    def __init__(self, text: str):
+        """Parse a template; parse errors are reported when it is used."""
+        self.text = text
+        self.literals: Tuple[str, ...] = ()
+        self.fields: Tuple[Optional[str], ...] = ()
+        self.required_keys: Tuple[str, ...] = ()
+        self.error: Optional[ValueError] = None
+        self.is_simple = False
+
+        try:
+            parsed = list(Formatter().parse(text))
+        except ValueError as e:
+            self.error = e
+            return
+
+        self.literals = tuple(literal for literal, _, _, _ in parsed)
+        self.fields = tuple(field_name for _, field_name, _, _ in parsed)
+        self.required_keys = tuple(
+            dict.fromkeys(field_name for field_name in self.fields if field_name is not None)
+        )
+        self.is_simple = all(
+            field_name is None or _is_simple_field(field_name, format_spec, conversion)
+            for _, field_name, format_spec, conversion in parsed
+        )
+
+    def render(self, data: Mapping[str, Any], fallback: str = "") -> str:
+        """
+        Substitute data into the template.
+
+        Args:
+            data: Values for the template fields
+            fallback: Value used for fields missing from data
+
+        Returns:
+            The rendered string, or the unmodified template if it is malformed
+        """
+        if self.error is not None:
+            logger.warning(f"Format error in template: {self.error}")
+            return self.text
+
+        if not self.is_simple:
+            try:
+                return self.text.format_map(_FallbackDict(data, fallback))
+            except ValueError as e:
+                logger.warning(f"Format error in template: {e}")
+                return self.text
+
+        parts: List[str] = []
+        for literal, field_name in zip(self.literals, self.fields):
+            parts.append(literal)
+            if field_name is not None:
+                value = data.get(field_name, fallback)
+                parts.append(value if type(value) is str else format(value, ""))
+        return "".join(parts)
+
+    def render_key(self, data: Mapping[str, Any], fallback: str = "") -> Hashable:
+        """
+        Key that is equal for data that renders to the same text.
+
+        For templates of plain ``{key}`` fields this is the tuple of substituted
+        values, so nothing is rendered. Other templates are rendered and identified by
+        a digest, so the rendered text need not be kept.
+
+        Args:
+            data: Values for the template fields
+            fallback: Value used for fields missing from data
+
+        Returns:
+            A hashable key
+        """
+        if self.is_simple:
+            return tuple(_field_value(data, key, fallback) for key in self.required_keys)
+        rendered = self.render(data, fallback).encode("utf-8", "surrogatepass")
+        return hashlib.blake2b(rendered, digest_size=RENDER_KEY_DIGEST_SIZE).digest()
+
+    def missing_keys(self, data: Mapping[str, Any]) -> List[str]:
+        """
+        List the template fields that have no value in data.
+
+        Raises:
+            ValueError: If the template is malformed
+        """
+        if self.error is not None:
+            raise ValueError(str(self.error))
+        return [key for key in self.required_keys if key not in data]
+
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def compile_template(text: str) -> CompiledTemplate:
+    """Compile a template, reusing the cached result for previously seen text."""
+    return CompiledTemplate(text)
+
+
+# Characters in a substituted value that could change how Markdown renders the document
+_MARKDOWN_SENSITIVE = re.compile(r"[\\`*_\[\]()<>#|~!\r\n]|&#?\w+;")
+# Prefixes that start a block (list, quote, heading underline) when a value begins a line
+_LINE_START_SENSITIVE = re.compile(r"[-+=>]|\d+[.)]")
+
+
+def _escape_markdown_value(value: str, at_line_start: bool, in_tag: bool) -> Optional[str]:
+    """HTML-escape a value for precompiled Markdown, or None if Markdown would interpret it."""
+    if (
+        _MARKDOWN_SENSITIVE.search(value)
+        or value != value.strip()
+        or (at_line_start and (not value or _LINE_START_SENSITIVE.match(value)))
+    ):
+        return None
+    return html.escape(value, quote=in_tag)
+
+
+class MarkdownTemplate:
+    """
+    A Markdown template converted to HTML once, with fields substituted afterwards.
+
+    Each field is replaced by an inert placeholder token before conversion and the
+    resulting HTML is split on those tokens. Rendering then only HTML-escapes and
+    joins values. When a template cannot be handled this way, or a value contains
+    characters that Markdown would interpret, ``render`` returns None and the caller
+    should substitute and convert the Markdown per recipient instead. Fields inside
+    raw HTML or an autolink (``<{email}>``) are not precompiled, because whether
+    Markdown treats the ``<...>`` as a tag, a link or text depends on the value.
+    """
+
+    def __init__(self, text: str):
+        """Convert a template to HTML, remembering whether that succeeded."""
+        self.template = compile_template(text)
+        self.html_literals: Optional[Tuple[str, ...]] = None
+        self.field_names: Tuple[str, ...] = ()
+        self.line_start: Tuple[bool, ...] = ()
+        self.in_tag: Tuple[bool, ...] = ()
+
+        if self.template.error is not None or not self.template.is_simple:
+            return
+
+        nonce = os.urandom(4).hex()
+        source_parts: List[str] = []
+        field_names: List[str] = []
+        line_start: List[bool] = []
+        for literal, field_name in zip(self.template.literals, self.template.fields):
+            source_parts.append(literal)
+            if field_name is None:
+                continue
+            source = "".join(source_parts)
+            # Inside raw HTML or an autolink the conversion depends on the value itself
+            if source.rfind("<") > source.rfind(">"):
+                logger.debug("Template field inside raw HTML or an autolink")
+                return
+            line_start.append(not source.rsplit("\n", 1)[-1].strip())
+            source_parts.append(f"swecc{nonce}f{len(field_names)}x")
+            field_names.append(field_name)
+
+        html = convert_markdown_to_html("".join(source_parts))
+        pieces = re.split(f"swecc{nonce}f(\\d+)x", html)
+        # The conversion is only usable if every placeholder survived exactly once, in order
+        if pieces[1::2] != [str(i) for i in range(len(field_names))]:
+            logger.debug("Template placeholders changed during Markdown conversion")
+            return
+
+        self.html_literals = tuple(pieces[0::2])
+        self.field_names = tuple(field_names)
+        self.line_start = tuple(line_start)
+        # Values inside a tag (e.g. a link's href) also need their quotes escaped
+        in_tag = []
+        preceding_html = ""
+        for literal in self.html_literals[:-1]:
+            preceding_html += literal
+            in_tag.append(preceding_html.rfind("<") > preceding_html.rfind(">"))
+        self.in_tag = tuple(in_tag)
+
+    @property
+    def is_precompiled(self) -> bool:
+        """Whether the template could be converted to HTML ahead of substitution."""
+        return self.html_literals is not None
+
+    def render(self, data: Mapping[str, Any], fallback: str = "") -> Optional[str]:
+        """
+        Substitute HTML-escaped data into the precompiled HTML.
+
+        Args:
+            data: Values for the template fields
+            fallback: Value used for fields missing from data
+
+        Returns:
+            The rendered HTML, or None if this data must be rendered per recipient
+        """
+        if self.html_literals is None:
+            return None
+
+        parts = [self.html_literals[0]]
+        for field_name, at_line_start, in_tag, literal in zip(
+            self.field_names, self.line_start, self.in_tag, self.html_literals[1:]
+        ):
+            value = _field_value(data, field_name, fallback)
+            escaped = _escape_markdown_value(value, at_line_start, in_tag)
+            if escaped is None:
+                return None
+            parts.append(escaped)
+            parts.append(literal)
+        return "".join(parts)
+
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def compile_markdown_template(text: str) -> MarkdownTemplate:
+    """Convert a Markdown template, reusing the cached result for previously seen text."""
+    return MarkdownTemplate(text)
+
+
+# SendGrid rejects a personalization whose substitutions exceed this many bytes
+MAX_SUBSTITUTION_BYTES = 10000
+
+
+def substitution_tag(field_name: str) -> str:
+    """Tag standing in for a template field in SendGrid's server-side substitutions."""
+    return f"-{field_name}-"
+
+
+def _tagged_text(literals: Tuple[str, ...], fields: Tuple[Optional[str], ...]) -> str:
+    """Join template literals with a substitution tag in place of each field."""
+    parts: List[str] = []
+    for literal, field_name in zip(literals, fields):
+        parts.append(literal)
+        if field_name is not None:
+            parts.append(substitution_tag(field_name))
+    return "".join(parts)
+
+
+class SubstitutionTemplate:
+    """
+    A subject and body rewritten for SendGrid's server-side substitutions.
+
+    Every ``{field}`` becomes a ``-field-`` tag. The rewritten subject and body are sent
+    once per request and each personalization carries only its recipient's values, so
+    nothing is rendered per recipient. A Markdown body is converted to HTML once, as with
+    MarkdownTemplate, and its values are HTML-escaped.
+
+    Templates that cannot be rewritten (malformed, using format specs or attribute
+    access, Markdown that MarkdownTemplate cannot precompile, such as a field inside
+    raw HTML or an autolink, or text that would contain a tag by accident) are not
+    ``is_supported``.
+    ``substitutions`` returns None for records that must still be rendered client-side.
+    """
+
+    def __init__(self, subject: str, content: str, is_markdown: bool = False):
+        """Rewrite the templates, remembering whether that succeeded."""
+        self.is_markdown = is_markdown
+        self.subject = ""
+        self.content = ""
+        self.is_supported = False
+        # Per field: its tag, whether the subject uses it and, for Markdown bodies, the
+        # (line start, inside tag) context of each use in the HTML
+        self.fields: Tuple[Tuple[str, str, bool, Tuple[Tuple[bool, bool], ...]], ...] = ()
+
+        subject_template = compile_template(subject)
+        if subject_template.error is not None or not subject_template.is_simple:
+            return
+        subject_fields = subject_template.required_keys
+
+        html_uses: Dict[str, List[Tuple[bool, bool]]] = {}
+        if is_markdown:
+            markdown = compile_markdown_template(content)
+            if markdown.html_literals is None:
+                return
+            content_literals = markdown.html_literals
+            content_fields: Tuple[Optional[str], ...] = (*markdown.field_names, None)
+            for field_name, at_line_start, in_tag in zip(
+                markdown.field_names, markdown.line_start, markdown.in_tag
+            ):
+                html_uses.setdefault(field_name, []).append((at_line_start, in_tag))
+        else:
+            content_template = compile_template(content)
+            if content_template.error is not None or not content_template.is_simple:
+                return
+            content_literals = content_template.literals
+            content_fields = content_template.fields
+
+        tagged_subject = _tagged_text(subject_template.literals, subject_template.fields)
+        tagged_content = _tagged_text(content_literals, content_fields)
+        field_names = tuple(dict.fromkeys(subject_fields + tuple(filter(None, content_fields))))
+
+        # A tag must appear exactly where a field was, not be formed by the surrounding text
+        for field_name in field_names:
+            tag = substitution_tag(field_name)
+            expected = subject_template.fields.count(field_name) + content_fields.count(field_name)
+            if tagged_subject.count(tag) + tagged_content.count(tag) != expected:
+                logger.debug(f"Template text contains substitution tag {tag}")
+                return
+
+        self.subject = tagged_subject
+        self.content = tagged_content
+        self.is_supported = True
+        self.fields = tuple(
+            (
+                field_name,
+                substitution_tag(field_name),
+                field_name in subject_fields,
+                tuple(html_uses.get(field_name, ())),
+            )
+            for field_name in field_names
+        )
+
+    def substitutions(
+        self, data: Mapping[str, Any], fallback: str = ""
+    ) -> Optional[Dict[str, str]]:
+        """
+        Values for one recipient's personalization.
+
+        Args:
+            data: Values for the template fields
+            fallback: Value used for fields missing from data
+
+        Returns:
+            Substitutions by tag, or None if this data must be rendered client-side
+            (a value Markdown would interpret, a value containing a tag, or values
+            exceeding SendGrid's per-personalization size limit)
+        """
+        if not self.is_supported:
+            return None
+
+        substitutions: Dict[str, str] = {}
+        size = 0
+        for field_name, tag, in_subject, html_uses in self.fields:
+            value = _field_value(data, field_name, fallback)
+            if html_uses:
+                escaped = _escape_markdown_value(value, *html_uses[0])
+                # Subject and body share one value per tag, so every use must agree
+                if (
+                    escaped is None
+                    or (in_subject and escaped != value)
+                    or any(_escape_markdown_value(value, *use) != escaped for use in html_uses[1:])
+                ):
+                    return None
+                value = escaped
+            # SendGrid may substitute into already substituted text
+            if "-" in value and any(other in value for _, other, _, _ in self.fields):
+                return None
+            substitutions[tag] = value
+            size += len(tag) + len(value)
+
+        if size * 4 > MAX_SUBSTITUTION_BYTES:
+            # Only encode when the character count alone cannot rule out the limit
+            size = sum(
+                len(tag.encode("utf-8")) + len(value.encode("utf-8"))
+                for tag, value in substitutions.items()
+            )
+            if size > MAX_SUBSTITUTION_BYTES:
+                return None
+        return substitutions
+
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def compile_substitution_template(
+    subject: str, content: str, is_markdown: bool = False
+) -> SubstitutionTemplate:
+    """Rewrite templates for substitution, reusing the cached result for previously seen text."""
+    return SubstitutionTemplate(subject, content, is_markdown)
@@ -0,0 +1,232 @@
+"""
+Whole-dataset template validation producing a grouped report.
+"""
+
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple, Union
+
+from swecc_email_sender.core.loader import DataLoader
+from swecc_email_sender.core.recipients import RecipientTable
+from swecc_email_sender.core.template import compile_template
+
+DEFAULT_SAMPLE_SIZE = 5
+
+
+class MissingKeyGroup(NamedTuple):
+    """Rows that lack the same set of template keys."""
+
+    keys: Tuple[str, ...]
+    row_count: int
+    # 1-based row numbers (excluding any CSV header) and recipients of the first rows
+    sample_rows: List[int]
+    sample_emails: List[Optional[str]]
+
+
+class ValidationReport:
+    """
+    Result of checking every record against the templates' required keys.
+
+    Rows are grouped by the exact set of keys they lack, so a problem affecting a
+    million rows is one line of output rather than a million.
+    """
+
+    def __init__(
+        self,
+        required_keys: Mapping[str, Tuple[str, ...]],
+        rows: int,
+        groups: List[MissingKeyGroup],
+    ):
+        """Create a report; use validate_records or validate_file to build one."""
+        self.required_keys = dict(required_keys)
+        self.rows = rows
+        self.groups = sorted(groups, key=lambda group: (-group.row_count, group.keys))
+
+    @property
+    def is_valid(self) -> bool:
+        """Whether every row has every required key."""
+        return not self.groups
+
+    @property
+    def invalid_rows(self) -> int:
+        """Number of rows missing at least one key."""
+        return sum(group.row_count for group in self.groups)
+
+    def templates_using(self, key: str) -> List[str]:
+        """Names of the templates that require a key."""
+        return [name for name, keys in self.required_keys.items() if key in keys]
+
+    def format(self) -> List[str]:
+        """
+        Human-readable report lines.
+
+        Returns:
+            A summary line followed by one line per group of rows
+        """
+        lines = [
+            f"Validated {self.rows:,} rows against the "
+            f"{' and '.join(self.required_keys)} template(s): "
+            + (
+                "all required keys present"
+                if self.is_valid
+                else f"{self.invalid_rows:,} rows missing keys"
+            )
+        ]
+        for group in self.groups:
+            keys = ", ".join(
+                f"`{key}` ({', '.join(self.templates_using(key))})" for key in group.keys
+            )
+            samples = ", ".join(
+                f"{row} ({email})" if email else str(row)
+                for row, email in zip(group.sample_rows, group.sample_emails)
+            )
+            noun = "row" if group.row_count == 1 else "rows"
+            sample_noun = "row" if len(group.sample_rows) == 1 else "rows"
+            lines.append(
+                f"{group.row_count:,} {noun} missing {keys}; e.g. {sample_noun} {samples}"
+            )
+        return lines
+
+
+def required_keys(templates: Mapping[str, str]) -> Dict[str, Tuple[str, ...]]:
+    """
+    Parse each template once and list the keys it requires.
+
+    Raises:
+        ValueError: If a template is malformed
+    """
+    return {
+        name: tuple(compile_template(text).missing_keys({})) for name, text in templates.items()
+    }
+
+
+class _GroupBuilder:
+    """Accumulates rows into MissingKeyGroups."""
+
+    def __init__(self, sample_size: int):
+        self.sample_size = sample_size
+        self.groups: Dict[Tuple[str, ...], List[Any]] = {}
+
+    def add(self, keys: Tuple[str, ...], row: int, email: Optional[str]) -> None:
+        group = self.groups.get(keys)
+        if group is None:
+            group = self.groups[keys] = [0, [], []]
+        group[0] += 1
+        if len(group[1]) < self.sample_size:
+            group[1].append(row + 1)
+            group[2].append(email)
+
+    def build(self) -> List[MissingKeyGroup]:
+        return [
+            MissingKeyGroup(keys, count, rows, emails)
+            for keys, (count, rows, emails) in self.groups.items()
+        ]
+
+
+def validate_records(
+    templates: Mapping[str, str],
+    records: Iterable[Mapping[str, Any]],
+    sample_size: int = DEFAULT_SAMPLE_SIZE,
+) -> ValidationReport:
+    """
+    Check records for keys the templates require, in a single pass.
+
+    Args:
+        templates: Template text by name, e.g. ``{"body": ..., "subject": ...}``
+        records: Records to check; a RecipientTable is checked column by column
+        sample_size: Row numbers to keep as examples for each group
+
+    Returns:
+        ValidationReport grouping rows by the keys they lack
+
+    Raises:
+        ValueError: If a template is malformed
+    """
+    keys_by_template = required_keys(templates)
+    all_keys = tuple(dict.fromkeys(key for keys in keys_by_template.values() for key in keys))
+    builder = _GroupBuilder(sample_size)
+
+    if isinstance(records, RecipientTable):
+        missing_by_row: Dict[int, List[str]] = {}
+        for key, missing_rows in records.rows_missing(all_keys).items():
+            for row in missing_rows:
+                missing_by_row.setdefault(row, []).append(key)
+        for row, row_missing in sorted(missing_by_row.items()):
+            builder.add(tuple(row_missing), row, records[row].get("to_email"))
+        return ValidationReport(keys_by_template, len(records), builder.build())
+
+    required = frozenset(all_keys)
+    rows = 0
+    for row, record in enumerate(records):
+        rows += 1
+        # Set comparison against the keys view runs in C for the common valid case
+        if record.keys() >= required:
+            continue
+        missing = tuple(key for key in all_keys if key not in record)
+        builder.add(missing, row, record.get("to_email"))
+    return ValidationReport(keys_by_template, rows, builder.build())
+
+
+def validate_columns(
+    templates: Mapping[str, str],
+    columns: Iterable[str],
+    rows: int,
+    sample_size: int = DEFAULT_SAMPLE_SIZE,
+) -> ValidationReport:
+    """
+    Check data whose rows all share the same columns, such as a CSV file.
+
+    Args:
+        templates: Template text by name, e.g. ``{"body": ..., "subject": ...}``
+        columns: Column names present in every row
+        rows: Number of rows
+        sample_size: Row numbers to keep as examples for each group
+
+    Returns:
+        ValidationReport with at most one group, covering every row
+
+    Raises:
+        ValueError: If a template is malformed
+    """
+    keys_by_template = required_keys(templates)
+    present = set(columns)
+    missing = tuple(
+        dict.fromkeys(
+            key for keys in keys_by_template.values() for key in keys if key not in present
+        )
+    )
+    groups = []
+    if missing and rows:
+        sample = list(range(1, min(rows, sample_size) + 1))
+        groups.append(MissingKeyGroup(missing, rows, sample, [None] * len(sample)))
+    return ValidationReport(keys_by_template, rows, groups)
+
+
+def validate_file(
+    templates: Mapping[str, str],
+    filepath: Union[str, Path],
+    sample_size: int = DEFAULT_SAMPLE_SIZE,
+) -> ValidationReport:
+    """
+    Check a data file for keys the templates require.
+
+    Every row of a CSV file has the columns named in its header, so CSV files are
+    validated from the header alone and their rows are only counted. JSON records
+    may differ from one another and are checked one by one as they are streamed
+    from the file.
+
+    Args:
+        templates: Template text by name, e.g. ``{"body": ..., "subject": ...}``
+        filepath: Path to the data file (CSV or JSON)
+        sample_size: Row numbers to keep as examples for each group
+
+    Returns:
+        ValidationReport grouping rows by the keys they lack
+
+    Raises:
+        FileNotFoundError: If the file doesn't exist
+        ValueError: If the file format is not supported or a template is malformed
+    """
+    columns = DataLoader.read_columns(filepath)
+    if columns is None:
+        return validate_records(templates, DataLoader.iter_data(filepath), sample_size)
+    return validate_columns(templates, columns, DataLoader.count_rows(filepath), sample_size)
@@ -2,6 +2,15 @@
 Utility functions
 """
 
-from swecc_email_sender.utils.markdown_utils import convert_markdown_to_html
+from typing import TYPE_CHECKING
+
+from swecc_email_sender.utils.lazy import lazy_exports
+
+if TYPE_CHECKING:
+    from swecc_email_sender.utils.markdown_utils import convert_markdown_to_html
 
 __all__ = ["convert_markdown_to_html"]
+
+__getattr__, __dir__ = lazy_exports(
+    __name__, {"convert_markdown_to_html": "swecc_email_sender.utils.markdown_utils"}
+)
@@ -0,0 +1,40 @@
+"""
+Lazily imported package exports (PEP 562).
+"""
+
+import importlib
+import sys
+from typing import Any, Callable, List, Mapping, Tuple
+
+
+def lazy_exports(
+    package: str, exports: Mapping[str, str]
+) -> Tuple[Callable[[str], Any], Callable[[], List[str]]]:
+    """
+    Build module ``__getattr__`` and ``__dir__`` functions that import exports on first use.
+
+    Importing a package then costs nothing for exports that are never used, e.g. the
+    CLI does not load asyncio for AsyncEmailSender.
+
+    Args:
+        package: Name of the package defining the exports (its ``__name__``)
+        exports: Module defining each exported name
+
+    Returns:
+        The package's ``__getattr__`` and ``__dir__`` functions
+    """
+    namespace = sys.modules[package].__dict__
+
+    def module_getattr(name: str) -> Any:
+        module = exports.get(name)
+        if module is None:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        value = getattr(importlib.import_module(module), name)
+        # Later lookups find the attribute directly and skip this function
+        namespace[name] = value
+        return value
+
+    def module_dir() -> List[str]:
+        return sorted(set(namespace) | set(exports))
+
+    return module_getattr, module_dir
@@ -2,9 +2,48 @@
 Markdown processing utilities for email content.
 """
 
-from typing import Optional
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Optional, Tuple
 
-import markdown
+if TYPE_CHECKING:
+    import markdown
+
+MARKDOWN_EXTENSIONS = ["fenced_code", "tables", "attr_list"]
+MARKDOWN_CACHE_SIZE = 512
+
+# A single converter is reused for every document; Markdown instances are not
+# thread-safe, so conversions are serialized by a lock.
+_converter: Optional["markdown.Markdown"] = None
+_converter_lock = threading.Lock()
+
+# Memo of converted documents keyed by a digest of the content and the CSS class
+_cache: "OrderedDict[Tuple[bytes, Optional[str]], str]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _markdown_to_html(content: str) -> str:
+    """Convert Markdown with the shared converter, resetting it for the next document."""
+    global _converter  # noqa: PLW0603
+    with _converter_lock:
+        if _converter is None:
+            # Imported on first use: loading markdown and its extensions is slow and
+            # plain-text sends never need it
+            import markdown
+
+            _converter = markdown.Markdown(extensions=MARKDOWN_EXTENSIONS)
+        try:
+            html: str = _converter.convert(content)
+            return html
+        finally:
+            _converter.reset()
+
+
+def clear_markdown_cache() -> None:
+    """Forget all memoized conversions."""
+    with _cache_lock:
+        _cache.clear()
 
 
 def convert_markdown_to_html(content: str, css_class: Optional[str] = None) -> str:
@@ -18,13 +57,28 @@ def convert_markdown_to_html(content: str, css_class: Optional[str] = None) -> s
     Returns:
         HTML string with default styling
     """
-    html = markdown.markdown(content, extensions=["fenced_code", "tables", "attr_list"])
+    # surrogatepass: template values may contain lone surrogates, e.g. from JSON sources
+    digest = hashlib.blake2b(content.encode("utf-8", "surrogatepass"), digest_size=16)
+    key = (digest.digest(), css_class)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None:
+            _cache.move_to_end(key)
+            return cached
+
+    html = _markdown_to_html(content)
 
     class_attr = f' class="{css_class}"' if css_class else ""
     font_family = """-apple-system, BlinkMacSystemFont, 'Segoe UI',
 Roboto, 'Helvetica Neue', Arial, sans-serif"""
-    return f"""
+    result = f"""
     <div style="font-family: {font_family};"{class_attr}>
         {html}
     </div>
     """
+
+    with _cache_lock:
+        _cache[key] = result
+        if len(_cache) > MARKDOWN_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return result
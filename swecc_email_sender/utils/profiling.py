@@ -0,0 +1,169 @@
+"""
+Profiling helpers producing cProfile statistics and flamegraph-ready stacks.
+"""
+
+import cProfile
+import logging
+import pstats
+import sys
+import threading
+from collections import Counter
+from types import FrameType
+from typing import Any, Callable, List, Optional, TextIO, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+DEFAULT_SAMPLE_INTERVAL = 0.001
+DEFAULT_TOP = 20
+# From Python 3.12 cProfile is built on sys.monitoring, which already sees every
+# thread and allows only one active profiler
+PROFILE_EACH_THREAD = sys.version_info < (3, 12)
+
+
+class StackSampler:
+    """
+    Wall-clock sampler recording the stacks of every running thread.
+
+    A background thread snapshots all Python stacks every ``interval`` seconds and
+    counts identical stacks. The result is written in the "collapsed" format read by
+    flamegraph.pl, speedscope and similar tools: one ``frame;frame;frame count`` line
+    per distinct stack, outermost frame first. Because sampling is by wall clock,
+    time threads spend blocked on the network shows up alongside CPU time.
+    """
+
+    def __init__(self, interval: float = DEFAULT_SAMPLE_INTERVAL):
+        """Create a sampler; call start() to begin sampling."""
+        self.interval = interval
+        self.samples: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _collapse(frame: Optional[FrameType]) -> str:
+        """Format a stack as semicolon-separated frames, outermost first."""
+        names: List[str] = []
+        while frame is not None:
+            code = frame.f_code
+            module = frame.f_globals.get("__name__", code.co_filename)
+            names.append(f"{module}:{code.co_name}")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def _run(self) -> None:
+        """Sample until stopped."""
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != own_id:
+                    self.samples[self._collapse(frame)] += 1
+
+    def start(self) -> None:
+        """Start sampling in a daemon thread."""
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling and wait for the sampling thread to exit."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def write(self, path: str) -> None:
+        """Write the collected samples in collapsed-stack format."""
+        with open(path, "w") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class ThreadProfiler:
+    """
+    cProfile across every thread started while it is active.
+
+    Before Python 3.12 ``cProfile`` only observes the thread that enabled it, so a
+    profile hook installed with ``threading.setprofile`` starts a separate profiler in
+    each new thread (such as CLI send workers). The per-thread results are merged
+    into one ``pstats.Stats``.
+    """
+
+    def __init__(self) -> None:
+        """Create an inactive profiler."""
+        self._main = cProfile.Profile()
+        self._profiles: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    def _start_thread_profile(self, *_: Any) -> None:
+        """Profile hook run on a new thread's first event; hands over to cProfile."""
+        profile = cProfile.Profile()
+        with self._lock:
+            self._profiles.append(profile)
+        profile.enable()
+
+    def start(self) -> None:
+        """Profile the current thread and any thread started from now on."""
+        if PROFILE_EACH_THREAD:
+            threading.setprofile(self._start_thread_profile)
+        self._main.enable()
+
+    def stop(self) -> None:
+        """Stop profiling; threads started afterwards are not profiled."""
+        self._main.disable()
+        if PROFILE_EACH_THREAD:
+            threading.setprofile(None)
+
+    def stats(self, stream: Optional[TextIO] = None) -> pstats.Stats:
+        """Merged statistics of every profiled thread."""
+        stats = pstats.Stats(self._main, stream=stream)
+        with self._lock:
+            for profile in self._profiles:
+                profile.disable()
+                stats.add(profile)
+        return stats
+
+
+def profile_call(
+    fn: Callable[[], T],
+    out_path: str,
+    top: int = DEFAULT_TOP,
+    interval: float = DEFAULT_SAMPLE_INTERVAL,
+    stream: Optional[TextIO] = None,
+) -> T:
+    """
+    Run fn under cProfile and the stack sampler, writing both profiles.
+
+    Args:
+        fn: Function to profile
+        out_path: Path for the pstats file; the collapsed stacks are written to
+            ``<out_path>.collapsed``
+        top: Number of functions to include in the printed summary
+        interval: Seconds between stack samples
+        stream: Where to print the summary (defaults to stderr)
+
+    Returns:
+        The return value of fn
+    """
+    stream = stream if stream is not None else sys.stderr
+    profiler = ThreadProfiler()
+    sampler = StackSampler(interval)
+    sampler.start()
+    profiler.start()
+    try:
+        return fn()
+    finally:
+        profiler.stop()
+        sampler.stop()
+
+        stats = profiler.stats(stream=stream)
+        # The profiled work is done by now, so an unwritable path must not mask its outcome
+        try:
+            stats.dump_stats(out_path)
+            sampler.write(f"{out_path}.collapsed")
+        except OSError as e:
+            logger.error(f"Could not write profile to {out_path}: {e!s}")
+        else:
+            print(
+                f"\nProfile written to {out_path} (collapsed stacks: {out_path}.collapsed)",
+                file=stream,
+            )
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top)
@@ -0,0 +1,14 @@
+"""Shared test fixtures"""
+
+import pytest
+
+from benchmarks.mock_sendgrid import MockSendGridConfig, start_server
+
+@pytest.fixture
+def mock_server():
+    """Run a mock SendGrid server for the duration of a test."""
+    server, thread = start_server(MockSendGridConfig(api_key='test_key'))
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
@@ -0,0 +1,206 @@
+"""Tests for AsyncEmailSender"""
+
+import asyncio
+import json
+import pytest
+from unittest.mock import patch
+
+from swecc_email_sender.core.async_sender import AsyncConnectionPool, AsyncEmailSender
+from swecc_email_sender.core.pool import PoolResponse
+from swecc_email_sender.core.retry import RetryPolicy
+
+async def start_server(requests, status=202, close_after=None):
+    """Start a minimal HTTP/1.1 server recording request bodies."""
+    connections = []
+
+    async def handle(reader, writer):
+        connections.append(writer)
+        served = 0
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            length = 0
+            while (line := await reader.readline()) not in (b"\r\n", b""):
+                name, _, value = line.decode().partition(":")
+                if name.lower() == "content-length":
+                    length = int(value)
+            requests.append(await reader.readexactly(length))
+            served += 1
+            writer.write(
+                f"HTTP/1.1 {status} OK\r\nContent-Length: 2\r\nX-Test: 1\r\n\r\nok".encode()
+            )
+            await writer.drain()
+            if close_after and served >= close_after:
+                break
+        writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    return server, server.sockets[0].getsockname()[1], connections
+
+def test_pool_reuses_connection():
+    """Test that sequential requests share one keep-alive connection."""
+    async def run():
+        requests = []
+        server, port, connections = await start_server(requests)
+        pool = AsyncConnectionPool("127.0.0.1", port, use_ssl=False)
+        first = await pool.request("POST", "/v3/mail/send", b'{"a": 1}')
+        second = await pool.request("POST", "/v3/mail/send", b'{"a": 2}')
+        await pool.close()
+        server.close()
+        return first, second, requests, connections
+
+    first, second, requests, connections = asyncio.run(run())
+    assert first == PoolResponse(202, b"ok", {"Content-Length": "2", "X-Test": "1"})
+    assert second.status == 202
+    assert requests == [b'{"a": 1}', b'{"a": 2}']
+    assert len(connections) == 1
+
+def test_pool_reconnects_stale_connection():
+    """Test that a connection closed by the server is replaced."""
+    async def run():
+        requests = []
+        server, port, connections = await start_server(requests, close_after=1)
+        pool = AsyncConnectionPool("127.0.0.1", port, use_ssl=False)
+        await pool.request("POST", "/", b"1")
+        await asyncio.sleep(0.05)
+        response = await pool.request("POST", "/", b"2")
+        await pool.close()
+        server.close()
+        return response, connections
+
+    response, connections = asyncio.run(run())
+    assert response.status == 202
+    assert len(connections) == 2
+
+def test_pool_does_not_replay_written_request():
+    """Test that a request the server may have received is not sent twice."""
+    async def run():
+        requests = []
+
+        async def drop_second(reader, writer):
+            for status in (b"HTTP/1.1 202 OK\r\nContent-Length: 0\r\n\r\n", None):
+                await reader.readline()
+                while (await reader.readline()) not in (b"\r\n", b""):
+                    pass
+                requests.append(await reader.readexactly(1))
+                if status is None:
+                    break
+                writer.write(status)
+                await writer.drain()
+            writer.close()
+
+        server = await asyncio.start_server(drop_second, "127.0.0.1", 0)
+        pool = AsyncConnectionPool("127.0.0.1", server.sockets[0].getsockname()[1], use_ssl=False)
+        try:
+            await pool.request("POST", "/", b"1")
+            with pytest.raises(ConnectionError):
+                await pool.request("POST", "/", b"2")
+        finally:
+            await pool.close()
+            server.close()
+        return requests
+
+    assert asyncio.run(run()) == [b"1", b"2"]
+
+def test_pool_timeout_is_retryable():
+    """Test that a request timing out raises the builtin TimeoutError on every Python."""
+    async def run():
+        async def stall(reader, writer):
+            await reader.read()
+
+        server = await asyncio.start_server(stall, "127.0.0.1", 0)
+        pool = AsyncConnectionPool(
+            "127.0.0.1", server.sockets[0].getsockname()[1], use_ssl=False, timeout=0.05
+        )
+        try:
+            with pytest.raises(TimeoutError) as excinfo:
+                await pool.request("POST", "/", b"1")
+        finally:
+            await pool.close()
+            server.close()
+        return excinfo.value
+
+    error = asyncio.run(run())
+    assert "timed out" in str(error)
+    assert RetryPolicy().is_retryable(error=error)
+
+def test_pool_reuses_ssl_context():
+    """Test that the TLS context is created once per pool, not per connection."""
+    async def run(pool):
+        for _ in range(2):
+            await pool._open_connection()
+
+    with patch('ssl.create_default_context') as create_context, \
+            patch('asyncio.open_connection') as open_connection:
+        open_connection.return_value = (None, None)
+        pool = AsyncConnectionPool("example.com")
+        asyncio.run(run(pool))
+
+    create_context.assert_called_once()
+    assert all(
+        call.kwargs["ssl"] is create_context.return_value
+        for call in open_connection.call_args_list
+    )
+
+def test_send_email_payload():
+    """Test that send_email renders the template and posts the payload."""
+    sender = AsyncEmailSender(api_key='test_key')
+
+    async def fake_request(method, url, body=b"", headers=None):
+        fake_request.body = body
+        return PoolResponse(202, b"", {})
+
+    with patch.object(sender._pool, 'request', fake_request):
+        success = asyncio.run(sender.send_email(
+            "test@example.com", "Order #{order_id}", "Hello {name}!", "sender@example.com",
+            template_data={"name": "John", "order_id": "12345"}
+        ))
+
+    assert success
+    payload = json.loads(fake_request.body)
+    assert payload['subject'] == "Order #12345"
+    assert payload['content'][0]['value'] == "Hello John!"
+
+def test_send_email_failure():
+    """Test that API errors and exceptions are reported as failures."""
+    sender = AsyncEmailSender(api_key='test_key')
+
+    async def fail(method, url, body=b"", headers=None):
+        raise ConnectionError("boom")
+
+    with patch.object(sender._pool, 'request', fail):
+        assert not asyncio.run(sender.send_email(
+            "test@example.com", "Test", "Test content", "sender@example.com"
+        ))
+
+def test_send_many_bounded_concurrency():
+    """Test that send_many keeps results in order and respects the limit."""
+    sender = AsyncEmailSender(api_key='test_key')
+    in_flight = {"now": 0, "max": 0}
+
+    async def fake_request(method, url, body=b"", headers=None):
+        in_flight["now"] += 1
+        in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        await asyncio.sleep(0.01)
+        in_flight["now"] -= 1
+        status = 400 if b"bad@example.com" in body else 202
+        return PoolResponse(status, b"", {})
+
+    records = [{"to_email": f"user{i}@example.com"} for i in range(10)]
+    records[3] = {"to_email": "bad@example.com"}
+    records[5] = {"name": "missing email"}
+
+    with patch.object(sender._pool, 'request', fake_request):
+        results = asyncio.run(sender.send_many(
+            records, "Hi", "Hello", "sender@example.com", concurrency=3
+        ))
+
+    assert results == [True, True, True, False, True, False, True, True, True, True]
+    assert in_flight["max"] == 3
+
+def test_send_many_rejects_invalid_concurrency():
+    """Test that concurrency must be positive."""
+    sender = AsyncEmailSender(api_key='test_key')
+    with pytest.raises(ValueError):
+        asyncio.run(sender.send_many([], "Hi", "Hello", "sender@example.com", concurrency=0))
@@ -0,0 +1,88 @@
+"""Tests for credential providers"""
+
+import json
+import os
+from unittest.mock import patch
+
+from swecc_email_sender.core.credentials import (
+    ChainCredentialProvider,
+    ConfigFileCredentialProvider,
+    EnvCredentialProvider,
+)
+from swecc_email_sender.core.sender import EmailSender
+
+def write_key(path, api_key, mtime_ns):
+    """Write a config file with a fixed modification time."""
+    path.write_text(json.dumps({"SENDGRID_API_KEY": api_key}))
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+def test_env_provider(monkeypatch):
+    """Test that the environment provider reads its variable."""
+    monkeypatch.setenv('SENDGRID_API_KEY', 'env_key')
+    assert EnvCredentialProvider().get_api_key() == 'env_key'
+    monkeypatch.setenv('SENDGRID_API_KEY', '')
+    assert EnvCredentialProvider().get_api_key() is None
+
+def test_config_file_provider_caches_until_modified(tmp_path):
+    """Test that the config file is only reparsed when it changes."""
+    path = tmp_path / "config.json"
+    write_key(path, 'old_key', 1_000_000_000)
+    provider = ConfigFileCredentialProvider(path, check_interval=0)
+
+    with patch('json.loads', wraps=json.loads) as loads:
+        assert provider.get_api_key() == 'old_key'
+        assert provider.get_api_key() == 'old_key'
+        assert loads.call_count == 1
+
+        write_key(path, 'new_key', 2_000_000_000)
+        assert provider.get_api_key() == 'new_key'
+        assert loads.call_count == 2
+
+def test_config_file_provider_check_interval(tmp_path):
+    """Test that the file is not checked again within the check interval."""
+    path = tmp_path / "config.json"
+    write_key(path, 'old_key', 1_000_000_000)
+    provider = ConfigFileCredentialProvider(path, check_interval=3600)
+    assert provider.get_api_key() == 'old_key'
+
+    write_key(path, 'new_key', 2_000_000_000)
+    assert provider.get_api_key() == 'old_key'
+    provider.invalidate()
+    assert provider.get_api_key() == 'new_key'
+
+def test_config_file_provider_missing_or_invalid(tmp_path):
+    """Test that a missing, malformed or keyless config file has no key."""
+    path = tmp_path / "config.json"
+    provider = ConfigFileCredentialProvider(path, check_interval=0)
+    assert provider.get_api_key() is None
+
+    path.write_text("not json")
+    assert provider.get_api_key() is None
+
+    write_key(path, None, 1_000_000_000)
+    assert provider.get_api_key() is None
+
+def test_chain_provider_precedence(tmp_path, monkeypatch):
+    """Test that the first provider with a key wins."""
+    path = tmp_path / "config.json"
+    write_key(path, 'file_key', 1_000_000_000)
+    provider = ChainCredentialProvider(
+        EnvCredentialProvider(), ConfigFileCredentialProvider(path, check_interval=0)
+    )
+
+    monkeypatch.delenv('SENDGRID_API_KEY', raising=False)
+    assert provider.get_api_key() == 'file_key'
+    monkeypatch.setenv('SENDGRID_API_KEY', 'env_key')
+    assert provider.get_api_key() == 'env_key'
+
+def test_sender_picks_up_rotated_key(tmp_path):
+    """Test that a sender without an explicit key uses the provider's current key."""
+    path = tmp_path / "config.json"
+    write_key(path, 'old_key', 1_000_000_000)
+    sender = EmailSender(credential_provider=ConfigFileCredentialProvider(path, check_interval=0))
+
+    sender._ensure_api_key()
+    assert sender.api_key == 'old_key'
+    write_key(path, 'new_key', 2_000_000_000)
+    sender._ensure_api_key()
+    assert sender.api_key == 'new_key'
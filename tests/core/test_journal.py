@@ -0,0 +1,55 @@
+"""Tests for SendJournal"""
+
+import sqlite3
+
+from swecc_email_sender.core.journal import SendJournal, record_hash
+
+def test_record_hash_ignores_key_order():
+    """Test that the record hash is independent of key order."""
+    assert record_hash({"a": "1", "b": "2"}) == record_hash({"b": "2", "a": "1"})
+    assert record_hash({"a": "1"}) != record_hash({"a": "2"})
+
+def test_completed_records_survive_reopen(tmp_path):
+    """Test that sent records are remembered across runs."""
+    path = tmp_path / "journal.db"
+    sent = {"to_email": "a@example.com"}
+    failed = {"to_email": "b@example.com"}
+
+    with SendJournal(path) as journal:
+        journal.record(sent, True)
+        journal.record(failed, False)
+        assert journal.is_completed(sent)
+        assert not journal.is_completed(failed)
+
+    with SendJournal(path) as journal:
+        assert journal.is_completed(sent)
+        assert not journal.is_completed(failed)
+        assert len(journal) == 1
+
+def test_failed_record_can_later_succeed(tmp_path):
+    """Test that a retried recipient is marked completed."""
+    record = {"to_email": "a@example.com"}
+    with SendJournal(tmp_path / "journal.db") as journal:
+        journal.record(record, False)
+        journal.record(record, True)
+        assert journal.is_completed(record)
+
+def test_outcomes_committed_in_groups(tmp_path):
+    """Test that outcomes become durable once a commit group fills up."""
+    path = tmp_path / "journal.db"
+    journal = SendJournal(path, commit_interval=2, commit_seconds=3600)
+
+    def durable_rows():
+        conn = sqlite3.connect(str(path))
+        try:
+            return conn.execute("SELECT COUNT(*) FROM outcomes").fetchone()[0]
+        finally:
+            conn.close()
+
+    journal.record({"to_email": "a@example.com"}, True)
+    assert durable_rows() == 0
+    journal.record({"to_email": "b@example.com"}, True)
+    assert durable_rows() == 2
+    journal.record({"to_email": "c@example.com"}, True)
+    journal.close()
+    assert durable_rows() == 3
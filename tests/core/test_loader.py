@@ -70,3 +70,49 @@ def test_load_nonexistent_template():
     """Test loading non-existent template file."""
     with pytest.raises(FileNotFoundError):
         DataLoader.load_template("nonexistent.txt")
+
+def test_iter_data_is_lazy(temp_csv_file):
+    """Test that iter_data yields records one at a time."""
+    records = DataLoader.iter_data(temp_csv_file)
+    assert next(records) == {"to_email": "test1@example.com", "name": "Test 1"}
+    assert next(records) == {"to_email": "test2@example.com", "name": "Test 2"}
+    assert next(records, None) is None
+
+def test_iter_data_errors_raised_eagerly(tmp_path):
+    """Test that missing files and bad formats fail before iteration."""
+    with pytest.raises(FileNotFoundError):
+        DataLoader.iter_data(tmp_path / "missing.json")
+    invalid_file = tmp_path / "invalid.txt"
+    invalid_file.touch()
+    with pytest.raises(ValueError):
+        DataLoader.iter_data(invalid_file)
+
+def test_iter_json_across_read_boundaries(tmp_path, monkeypatch):
+    """Test incremental JSON parsing when records span many reads."""
+    monkeypatch.setattr('swecc_email_sender.core.loader.JSON_READ_SIZE', 5)
+    data = [{"to_email": f"user{i}@example.com", "note": "a ] [ , \"b\"" * i} for i in range(20)]
+    file_path = tmp_path / "data.json"
+    file_path.write_text(json.dumps(data, indent=2))
+
+    assert list(DataLoader.iter_data(file_path)) == data
+
+@pytest.mark.parametrize("content", ['{"to_email": "x"}', '[{"a": 1}', '[{"a": 1} {"b": 2}]', '[1,]'])
+def test_iter_json_invalid(tmp_path, content):
+    """Test that malformed JSON arrays raise ValueError."""
+    file_path = tmp_path / "data.json"
+    file_path.write_text(content)
+    with pytest.raises(ValueError):
+        list(DataLoader.iter_data(file_path))
+
+def test_load_table(temp_csv_file):
+    """Test loading a CSV file into a RecipientTable."""
+    table = DataLoader.load_table(temp_csv_file)
+    assert [row.to_dict() for row in table] == DataLoader.load_data(temp_csv_file)
+
+def test_load_table_skips_blank_lines(tmp_path):
+    """Test that blank CSV lines are not loaded as rows, matching load_data."""
+    file_path = tmp_path / "blank.csv"
+    file_path.write_text("to_email,name\n\ntest1@example.com,Test 1\n\ntest2@example.com,Test 2\n")
+    table = DataLoader.load_table(file_path)
+    assert len(table) == DataLoader.count_rows(file_path) == 2
+    assert [row.to_dict() for row in table] == DataLoader.load_data(file_path)
@@ -0,0 +1,62 @@
+"""Tests for SenderMetrics"""
+
+import pickle
+
+from swecc_email_sender.core.metrics import Histogram, SenderMetrics, timed
+
+def test_histogram_observe():
+    """Test that observations land in the right buckets."""
+    histogram = Histogram(buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 5.0):
+        histogram.observe(value)
+
+    assert histogram.counts == [1, 2, 1]
+    assert histogram.count == 4
+    assert histogram.max == 5.0
+    assert histogram.quantile(0.5) == 1.0
+    assert histogram.quantile(1.0) == 5.0
+
+def test_time_and_counters():
+    """Test timing a stage and incrementing counters."""
+    metrics = SenderMetrics()
+    with metrics.time("render"):
+        pass
+    metrics.increment("sent", 3)
+
+    snapshot = metrics.snapshot()
+    assert snapshot["counters"]["sent"] == 3
+    assert snapshot["stages"]["render"]["count"] == 1
+    assert snapshot["stages"]["connect"]["count"] == 0
+
+def test_timed_without_metrics():
+    """Test that timed is a no-op when metrics are disabled."""
+    with timed(None, "render"):
+        pass
+
+def test_to_prometheus():
+    """Test the Prometheus text exposition format."""
+    metrics = SenderMetrics(buckets=(0.1,))
+    metrics.observe("response", 0.05)
+    metrics.increment("bytes_out", 100)
+
+    text = metrics.to_prometheus()
+    assert "# TYPE swecc_email_bytes_out_total counter" in text
+    assert "swecc_email_bytes_out_total 100" in text
+    assert 'swecc_email_stage_duration_seconds_bucket{stage="response",le="0.1"} 1' in text
+    assert 'swecc_email_stage_duration_seconds_count{stage="response"} 1' in text
+
+def test_drain_and_merge():
+    """Test moving metrics between instances, e.g. from worker processes."""
+    worker = SenderMetrics()
+    worker.observe("render", 0.001)
+    worker.increment("sent", 2)
+
+    drained = pickle.loads(pickle.dumps(worker.drain()))
+    assert worker.snapshot()["counters"]["sent"] == 0
+
+    total = SenderMetrics()
+    total.increment("sent")
+    total.merge(drained)
+    snapshot = total.snapshot()
+    assert snapshot["counters"]["sent"] == 3
+    assert snapshot["stages"]["render"]["count"] == 1
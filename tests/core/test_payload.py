@@ -0,0 +1,82 @@
+"""Tests for PayloadBuilder"""
+
+import json
+import pytest
+
+from swecc_email_sender.core import payload
+from swecc_email_sender.core.payload import PayloadBuilder, payload_builder
+
+def expected_payload(to_emails, subject, content, content_type="text/html"):
+    """The request body as json.dumps would serialize it."""
+    return json.dumps({
+        "personalizations": [{"to": [{"email": email}]} for email in to_emails],
+        "from": {"email": "sender@example.com"},
+        "subject": subject,
+        "content": [{"type": content_type, "value": content}],
+    })
+
+@pytest.fixture(params=["stdlib", "orjson"])
+def encoder(request, monkeypatch):
+    """Run a test with each string encoder."""
+    if request.param == "orjson":
+        pytest.importorskip("orjson")
+        monkeypatch.setattr(payload, "encode_string", payload._encode_string_orjson)
+    else:
+        monkeypatch.setattr(payload, "encode_string", payload._encode_string_stdlib)
+    return request.param
+
+@pytest.mark.parametrize("subject,content", [
+    ("Hello", "<p>Hi</p>"),
+    ('Quotes " and \\ backslashes', "Line\nbreaks\tand separators"),
+    ("Café \U0001F389", "<p>日本語</p>"),
+])
+def test_build_matches_json_dumps(encoder, subject, content):
+    """Test that spliced payloads decode to the same document as json.dumps."""
+    builder = PayloadBuilder("sender@example.com", "text/html")
+    body = builder.build("to@example.com", subject, content)
+
+    assert json.loads(body) == json.loads(expected_payload(["to@example.com"], subject, content))
+    if encoder == "stdlib":
+        assert body == expected_payload(["to@example.com"], subject, content).encode()
+
+def test_build_many(encoder):
+    """Test that every recipient gets its own personalization."""
+    emails = ["a@example.com", "b@example.com", "c@example.com"]
+    body = PayloadBuilder("sender@example.com", "text/plain").build_many(emails, "Hi", "Hello")
+    assert json.loads(body) == json.loads(expected_payload(emails, "Hi", "Hello", "text/plain"))
+
+def test_lone_surrogate(encoder):
+    """Test that strings orjson rejects still serialize."""
+    body = PayloadBuilder("sender@example.com", "text/plain").build("to@example.com", "\ud800", "x")
+    assert json.loads(body)["subject"] == "\ud800"
+
+def test_payload_builder_cached():
+    """Test that builders are reused for the same sender and content type."""
+    assert payload_builder("a@example.com", "text/html") is payload_builder("a@example.com", "text/html")
+def test_build_substitutions(encoder):
+    """Test that each personalization carries its own substitutions."""
+    body = PayloadBuilder("sender@example.com", "text/plain").build_substitutions(
+        [("a@example.com", {"-name-": "Ada"}), ("b@example.com", {"-name-": "Bé"})],
+        "Hi -name-",
+        "Hello -name-",
+    )
+    document = json.loads(body)
+    assert document["personalizations"] == [
+        {"to": [{"email": "a@example.com"}], "substitutions": {"-name-": "Ada"}},
+        {"to": [{"email": "b@example.com"}], "substitutions": {"-name-": "Bé"}},
+    ]
+    assert document["subject"] == "Hi -name-"
+    assert document["content"] == [{"type": "text/plain", "value": "Hello -name-"}]
+def test_build_personalized(encoder):
+    """Test that a shared body can carry a subject per recipient."""
+    body = PayloadBuilder("sender@example.com", "text/plain").build_personalized(
+        [("a@example.com", "Hi A"), ("b@example.com", "Hi é")], "Hello"
+    )
+    assert json.loads(body) == {
+        "personalizations": [
+            {"to": [{"email": "a@example.com"}], "subject": "Hi A"},
+            {"to": [{"email": "b@example.com"}], "subject": "Hi é"},
+        ],
+        "from": {"email": "sender@example.com"},
+        "content": [{"type": "text/plain", "value": "Hello"}],
+    }
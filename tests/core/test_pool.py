@@ -0,0 +1,108 @@
+"""Tests for ConnectionPool"""
+
+import http.client
+import pytest
+from unittest.mock import patch, MagicMock
+
+from swecc_email_sender.core.pool import ConnectionPool
+
+def make_response(status=202, will_close=False):
+    """Create a mock HTTP response."""
+    response = MagicMock()
+    response.status = status
+    response.will_close = will_close
+    response.read.return_value = b'ok'
+    response.getheaders.return_value = [('X-Test', '1')]
+    return response
+
+def test_request_returns_response():
+    """Test that the full response is read and returned."""
+    pool = ConnectionPool(max_size=1)
+    with patch('http.client.HTTPSConnection') as mock_conn:
+        mock_conn.return_value.getresponse.return_value = make_response()
+        response = pool.request("POST", "/v3/mail/send", body=b'{}')
+
+    assert response.status == 202
+    assert response.body == b'ok'
+    assert response.headers == {'X-Test': '1'}
+
+def test_connection_reused():
+    """Test that keep-alive connections are reused."""
+    pool = ConnectionPool(max_size=2)
+    with patch('http.client.HTTPSConnection') as mock_conn:
+        mock_conn.return_value.getresponse.return_value = make_response()
+        pool.request("POST", "/")
+        pool.request("POST", "/")
+
+    assert mock_conn.call_count == 1
+
+def test_closing_response_not_reused():
+    """Test that connections the server will close are discarded."""
+    pool = ConnectionPool(max_size=2)
+    with patch('http.client.HTTPSConnection') as mock_conn:
+        mock_conn.return_value.getresponse.return_value = make_response(will_close=True)
+        pool.request("POST", "/")
+        pool.request("POST", "/")
+
+    assert mock_conn.call_count == 2
+
+def test_idle_connection_expires():
+    """Test that connections idle past max_idle_time are replaced."""
+    pool = ConnectionPool(max_size=1, max_idle_time=1)
+    with patch('http.client.HTTPSConnection') as mock_conn, \
+            patch('swecc_email_sender.core.pool.time.monotonic', side_effect=[0, 0, 5, 5]):
+        mock_conn.return_value.getresponse.return_value = make_response()
+        pool.request("POST", "/")
+        pool.request("POST", "/")
+
+    assert mock_conn.call_count == 2
+
+def test_stale_connection_reconnects():
+    """Test that a request that cannot be written to a dropped socket is sent again."""
+    pool = ConnectionPool(max_size=1)
+    stale, fresh = MagicMock(), MagicMock()
+    stale.request.side_effect = [None, BrokenPipeError()]
+    stale.getresponse.return_value = make_response()
+    fresh.getresponse.return_value = make_response(status=202)
+
+    with patch('http.client.HTTPSConnection', side_effect=[stale, fresh]):
+        pool.request("POST", "/")
+        response = pool.request("POST", "/")
+
+    assert response.status == 202
+    stale.close.assert_called()
+    fresh.request.assert_called_once()
+
+def test_written_request_not_replayed():
+    """Test that a request the server may have received is not sent twice."""
+    pool = ConnectionPool(max_size=1)
+    stale = MagicMock()
+    stale.getresponse.side_effect = [
+        make_response(),
+        http.client.RemoteDisconnected("closed"),
+    ]
+
+    with patch('http.client.HTTPSConnection', return_value=stale) as mock_conn:
+        pool.request("POST", "/")
+        with pytest.raises(http.client.RemoteDisconnected):
+            pool.request("POST", "/")
+
+    assert mock_conn.call_count == 1
+    assert stale.request.call_count == 2
+
+def test_fresh_connection_error_propagates():
+    """Test that errors on a brand-new connection are not retried."""
+    pool = ConnectionPool(max_size=1)
+    with patch('http.client.HTTPSConnection') as mock_conn:
+        mock_conn.return_value.getresponse.side_effect = ConnectionResetError()
+        with pytest.raises(ConnectionResetError):
+            pool.request("POST", "/")
+
+    assert mock_conn.call_count == 1
+
+def test_closed_pool_rejects_requests():
+    """Test that a closed pool refuses new requests."""
+    pool = ConnectionPool()
+    pool.close()
+    with pytest.raises(RuntimeError):
+        pool.request("POST", "/")
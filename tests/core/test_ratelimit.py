@@ -0,0 +1,79 @@
+"""Tests for RateLimiter"""
+
+import asyncio
+import time
+import pytest
+from unittest.mock import patch
+
+from swecc_email_sender.core.ratelimit import RateLimiter
+
+@pytest.fixture
+def clock():
+    """Patch the limiter's monotonic clock with a controllable value."""
+    now = {"t": 100.0}
+    with patch('swecc_email_sender.core.ratelimit.time.monotonic', side_effect=lambda: now["t"]):
+        yield now
+
+def test_invalid_arguments():
+    """Test that rate and burst must be positive."""
+    with pytest.raises(ValueError):
+        RateLimiter(0)
+    with pytest.raises(ValueError):
+        RateLimiter(1, burst=0)
+
+def test_burst_then_throttle(clock):
+    """Test that the bucket allows a burst and then spaces requests out."""
+    limiter = RateLimiter(rate=10, burst=2)
+    assert limiter.reserve() == 0
+    assert limiter.reserve() == 0
+    assert limiter.reserve() == pytest.approx(0.1)
+    assert limiter.reserve() == pytest.approx(0.2)
+
+def test_tokens_refill(clock):
+    """Test that tokens refill over time up to the burst size."""
+    limiter = RateLimiter(rate=10, burst=2)
+    limiter.reserve()
+    limiter.reserve()
+    clock["t"] += 10
+    assert limiter.reserve() == 0
+    assert limiter.reserve() == 0
+    assert limiter.reserve() > 0
+
+def test_429_pauses_until_reset(clock):
+    """Test that a 429 pauses sending until the advertised reset."""
+    limiter = RateLimiter(rate=100, burst=100)
+    with patch('swecc_email_sender.core.ratelimit.time.time', return_value=1000.0):
+        limiter.update(429, {"X-RateLimit-Reset": "1005"})
+    assert limiter.reserve() == pytest.approx(5)
+
+def test_retry_after_header(clock):
+    """Test that Retry-After takes precedence on a 429."""
+    limiter = RateLimiter(rate=100, burst=100)
+    limiter.update(429, {"retry-after": "2"})
+    assert limiter.reserve() == pytest.approx(2)
+
+def test_remaining_lowers_rate(clock):
+    """Test that the remaining allowance is spread over the reset window."""
+    limiter = RateLimiter(rate=100, burst=1)
+    with patch('swecc_email_sender.core.ratelimit.time.time', return_value=1000.0):
+        limiter.update(202, {"X-RateLimit-Remaining": "5", "X-RateLimit-Reset": "1010"})
+    limiter.reserve()
+    assert limiter.reserve() == pytest.approx(2)
+
+def test_malformed_headers_ignored(clock):
+    """Test that unparsable headers do not affect the limiter."""
+    limiter = RateLimiter(rate=10, burst=1)
+    limiter.update(202, {"X-RateLimit-Remaining": "lots"})
+    assert limiter.reserve() == 0
+
+def test_acquire_async_waits():
+    """Test that acquire_async sleeps for the reserved delay."""
+    limiter = RateLimiter(rate=1000, burst=1)
+
+    async def run():
+        start = time.monotonic()
+        await limiter.acquire_async()
+        await limiter.acquire_async()
+        return time.monotonic() - start
+
+    assert asyncio.run(run()) >= 0.0009
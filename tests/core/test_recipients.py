@@ -0,0 +1,69 @@
+"""Tests for RecipientTable"""
+
+import pytest
+
+from swecc_email_sender.core.recipients import RecipientTable
+from swecc_email_sender.core.sender import EmailSender
+
+RECORDS = [
+    {"to_email": "a@example.com", "name": "Ada", "year": "2025"},
+    {"to_email": "b@example.com", "name": "Bob", "year": "2025"},
+    {"to_email": "c@example.com", "year": "2026", "tags": ["x", "y"]},
+]
+
+@pytest.fixture
+def table():
+    """Create a table from records with differing keys."""
+    return RecipientTable.from_records(RECORDS)
+
+def test_rows_match_records(table):
+    """Test that rows compare equal to the records they were built from."""
+    assert len(table) == 3
+    assert table.columns == ("to_email", "name", "year", "tags")
+    assert [row.to_dict() for row in table] == RECORDS
+    assert table[0] == RECORDS[0]
+    assert table[-1]["tags"] == ["x", "y"]
+
+def test_missing_values(table):
+    """Test that absent keys behave like they do for dictionaries."""
+    row = table[2]
+    assert "name" not in row
+    assert row.get("name", "fallback") == "fallback"
+    with pytest.raises(KeyError):
+        row["name"]
+    with pytest.raises(IndexError):
+        table[3]
+
+def test_dictionary_encoding(table):
+    """Test that repeated values are stored once."""
+    assert table.distinct_count("year") == 2
+    assert table.column("year") == ["2025", "2025", "2026"]
+    assert table.column("name") == ["Ada", "Bob", None]
+
+def test_unique_string_column():
+    """Test that mostly-unique string columns round-trip through the packed buffer."""
+    records = [{"to_email": f"user{i}@example.com", "note": "é" * (i % 3)} for i in range(300)]
+    table = RecipientTable.from_records(records)
+    assert [row.to_dict() for row in table] == records
+
+def test_rows_missing(table):
+    """Test the column-wise scan for missing keys."""
+    assert table.rows_missing(["to_email", "name", "unknown"]) == {
+        "name": [2],
+        "unknown": [0, 1, 2],
+    }
+
+def test_render_from_row(table):
+    """Test that templates render directly from row views."""
+    assert EmailSender.format_with_fallback("Hi {name} ({year})", table[1]) == "Hi Bob (2025)"
+    assert EmailSender.validate_template_keys("Hi {name}", table[2]) == ["name"]
+
+def test_from_rows():
+    """Test building a table from CSV-style rows, including ragged ones."""
+    rows = [[" a@example.com ", "Ada"], ["b@example.com"], ["c@example.com", "Cy", "extra"]]
+    table = RecipientTable.from_rows(["to_email", "name"], rows, chunk_size=2)
+    assert [row.to_dict() for row in table] == [
+        {"to_email": "a@example.com", "name": "Ada"},
+        {"to_email": "b@example.com"},
+        {"to_email": "c@example.com", "name": "Cy"},
+    ]
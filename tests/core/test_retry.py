@@ -0,0 +1,62 @@
+"""Tests for RetryPolicy"""
+
+import socket
+import pytest
+from unittest.mock import patch
+
+from swecc_email_sender.core.retry import RetryPolicy
+
+def test_invalid_arguments():
+    """Test that invalid limits are rejected."""
+    with pytest.raises(ValueError):
+        RetryPolicy(max_attempts=0)
+    with pytest.raises(ValueError):
+        RetryPolicy(retry_budget=-1)
+
+@pytest.mark.parametrize("status,expected", [
+    (429, True),
+    (500, True),
+    (503, True),
+    (400, False),
+    (401, False),
+])
+def test_retryable_statuses(status, expected):
+    """Test which HTTP statuses are treated as transient."""
+    assert RetryPolicy().is_retryable(status=status) is expected
+
+def test_retryable_exceptions():
+    """Test which exceptions are treated as transient."""
+    policy = RetryPolicy()
+    assert policy.is_retryable(error=socket.timeout())
+    assert policy.is_retryable(error=ConnectionResetError())
+    assert not policy.is_retryable(error=ValueError())
+
+def test_exponential_backoff_without_jitter():
+    """Test that delays double up to the cap."""
+    policy = RetryPolicy(backoff_base=1, backoff_cap=5, jitter=False)
+    assert [policy.backoff(n) for n in range(1, 6)] == [1, 2, 4, 5, 5]
+
+def test_full_jitter():
+    """Test that jittered delays are drawn below the exponential bound."""
+    policy = RetryPolicy(backoff_base=1, backoff_cap=30)
+    with patch('swecc_email_sender.core.retry.random.uniform', return_value=0.7) as uniform:
+        assert policy.backoff(3) == 0.7
+        uniform.assert_called_once_with(0, 4)
+
+def test_max_attempts():
+    """Test that retries stop after max_attempts."""
+    policy = RetryPolicy(max_attempts=3, jitter=False)
+    assert policy.next_delay(1, status=500) is not None
+    assert policy.next_delay(2, status=500) is not None
+    assert policy.next_delay(3, status=500) is None
+    assert policy.next_delay(1, status=400) is None
+
+def test_retry_budget_shared():
+    """Test that the retry budget is shared and can be reset."""
+    policy = RetryPolicy(max_attempts=10, retry_budget=2)
+    assert policy.next_delay(1, status=503) is not None
+    assert policy.next_delay(1, status=503) is not None
+    assert policy.next_delay(1, status=503) is None
+    assert policy.retries_used == 2
+    policy.reset_budget()
+    assert policy.next_delay(1, status=503) is not None
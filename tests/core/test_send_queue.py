@@ -0,0 +1,173 @@
+"""Tests for SendQueue and QueueWorker"""
+
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from swecc_email_sender.core.retry import RetryPolicy
+from swecc_email_sender.core.send_queue import QueueWorker, SendQueue
+from swecc_email_sender.core.sender import EmailSender, SendOutcome
+
+def records(count):
+    """Recipient records with distinct addresses."""
+    return [{"to_email": f"user{i}@example.com", "name": str(i)} for i in range(count)]
+
+def test_enqueue_claim_ack(tmp_path):
+    """Test that messages survive reopening and are removed once acknowledged."""
+    path = tmp_path / "queue.db"
+    with SendQueue(path) as queue:
+        data = records(3) + [{"name": "no email"}]
+        assert queue.enqueue(data, "Hi {name}", "Hello", "a@example.com", batch_size=2) == 3
+        assert queue.counts() == {"pending": 3, "dead": 1}
+        assert queue.dead_letters()[0]["error"] == "missing to_email field"
+
+    with SendQueue(path) as queue:
+        messages = queue.claim(2)
+        assert [m.record["name"] for m in messages] == ["0", "1"]
+        assert messages[0].subject == "Hi {name}"
+        assert messages[0].attempts == 1
+        queue.ack(messages)
+        assert queue.counts() == {"pending": 1, "dead": 1}
+        assert [m.record["name"] for m in queue.claim()] == ["2"]
+        assert queue.claim() == []
+
+def test_enqueue_job_key_skips_known_recipients(tmp_path):
+    """Test that enqueueing a job again only adds recipients it had not queued."""
+    with SendQueue(tmp_path / "queue.db") as queue:
+        data = records(2) + [{"name": "no email"}]
+        assert queue.enqueue(data, "Hi", "Hello", "a@example.com", job_key="job") == 2
+        queue.ack(queue.claim())
+        assert queue.enqueue(records(3), "Hi", "Hello", "a@example.com", job_key="job") == 1
+        assert queue.enqueue(data, "Hi", "Hello", "a@example.com", job_key="job") == 0
+        assert queue.counts() == {"pending": 1, "dead": 1}
+        assert queue.enqueue(records(1), "Hi", "Changed", "a@example.com", job_key="job") == 1
+        assert queue.enqueue(records(1), "Hi", "Hello", "a@example.com", job_key="other") == 1
+        assert queue.enqueue(records(1), "Hi", "Hello", "a@example.com") == 1
+
+def test_claims_are_exclusive(tmp_path):
+    """Test that connections sharing a database never lease the same message."""
+    path = tmp_path / "queue.db"
+    with SendQueue(path) as first, SendQueue(path) as second:
+        first.enqueue(records(10), "Hi", "Hello", "a@example.com")
+        claimed = first.claim(4) + second.claim(4) + first.claim(4)
+        assert sorted(m.id for m in claimed) == sorted({m.id for m in claimed})
+        assert len(claimed) == 10
+
+def test_nack_retries_then_dead_letters(tmp_path):
+    """Test that failed messages are redelivered until the policy gives up."""
+    policy = RetryPolicy(max_attempts=2, backoff_base=0, jitter=False)
+    with SendQueue(tmp_path / "queue.db", policy) as queue:
+        queue.enqueue(records(1), "Hi", "Hello", "a@example.com")
+        assert queue.nack(queue.claim()) == 0
+        assert queue.nack(queue.claim(), "status 500") == 1
+        assert queue.claim() == []
+        assert queue.counts() == {"pending": 0, "dead": 1}
+        assert queue.dead_letters()[0]["error"] == "status 500"
+
+        assert queue.requeue_dead() == 1
+        assert queue.claim()[0].attempts == 1
+
+def test_expired_lease_is_redelivered(tmp_path):
+    """Test that messages of a worker that never reported back are delivered again."""
+    policy = RetryPolicy(max_attempts=2)
+    with SendQueue(tmp_path / "queue.db", policy, visibility_timeout=0) as queue:
+        queue.enqueue(records(1), "Hi", "Hello", "a@example.com")
+        stale = queue.claim()
+        redelivered = queue.claim()
+        assert redelivered[0].attempts == 2
+        queue.ack(stale)
+        assert queue.counts()["pending"] == 1
+        assert queue.claim() == []
+        assert queue.counts() == {"pending": 0, "dead": 1}
+
+def test_renew_extends_held_leases(tmp_path):
+    """Test that renewing keeps messages invisible, but only under their current lease."""
+    with SendQueue(tmp_path / "queue.db", visibility_timeout=0) as queue:
+        queue.enqueue(records(2), "Hi", "Hello", "a@example.com")
+        stale = queue.claim(1)
+        held = queue.claim(2)
+        assert sorted(m.record["name"] for m in held) == ["0", "1"]
+        queue.visibility_timeout = 60
+        assert queue.renew(stale + held) == 2
+        assert queue.claim(2) == []
+
+def test_worker_renews_leases_while_sending(tmp_path):
+    """Test that another worker cannot claim messages that are still being sent."""
+    path = tmp_path / "queue.db"
+    stolen = []
+    with SendQueue(path, visibility_timeout=0.3) as queue, \
+            SendQueue(path, visibility_timeout=0.3) as other:
+        queue.enqueue(records(2), "Hi", "Hello", "a@example.com")
+
+        def slow_send(*args, **kwargs):
+            time.sleep(0.5)
+            stolen.extend(other.claim())
+            return SendOutcome(True, 202)
+
+        sender = MagicMock()
+        sender.send_email_outcome.side_effect = slow_send
+        assert QueueWorker(queue, sender, claim_size=2).run() == 2
+        assert queue.counts() == {"pending": 0, "dead": 0}
+    assert stolen == []
+
+@pytest.mark.parametrize("batch,threads", [(False, 1), (False, 3), (True, 2)])
+def test_worker_drains_queue(mock_server, tmp_path, batch, threads):
+    """Test that a worker pool sends every queued message and empties the queue."""
+    with SendQueue(tmp_path / "queue.db") as queue, \
+            EmailSender(api_key='test_key', api_url=mock_server.url) as sender:
+        queue.enqueue(records(25), "Hi {name}", "Hello", "a@example.com")
+        worker = QueueWorker(queue, sender, threads=threads, claim_size=4, batch=batch)
+        assert worker.run() == 25
+        assert queue.counts() == {"pending": 0, "dead": 0}
+
+    stats = mock_server.snapshot()
+    assert stats["personalizations"] == 25
+    if batch:
+        assert stats["requests"] < 25
+
+def test_nack_permanent_dead_letters_immediately(tmp_path):
+    """Test that permanently failed messages skip their remaining deliveries."""
+    with SendQueue(tmp_path / "queue.db", RetryPolicy(max_attempts=5)) as queue:
+        queue.enqueue(records(2), "Hi", "Hello", "a@example.com")
+        assert queue.nack(queue.claim(2), "status 400", permanent=True) == 2
+        assert queue.counts() == {"pending": 0, "dead": 2}
+
+def test_worker_dead_letters_failures(mock_server, tmp_path):
+    """Test that messages SendGrid keeps failing end up dead-lettered."""
+    mock_server.config.error_rate = 1.0
+    policy = RetryPolicy(max_attempts=2, backoff_base=0)
+    with SendQueue(tmp_path / "queue.db", policy) as queue, \
+            EmailSender(api_key='test_key', api_url=mock_server.url) as sender:
+        queue.enqueue(records(3), "Hi", "Hello", "a@example.com")
+        worker = QueueWorker(queue, sender, poll_interval=0.01)
+        assert worker.run() == 0
+        assert (worker.failed, worker.dead) == (6, 3)
+        assert queue.counts() == {"pending": 0, "dead": 3}
+
+@pytest.mark.parametrize("batch", [False, True])
+def test_worker_dead_letters_permanent_failures(mock_server, tmp_path, batch):
+    """Test that messages SendGrid rejects outright are not delivered again."""
+    policy = RetryPolicy(max_attempts=5, backoff_base=0)
+    with SendQueue(tmp_path / "queue.db", policy) as queue, \
+            EmailSender(api_key='wrong_key', api_url=mock_server.url) as sender:
+        queue.enqueue(records(3), "Hi", "Hello", "a@example.com")
+        worker = QueueWorker(queue, sender, poll_interval=0.01, batch=batch)
+        assert worker.run() == 0
+        assert (worker.failed, worker.dead) == (3, 3)
+        assert [d["error"] for d in queue.dead_letters()] == ["status 401"] * 3
+
+@pytest.mark.parametrize("batch", [False, True])
+def test_worker_retry_budget_covers_whole_run(mock_server, tmp_path, batch):
+    """Test that the sender's retry budget is not renewed for each claimed batch."""
+    mock_server.config.error_rate = 1.0
+    retry_policy = RetryPolicy(max_attempts=3, backoff_base=0, retry_budget=2)
+    with SendQueue(tmp_path / "queue.db", RetryPolicy(max_attempts=1)) as queue, \
+            EmailSender(api_key='test_key', api_url=mock_server.url,
+                        retry_policy=retry_policy) as sender:
+        queue.enqueue(records(10), "Hi", "Hello", "a@example.com")
+        worker = QueueWorker(queue, sender, claim_size=1, batch=batch)
+        assert worker.run() == 0
+
+    assert retry_policy.retries_used == 2
+    assert mock_server.snapshot()["requests"] == 12
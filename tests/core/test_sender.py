@@ -5,6 +5,8 @@ import json
 import pytest
 from unittest.mock import patch, MagicMock
 
+from swecc_email_sender.core.metrics import SenderMetrics
+from swecc_email_sender.core.retry import RetryPolicy
 from swecc_email_sender.core.sender import EmailSender
 
 @pytest.fixture
@@ -111,3 +113,324 @@ def test_send_email_exception(sender):
         )
 
         assert not success
+
+def test_send_email_reuses_connection(sender):
+    """Test that consecutive sends share a keep-alive connection."""
+    mock_response = MagicMock()
+    mock_response.status = 202
+    mock_response.will_close = False
+
+    with patch('http.client.HTTPSConnection') as mock_conn:
+        mock_conn.return_value.getresponse.return_value = mock_response
+
+        for i in range(3):
+            assert sender.send_email(
+                to_email=f"test{i}@example.com",
+                subject="Test",
+                content="Test content",
+                from_email="sender@example.com"
+            )
+
+        assert mock_conn.call_count == 1
+        assert mock_conn.return_value.request.call_count == 3
+
+def test_send_batch_groups_identical_emails(sender):
+    """Test that recipients with identical emails share one request."""
+    mock_response = MagicMock()
+    mock_response.status = 202
+
+    records = [
+        {"to_email": "a@example.com", "team": "red"},
+        {"to_email": "b@example.com", "team": "blue"},
+        {"to_email": "c@example.com", "team": "red"},
+        {"name": "no email"},
+    ]
+
+    with patch('http.client.HTTPSConnection') as mock_conn:
+        mock_conn.return_value.getresponse.return_value = mock_response
+
+        results = sender.send_batch(records, "Hi", "Team {team}", "sender@example.com")
+
+        assert results == [True, True, True, False]
+        calls = mock_conn.return_value.request.call_args_list
+        assert len(calls) == 2
+        first = json.loads(calls[0][1]['body'])
+        assert first['content'][0]['value'] == "Team red"
+        assert first['personalizations'] == [
+            {"to": [{"email": "a@example.com"}]},
+            {"to": [{"email": "c@example.com"}]},
+        ]
+
+def test_send_batch_reports_each_request(sender):
+    """Test that on_result is called with each request's records as soon as it completes."""
+    mock_response = MagicMock()
+    mock_response.status = 202
+    reported = []
+
+    def on_result(indices, outcome):
+        reported.append((indices, outcome.success, mock_conn.return_value.request.call_count))
+
+    records = [
+        {"to_email": "a@example.com", "team": "red"},
+        {"name": "no email"},
+        {"to_email": "b@example.com", "team": "blue"},
+        {"to_email": "c@example.com", "team": "red"},
+    ]
+
+    with patch('http.client.HTTPSConnection') as mock_conn:
+        mock_conn.return_value.getresponse.return_value = mock_response
+        sender.send_batch(records, "Hi", "Team {team}", "sender@example.com", on_result=on_result)
+
+    assert reported == [([1], False, 0), ([0, 3], True, 1), ([2], True, 2)]
+
+def test_send_batch_groups_bodies_with_different_subjects(sender):
+    """Test that recipients sharing a body get their own subjects in one request."""
+    mock_response = MagicMock()
+    mock_response.status = 202
+    records = [
+        {"to_email": "a@example.com", "name": "Ada"},
+        {"to_email": "b@example.com", "name": "Bo"},
+    ]
+
+    with patch('http.client.HTTPSConnection') as mock_conn:
+        mock_conn.return_value.getresponse.return_value = mock_response
+
+        results = sender.send_batch(records, "Hi {name}", "News", "sender@example.com")
+
+        assert results == [True, True]
+        calls = mock_conn.return_value.request.call_args_list
+        assert len(calls) == 1
+        body = json.loads(calls[0][1]['body'])
+        assert "subject" not in body
+        assert body['personalizations'] == [
+            {"to": [{"email": "a@example.com"}], "subject": "Hi Ada"},
+            {"to": [{"email": "b@example.com"}], "subject": "Hi Bo"},
+        ]
+        assert body['content'][0]['value'] == "News"
+
+def test_send_batch_splits_at_personalization_limit(sender):
+    """Test that large groups are split across requests."""
+    mock_response = MagicMock()
+    mock_response.status = 202
+    records = [{"to_email": f"user{i}@example.com"} for i in range(5)]
+
+    with patch('http.client.HTTPSConnection') as mock_conn, \
+            patch('swecc_email_sender.core.sender.MAX_PERSONALIZATIONS', 2):
+        mock_conn.return_value.getresponse.return_value = mock_response
+
+        results = sender.send_batch(records, "Hi", "Hello", "sender@example.com")
+
+        assert all(results)
+        assert mock_conn.return_value.request.call_count == 3
+
+def test_send_batch_failure_marks_chunk(sender):
+    """Test that a rejected request fails all of its recipients."""
+    mock_response = MagicMock()
+    mock_response.status = 400
+    mock_response.read.return_value = b'{"errors": []}'
+
+    with patch('http.client.HTTPSConnection') as mock_conn:
+        mock_conn.return_value.getresponse.return_value = mock_response
+
+        results = sender.send_batch(
+            [{"to_email": "a@example.com"}, {"to_email": "b@example.com"}],
+            "Hi", "Hello", "sender@example.com"
+        )
+
+        assert results == [False, False]
+
+def test_send_batch_server_side(sender):
+    """Test that server-side mode sends the template once with per-recipient values."""
+    mock_response = MagicMock()
+    mock_response.status = 202
+    records = [
+        {"to_email": "a@example.com", "name": "Ada"},
+        {"to_email": "b@example.com", "name": "-name-"},
+        {"to_email": "c@example.com", "name": "Cy"},
+    ]
+
+    with patch('http.client.HTTPSConnection') as mock_conn:
+        mock_conn.return_value.getresponse.return_value = mock_response
+
+        results = sender.send_batch(
+            records, "Hi {name}", "Hello {name}", "sender@example.com", server_side=True
+        )
+
+        assert results == [True, True, True]
+        calls = mock_conn.return_value.request.call_args_list
+        assert len(calls) == 2
+        # The value that looks like a tag is rendered client-side
+        rendered = json.loads(calls[0][1]['body'])
+        assert rendered['content'][0]['value'] == "Hello -name-"
+        substituted = json.loads(calls[1][1]['body'])
+        assert substituted['subject'] == "Hi -name-"
+        assert substituted['content'][0]['value'] == "Hello -name-"
+        assert [p['substitutions'] for p in substituted['personalizations']] == [
+            {"-name-": "Ada"},
+            {"-name-": "Cy"},
+        ]
+
+def test_send_batch_server_side_markdown_raw_html_renders_client_side(sender):
+    """Test that Markdown fields inside <...> are never sent as substitution tags."""
+    mock_response = MagicMock()
+    mock_response.status = 202
+    records = [{"to_email": "a@example.com", "organizer": "jane@example.com"}]
+
+    with patch('http.client.HTTPSConnection') as mock_conn:
+        mock_conn.return_value.getresponse.return_value = mock_response
+
+        results = sender.send_batch(
+            records, "Hi", "Email <{organizer}>", "sender@example.com",
+            is_markdown=True, server_side=True
+        )
+
+        assert results == [True]
+        body = json.loads(mock_conn.return_value.request.call_args[1]['body'])
+        assert 'substitutions' not in body['personalizations'][0]
+        assert '<a href=' in body['content'][0]['value']
+
+def test_send_email_retries_after_rate_limit():
+    """Test that a 429 is retried once the shared rate limiter allows it."""
+    limiter = MagicMock()
+    sender = EmailSender(api_key='test_key', rate_limiter=limiter)
+    throttled = MagicMock(status=429, will_close=False)
+    throttled.read.return_value = b''
+    accepted = MagicMock(status=202, will_close=False)
+
+    with patch('http.client.HTTPSConnection') as mock_conn:
+        mock_conn.return_value.getresponse.side_effect = [throttled, accepted]
+
+        success = sender.send_email(
+            to_email="test@example.com",
+            subject="Test",
+            content="Test content",
+            from_email="sender@example.com"
+        )
+
+    assert success
+    assert limiter.acquire.call_count == 2
+    assert [c[0][0] for c in limiter.update.call_args_list] == [429, 202]
+
+def test_send_email_rate_limit_without_limiter(sender):
+    """Test that a 429 fails immediately when no limiter is configured."""
+    throttled = MagicMock(status=429)
+    throttled.read.return_value = b'too many requests'
+
+    with patch('http.client.HTTPSConnection') as mock_conn:
+        mock_conn.return_value.getresponse.return_value = throttled
+
+        assert not sender.send_email(
+            to_email="test@example.com",
+            subject="Test",
+            content="Test content",
+            from_email="sender@example.com"
+        )
+        assert mock_conn.return_value.request.call_count == 1
+
+def test_send_email_retries_transient_errors():
+    """Test that 5xx responses and connection errors are retried by the policy."""
+    policy = RetryPolicy(max_attempts=3, backoff_base=0, jitter=False)
+    sender = EmailSender(api_key='test_key', retry_policy=policy)
+    unavailable = MagicMock(status=503)
+    unavailable.read.return_value = b''
+    accepted = MagicMock(status=202)
+
+    with patch('http.client.HTTPSConnection') as mock_conn:
+        mock_conn.return_value.getresponse.side_effect = [
+            unavailable, ConnectionResetError("reset"), accepted
+        ]
+
+        success = sender.send_email(
+            to_email="test@example.com",
+            subject="Test",
+            content="Test content",
+            from_email="sender@example.com"
+        )
+
+    assert success
+    assert policy.retries_used == 2
+
+def test_send_email_gives_up_on_permanent_error():
+    """Test that non-retryable statuses fail without retrying."""
+    sender = EmailSender(api_key='test_key', retry_policy=RetryPolicy(backoff_base=0))
+    rejected = MagicMock(status=400)
+    rejected.read.return_value = b'{"errors": []}'
+
+    with patch('http.client.HTTPSConnection') as mock_conn:
+        mock_conn.return_value.getresponse.return_value = rejected
+
+        assert not sender.send_email(
+            to_email="test@example.com",
+            subject="Test",
+            content="Test content",
+            from_email="sender@example.com"
+        )
+        assert mock_conn.return_value.request.call_count == 1
+
+@pytest.mark.parametrize("name", ["John", "**John**"])
+def test_send_email_precompiled_markdown(name):
+    """Test that render-once Markdown matches per-recipient conversion."""
+    sender = EmailSender(api_key='test_key', precompile_markdown=True)
+    reference = EmailSender(api_key='test_key')
+    mock_response = MagicMock()
+    mock_response.status = 202
+
+    bodies = []
+    for s in (sender, reference):
+        with patch('http.client.HTTPSConnection') as mock_conn:
+            mock_conn.return_value.getresponse.return_value = mock_response
+            assert s.send_email(
+                to_email="test@example.com",
+                subject="Hi {name}",
+                content="# Hello {name}\n\nWelcome!",
+                from_email="sender@example.com",
+                is_markdown=True,
+                template_data={"name": name}
+            )
+            bodies.append(json.loads(mock_conn.return_value.request.call_args[1]['body']))
+
+    assert bodies[0] == bodies[1]
+
+def test_metrics_disabled_by_default(sender):
+    """Test that senders without a collector report no metrics."""
+    assert sender.metrics() == {}
+
+def test_send_email_records_metrics():
+    """Test that each stage and counter is recorded when metrics are enabled."""
+    metrics = SenderMetrics()
+    sender = EmailSender(api_key='test_key', metrics=metrics)
+    responses = [MagicMock(status=503, will_close=False), MagicMock(status=202, will_close=False)]
+    for response in responses:
+        response.read.return_value = b''
+
+    with patch('http.client.HTTPSConnection') as mock_conn, patch('time.sleep'):
+        sender.retry_policy = RetryPolicy(max_attempts=2)
+        mock_conn.return_value.getresponse.side_effect = responses
+        assert sender.send_email(
+            "test@example.com", "Hi {name}", "# Hello {name}", "sender@example.com",
+            is_markdown=True, template_data={"name": "Ada"}
+        )
+
+    snapshot = sender.metrics()
+    assert snapshot["counters"]["sent"] == 1
+    assert snapshot["counters"]["retried"] == 1
+    assert snapshot["counters"]["requests"] == 2
+    assert snapshot["counters"]["bytes_out"] > 0
+    for stage in ("render", "markdown", "serialize", "connect"):
+        assert snapshot["stages"][stage]["count"] == 1
+    assert snapshot["stages"]["response"]["count"] == 2
+
+def test_send_markdown_with_lone_surrogate(sender):
+    """Test that values with unpaired surrogates can still be sent as Markdown."""
+    mock_response = MagicMock()
+    mock_response.status = 202
+
+    with patch('http.client.HTTPSConnection') as mock_conn:
+        mock_conn.return_value.getresponse.return_value = mock_response
+        assert sender.send_email(
+            "test@example.com", "Hi", "# Hello {name}", "sender@example.com",
+            is_markdown=True, template_data={"name": "\ud800"}
+        )
+
+        sent_payload = json.loads(mock_conn.return_value.request.call_args[1]['body'])
+        assert "Hello \ud800" in sent_payload['content'][0]['value']
@@ -0,0 +1,188 @@
+"""Tests for the send server"""
+
+import http.client
+import os
+import stat
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from swecc_email_sender.core.sender import EmailSender
+from swecc_email_sender.core.server import Job, SendServer, ServerClient, is_loopback_host
+
+def start_send_server(mock_server, address=('127.0.0.1', 0), **kwargs):
+    """Start a send server on a background thread."""
+    sender = EmailSender(api_key='test_key', api_url=mock_server.url)
+    server = SendServer(sender, address, **kwargs)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, thread
+
+def stop_send_server(server, thread):
+    """Stop a send server started by start_send_server."""
+    server.shutdown()
+    thread.join()
+    server.close()
+
+def test_job_from_dict():
+    """Test that job requests are validated and values converted to strings."""
+    job = Job.from_dict({
+        "subject": "Hi", "content": "Hello", "from_email": "a@example.com",
+        "recipients": [{"to_email": "b@example.com", "count": 3}],
+    })
+    assert job.records == [{"to_email": "b@example.com", "count": "3"}]
+    assert job.status() == {"id": job.id, "state": "queued", "recipients": 1}
+
+    with pytest.raises(ValueError):
+        Job.from_dict({"subject": "Hi", "content": "Hello", "recipients": []})
+    with pytest.raises(ValueError):
+        Job.from_dict({
+            "id": "", "subject": "Hi", "content": "Hello", "from_email": "a@example.com",
+            "recipients": [],
+        })
+    with pytest.raises(ValueError):
+        Job.from_dict({
+            "subject": "Hi", "content": "Hello", "from_email": "a@example.com",
+            "recipients": ["b@example.com"],
+        })
+    with pytest.raises(ValueError):
+        Job.from_dict({
+            "subject": "Hi", "content": "Hello", "from_email": "a@example.com",
+            "recipients": [], "markdown": "false",
+        })
+    assert Job.from_dict({
+        "subject": "Hi", "content": "Hello", "from_email": "a@example.com",
+        "recipients": [], "markdown": True,
+    }).is_markdown
+
+def test_jobs_share_requests(mock_server):
+    """Test that jobs arriving together with the same template are micro-batched."""
+    server, thread = start_send_server(mock_server, max_delay=0.5)
+    try:
+        jobs = [
+            server.submit(Job("Hi {name}", "Hello", "a@example.com",
+                              [{"to_email": f"user{i}@example.com", "name": str(i)}]))
+            for i in range(5)
+        ]
+        other = server.submit(Job("Other", "Bye", "a@example.com", [{"name": "no email"}]))
+        for job in [*jobs, other]:
+            assert job.wait(5)
+    finally:
+        stop_send_server(server, thread)
+
+    assert all(job.results == [True] for job in jobs)
+    assert other.status()["failed"] == [None]
+    stats = mock_server.snapshot()
+    assert stats["requests"] == 1
+    assert stats["personalizations"] == 5
+
+def test_http_client(mock_server):
+    """Test submitting jobs and looking them up over HTTP."""
+    server, thread = start_send_server(mock_server, max_delay=0)
+    host, port = server.address
+    try:
+        with ServerClient(port, host) as client:
+            recipients = [{"to_email": "b@example.com"}, {"to_email": "c@example.com"}]
+            status = client.submit(recipients, "Hi", "Hello", "a@example.com", wait=True)
+            assert status["state"] == "done"
+            assert status["sent"] == 2
+            assert client.status(status["id"]) == status
+
+            queued = client.submit(recipients, "Hi", "Hello", "a@example.com")
+            assert queued["recipients"] == 2
+            assert server.get_job(queued["id"]).wait(5)
+
+            with pytest.raises(RuntimeError):
+                client.status('unknown')
+    finally:
+        stop_send_server(server, thread)
+
+@pytest.mark.parametrize("headers,status", [
+    ({}, 411),
+    ({"Content-Length": "abc"}, 400),
+    ({"Content-Length": "-1"}, 400),
+    ({"Content-Length": "1025"}, 413),
+    ({"Content-Length": "1", "Transfer-Encoding": "chunked"}, 411),
+])
+def test_rejects_bad_content_length(mock_server, headers, status):
+    """Test that request bodies are only read with a valid, bounded Content-Length."""
+    server, thread = start_send_server(mock_server, max_request_bytes=1024)
+    host, port = server.address
+    try:
+        conn = http.client.HTTPConnection(host, port, timeout=5)
+        conn.putrequest("POST", "/jobs")
+        for name, value in headers.items():
+            conn.putheader(name, value)
+        conn.endheaders()
+        response = conn.getresponse()
+        assert response.status == status
+        assert response.getheader("Connection") == "close"
+        conn.close()
+    finally:
+        stop_send_server(server, thread)
+    assert mock_server.snapshot()["requests"] == 0
+
+def test_resubmitted_job_is_sent_once(mock_server):
+    """Test that repeating a submission with the same id does not send the job again."""
+    server, thread = start_send_server(mock_server, max_delay=0)
+    host, port = server.address
+    body = (b'{"id": "job-1", "subject": "Hi", "content": "Hello", "from_email": "a@example.com",'
+            b' "recipients": [{"to_email": "b@example.com"}]}')
+    try:
+        with ServerClient(port, host) as client:
+            first = client._request('POST', '/jobs?wait=1', body)
+            second = client._request('POST', '/jobs?wait=1', body)
+    finally:
+        stop_send_server(server, thread)
+
+    assert first == second
+    assert first["id"] == "job-1"
+    assert mock_server.snapshot()["personalizations"] == 1
+
+def test_unix_socket_client(mock_server, tmp_path):
+    """Test submitting a job over a Unix socket."""
+    path = str(tmp_path / "send.sock")
+    server, thread = start_send_server(mock_server, path, max_delay=0)
+    try:
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+        with ServerClient(socket_path=path) as client:
+            status = client.submit(
+                [{"to_email": "b@example.com", "name": "B"}], "Hi {name}", "# Hello {name}",
+                "a@example.com", is_markdown=True, wait=True,
+            )
+            assert status["sent"] == 1
+            with pytest.raises(RuntimeError):
+                client._request('POST', '/jobs', b'{"subject": 1}')
+    finally:
+        stop_send_server(server, thread)
+    assert not (tmp_path / "send.sock").exists()
+
+def test_socket_path_must_be_a_socket(tmp_path):
+    """Test that an existing file at the socket path is left alone."""
+    path = tmp_path / "send.sock"
+    path.write_text("keep me")
+    with pytest.raises(FileExistsError):
+        SendServer(EmailSender(api_key='test_key'), str(path))
+    assert path.read_text() == "keep me"
+
+def test_refuses_non_loopback_address():
+    """Test that the unauthenticated API is only served beyond loopback when allowed."""
+    sender = EmailSender(api_key='test_key')
+    with patch('swecc_email_sender.core.server._HTTPServer') as http_server:
+        for host in ('0.0.0.0', ''):
+            with pytest.raises(ValueError):
+                SendServer(sender, (host, 0))
+    # The address is refused before anything is bound
+    http_server.assert_not_called()
+    assert is_loopback_host('localhost')
+    assert is_loopback_host('::1')
+    with SendServer(sender, ('0.0.0.0', 0), allow_remote=True) as server:
+        assert server.address[0] == '0.0.0.0'
+
+def test_close_sends_queued_jobs(mock_server):
+    """Test that closing the server sends jobs still waiting for a batch."""
+    sender = EmailSender(api_key='test_key', api_url=mock_server.url)
+    with SendServer(sender, ('127.0.0.1', 0), max_delay=60) as server:
+        job = server.submit(Job("Hi", "Hello", "a@example.com", [{"to_email": "b@example.com"}]))
+    assert job.results == [True]
@@ -0,0 +1,189 @@
+"""Tests for CompiledTemplate"""
+
+import pytest
+
+from swecc_email_sender.core.template import (
+    CompiledTemplate,
+    MarkdownTemplate,
+    SubstitutionTemplate,
+    compile_markdown_template,
+    compile_template,
+)
+from swecc_email_sender.utils.markdown_utils import convert_markdown_to_html
+
+def test_required_keys_in_order():
+    """Test that required keys are deduplicated in order of appearance."""
+    template = CompiledTemplate("{b} {a} {b} {{literal}}")
+    assert template.required_keys == ("b", "a")
+    assert template.is_simple
+
+def test_render_simple():
+    """Test the fast rendering path."""
+    template = CompiledTemplate("Hello {name}! {{braces}} #{order_id}")
+    assert template.render({"name": "John", "order_id": 7}) == "Hello John! {braces} #7"
+
+def test_render_missing_uses_fallback():
+    """Test that missing fields render as the fallback."""
+    assert CompiledTemplate("Hi {name}").render({}, fallback="N/A") == "Hi N/A"
+
+@pytest.mark.parametrize("text,data", [
+    ("{price:>8.2f}", {"price": 3.5}),
+    ("{name!r}", {"name": "John"}),
+    ("{user[name]}", {"user": {"name": "John"}}),
+])
+def test_render_complex_matches_format_map(text, data):
+    """Test that complex fields render exactly like str.format_map."""
+    template = CompiledTemplate(text)
+    assert not template.is_simple
+    assert template.render(data) == text.format_map(data)
+
+def test_malformed_template():
+    """Test that malformed templates render unchanged and fail validation."""
+    template = CompiledTemplate("Hello {name")
+    assert template.render({"name": "John"}) == "Hello {name"
+    with pytest.raises(ValueError):
+        template.missing_keys({})
+
+def test_positional_field_renders_unchanged():
+    """Test that positional fields are rejected like str.format_map."""
+    assert CompiledTemplate("Hello {0}").render({"0": "x"}) == "Hello {0}"
+
+def test_missing_keys():
+    """Test missing key detection."""
+    template = CompiledTemplate("{a} {b} {c}")
+    assert template.missing_keys({"b": "1"}) == ["a", "c"]
+
+def test_compile_template_cached():
+    """Test that compiled templates are reused."""
+    assert compile_template("Hello {name}") is compile_template("Hello {name}")
+
+MARKDOWN_TEMPLATE = """# Hello {name}
+
+Your order **{order_id}** ships to {city}.
+
+| Item | Qty |
+|------|-----|
+| {item} | 1 |
+
+[Track it]({url})
+"""
+
+def test_markdown_template_matches_per_recipient_conversion():
+    """Test that render-once output equals converting the substituted Markdown."""
+    data = {
+        "name": "Jo & Co",
+        "order_id": "12345",
+        "city": "Seattle",
+        "item": "Widget",
+        "url": "https://example.com/track?id=1&t=2",
+    }
+    template = MarkdownTemplate(MARKDOWN_TEMPLATE)
+    assert template.is_precompiled
+    assert template.render(data) == convert_markdown_to_html(MARKDOWN_TEMPLATE.format(**data))
+
+def test_markdown_template_escapes_values():
+    """Test that quotes are escaped inside tags but not in text."""
+    template = MarkdownTemplate('{a} said hi\n\n[link]({b})')
+    rendered = template.render({"a": 'The "team"', "b": 'x"y'})
+    assert 'The "team" said hi' in rendered
+    assert 'href="x&quot;y"' in rendered
+
+@pytest.mark.parametrize("value", [
+    "**bold**",
+    "<b>html</b>",
+    "line\nbreak",
+    " padded",
+    "&copy;",
+])
+def test_markdown_template_falls_back_for_sensitive_values(value):
+    """Test that values Markdown would interpret force per-recipient rendering."""
+    assert MarkdownTemplate("Hello {name}").render({"name": value}) is None
+
+@pytest.mark.parametrize("value", ["- item", "1. first", "# heading", ""])
+def test_markdown_template_falls_back_at_line_start(value):
+    """Test that values beginning a line cannot introduce block structure."""
+    template = MarkdownTemplate("Intro\n\n{note}\n")
+    assert template.render({"note": value}) is None
+    assert template.render({"note": "Thanks"}) is not None
+
+@pytest.mark.parametrize("text,data", [
+    ("Questions? Email <{organizer}>", {"organizer": "jane@example.com"}),
+    ("<span title=\"{name}\">hi</span>", {"name": "Ada"}),
+    ("[site](http://x.com/{v})", {"v": "a)b"}),
+    ("[site]{v}", {"v": "(http://x.com)"}),
+])
+def test_markdown_template_matches_per_recipient_in_links_and_html(text, data):
+    """Test that fields in raw HTML, autolinks and link destinations keep parity."""
+    template = MarkdownTemplate(text)
+    rendered = template.render(data)
+    if rendered is None:
+        rendered = convert_markdown_to_html(template.template.render(data))
+    assert rendered == convert_markdown_to_html(text.format(**data))
+
+def test_markdown_template_fields_in_raw_html_not_precompiled():
+    """Test that fields inside <...> are rendered per recipient."""
+    assert not MarkdownTemplate("Email <{organizer}>").is_precompiled
+    assert not MarkdownTemplate("<a href=\"{url}\">\nlink</a>").is_precompiled
+    assert MarkdownTemplate("1 > 0 and {name} < 2").is_precompiled
+
+def test_markdown_template_complex_fields_not_precompiled():
+    """Test that templates needing format_map are rendered per recipient."""
+    template = MarkdownTemplate("Total {price:.2f}")
+    assert not template.is_precompiled
+    assert template.render({"price": 1.0}) is None
+
+def test_compile_markdown_template_cached():
+    """Test that converted Markdown templates are reused."""
+    assert compile_markdown_template("# {title}") is compile_markdown_template("# {title}")
+
+def test_render_key():
+    """Test that render keys are equal exactly when the rendered text is."""
+    simple = CompiledTemplate("Team {team}")
+    assert simple.render_key({"team": "red", "name": "a"}) == simple.render_key({"team": "red"})
+    assert simple.render_key({"team": "red"}) != simple.render_key({"team": "blue"})
+    complex_template = CompiledTemplate("Total {price:.0f}")
+    assert complex_template.render_key({"price": 1.2}) == complex_template.render_key({"price": 0.9})
+    assert complex_template.render_key({"price": 1.2}) != complex_template.render_key({"price": 2})
+
+def test_substitution_template_rewrites_fields():
+    """Test that fields become SendGrid substitution tags."""
+    template = SubstitutionTemplate("Hi {name}", "Hello {name} from {team} {{x}}")
+    assert template.is_supported
+    assert template.subject == "Hi -name-"
+    assert template.content == "Hello -name- from -team- {x}"
+    assert template.substitutions({"name": "Ada", "team": 7}) == {"-name-": "Ada", "-team-": "7"}
+    assert template.substitutions({}) == {"-name-": "", "-team-": ""}
+
+def test_substitution_template_markdown():
+    """Test that Markdown bodies are converted once and values escaped."""
+    template = SubstitutionTemplate("Hi", "# {title}\n\n[link]({url})", is_markdown=True)
+    assert template.is_supported
+    values = template.substitutions({"title": "Q&A", "url": 'x"y'})
+    html = template.content.replace("-title-", values["-title-"]).replace("-url-", values["-url-"])
+    expected = MarkdownTemplate("# {title}\n\n[link]({url})").render({"title": "Q&A", "url": 'x"y'})
+    assert html == expected
+    assert template.substitutions({"title": "*bold*", "url": "x"}) is None
+
+@pytest.mark.parametrize("subject,content", [
+    ("Hi", "Total {price:.2f}"),
+    ("Hi {name", "Hello"),
+    ("Hi", "Hello -name- {name}"),
+])
+def test_substitution_template_unsupported(subject, content):
+    """Test templates that must be rendered client-side."""
+    template = SubstitutionTemplate(subject, content)
+    assert not template.is_supported
+    assert template.substitutions({"name": "Ada"}) is None
+
+def test_substitution_template_markdown_field_in_raw_html_unsupported():
+    """Test that Markdown fields inside <...> are not rewritten to broken HTML."""
+    template = SubstitutionTemplate("Hi", "Questions? Email <{organizer}>", is_markdown=True)
+    assert not template.is_supported
+    assert "<-organizer->" not in template.content
+
+def test_substitution_template_rejects_unsafe_values():
+    """Test values that could be substituted again or exceed SendGrid's limit."""
+    template = SubstitutionTemplate("Hi {name}", "{team}")
+    assert template.substitutions({"name": "-team-", "team": "x"}) is None
+    assert template.substitutions({"name": "x" * 10000, "team": "x"}) is None
+    assert template.substitutions({"name": "x" * 2000, "team": "x"}) is not None
@@ -0,0 +1,61 @@
+"""Tests for template validation"""
+
+import json
+import pytest
+
+from swecc_email_sender.core.recipients import RecipientTable
+from swecc_email_sender.core.validation import validate_file, validate_records
+
+TEMPLATES = {"body": "Hello {name}, see you in {city}", "subject": "Hi {name}"}
+
+RECORDS = [
+    {"to_email": "a@example.com", "name": "A", "city": "Seattle"},
+    {"to_email": "b@example.com", "city": "Tacoma"},
+    {"to_email": "c@example.com"},
+    {"to_email": "d@example.com"},
+]
+
+@pytest.mark.parametrize("as_table", [False, True])
+def test_groups_rows_by_missing_keys(as_table):
+    """Test that rows lacking the same keys are reported together."""
+    records = RecipientTable.from_records(RECORDS) if as_table else iter(RECORDS)
+    report = validate_records(TEMPLATES, records, sample_size=1)
+
+    assert report.rows == 4
+    assert not report.is_valid
+    assert report.invalid_rows == 3
+    assert [(g.keys, g.row_count, g.sample_rows) for g in report.groups] == [
+        (("name", "city"), 2, [3]),
+        (("name",), 1, [2]),
+    ]
+    assert report.format()[1] == (
+        "2 rows missing `name` (body, subject), `city` (body); e.g. row 3 (c@example.com)"
+    )
+
+def test_valid_records():
+    """Test a report without problems."""
+    report = validate_records(TEMPLATES, RECORDS[:1])
+    assert report.is_valid
+    assert report.format() == [
+        "Validated 1 rows against the body and subject template(s): all required keys present"
+    ]
+
+def test_malformed_template():
+    """Test that malformed templates are reported as errors."""
+    with pytest.raises(ValueError):
+        validate_records({"body": "Hello {name"}, RECORDS)
+
+def test_validate_csv_file(tmp_path):
+    """Test that a CSV file missing a column fails every row."""
+    path = tmp_path / "data.csv"
+    path.write_text("to_email,name\na@example.com,A\n\nb@example.com,B\n")
+    report = validate_file(TEMPLATES, path)
+    assert report.rows == 2
+    assert [(g.keys, g.row_count) for g in report.groups] == [(("city",), 2)]
+
+def test_validate_json_file(tmp_path):
+    """Test that JSON records are checked individually."""
+    path = tmp_path / "data.json"
+    path.write_text(json.dumps(RECORDS))
+    report = validate_file(TEMPLATES, path)
+    assert report.invalid_rows == 3
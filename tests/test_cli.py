@@ -1,10 +1,13 @@
 """Tests for the cli"""
 
+import logging
 import os
 import pytest
 from unittest.mock import patch, MagicMock
 
 from swecc_email_sender.cli import main, create_parser
+from swecc_email_sender.core.recipients import RecipientTable
+from swecc_email_sender.core.sender import SendOutcome
 
 @pytest.fixture
 def mock_env():
@@ -18,6 +21,7 @@ def mock_sender():
     with patch('swecc_email_sender.cli.EmailSender') as mock:
         instance = MagicMock()
         instance.send_email.return_value = True
+        instance.send_email_outcome.return_value = SendOutcome(True, 202)
         instance.format_with_fallback.return_value = "Hello Test 1"
         mock.return_value = instance
         yield instance
@@ -27,10 +31,11 @@ def mock_data_loader():
     """Create a mock DataLoader."""
     with patch('swecc_email_sender.cli.DataLoader') as mock:
         mock.load_template.return_value = "Hello {name}!"
-        mock.load_data.return_value = [
+        mock.read_columns.return_value = None
+        mock.iter_data.side_effect = lambda _: iter([
             {"to_email": "test1@example.com", "name": "Test 1"},
             {"to_email": "test2@example.com", "name": "Test 2"}
-        ]
+        ])
         yield mock
 
 def test_parser_required_args():
@@ -91,6 +96,176 @@ def test_batch_email_success(mock_env, mock_sender, mock_data_loader, tmp_path):
     assert exit_code == 0
     assert mock_sender.send_email.call_count == 2
 
+def test_batch_mode_uses_send_batch(mock_env, mock_sender, mock_data_loader, tmp_path):
+    """Test that --batch sends through the multi-recipient API."""
+    data_file = tmp_path / "data.json"
+    data_file.touch()
+    mock_sender.send_batch.return_value = [True, False]
+
+    exit_code = main([
+        '--from', 'sender@example.com',
+        '--src', str(data_file),
+        '--subject', 'Test',
+        '--content', 'Hello {name}',
+        '--batch'
+    ])
+
+    assert exit_code == 1
+    mock_sender.send_batch.assert_called_once()
+    mock_sender.send_email.assert_not_called()
+
+def test_batch_server_side(mock_env, mock_sender, mock_data_loader, tmp_path):
+    """Test that --server-side is passed through to send_batch."""
+    data_file = tmp_path / "data.json"
+    data_file.touch()
+    mock_sender.send_batch.return_value = [True, True]
+
+    exit_code = main([
+        '--from', 'sender@example.com',
+        '--src', str(data_file),
+        '--subject', 'Test',
+        '--content', 'Hello {name}',
+        '--batch',
+        '--server-side'
+    ])
+
+    assert exit_code == 0
+    assert mock_sender.send_batch.call_args[1]['server_side'] is True
+
+def test_processes_use_sharded_sender(mock_env, mock_sender, mock_data_loader, tmp_path):
+    """Test that --processes sends through ShardedSender."""
+    data_file = tmp_path / "data.json"
+    data_file.touch()
+
+    with patch('swecc_email_sender.cli.ShardedSender') as sharded_cls:
+        sharded_cls.return_value.iter_send.side_effect = lambda records, *args, **kwargs: (
+            (record, True) for record in records
+        )
+        exit_code = main([
+            '--from', 'sender@example.com',
+            '--src', str(data_file),
+            '--subject', 'Test',
+            '--content', 'Hello {name}',
+            '--processes', '4',
+            '--workers', '2'
+        ])
+
+    assert exit_code == 0
+    assert sharded_cls.call_args[0][0] == 4
+    assert sharded_cls.call_args[1]['threads'] == 2
+    mock_sender.send_email.assert_not_called()
+
+def test_batch_email_with_workers(mock_env, mock_sender, mock_data_loader, tmp_path):
+    """Test sending batch emails across a thread pool."""
+    data_file = tmp_path / "data.json"
+    data_file.touch()
+    mock_sender.send_email.side_effect = lambda to_email, *args, **kwargs: (
+        to_email == "test1@example.com"
+    )
+
+    exit_code = main([
+        '--from', 'sender@example.com',
+        '--src', str(data_file),
+        '--subject', 'Test',
+        '--content', 'Hello {name}',
+        '--workers', '4'
+    ])
+
+    assert exit_code == 1
+    assert mock_sender.send_email.call_count == 2
+
+def test_parser_rejects_zero_workers():
+    """Test that --workers must be positive."""
+    parser = create_parser()
+    with pytest.raises(SystemExit):
+        parser.parse_args([
+            '--from', 'sender@example.com',
+            '--to', 'recipient@example.com',
+            '--subject', 'Test',
+            '--content', 'Hello',
+            '--workers', '0'
+        ])
+
+@pytest.mark.parametrize("options", [
+    ['--server-side'],
+    ['--render-once'],
+    ['--markdown', '--render-once', '--batch'],
+    ['--batch', '--workers', '4'],
+])
+def test_rejects_ignored_options(mock_env, mock_sender, options):
+    """Test that options which would have no effect are rejected."""
+    with pytest.raises(SystemExit):
+        main(['--from', 'a@example.com', '--src', 'data.csv', '--subject', 'Hi',
+              '--content', 'Hello', *options])
+    with pytest.raises(SystemExit):
+        main(['worker', 'queue.db', '--server-side'])
+    mock_sender.send_email.assert_not_called()
+
+@pytest.mark.parametrize("options", [
+    ['--batch'],
+    ['--workers', '8'],
+    ['--resume', 'JOURNAL'],
+    ['--compact'],
+    ['--processes', '4'],
+])
+def test_rejects_src_options_with_to(mock_env, mock_sender, tmp_path, options):
+    """Test that options of sending to a --src file are rejected for a single email."""
+    journal = tmp_path / "journal.db"
+    with pytest.raises(SystemExit):
+        main(['--from', 'a@example.com', '--to', 'b@example.com', '--subject', 'Hi',
+              '--content', 'Hello', *[str(journal) if o == 'JOURNAL' else o for o in options]])
+    mock_sender.send_email.assert_not_called()
+    assert not journal.exists()
+
+def test_resume_skips_sent_recipients(mock_env, mock_sender, mock_data_loader, tmp_path):
+    """Test that --resume records outcomes and skips completed recipients."""
+    data_file = tmp_path / "data.json"
+    data_file.touch()
+    journal = tmp_path / "journal.db"
+    argv = [
+        '--from', 'sender@example.com',
+        '--src', str(data_file),
+        '--subject', 'Test',
+        '--content', 'Hello {name}',
+        '--resume', str(journal)
+    ]
+    mock_sender.send_email.side_effect = lambda to_email, *args, **kwargs: (
+        to_email == "test1@example.com"
+    )
+
+    assert main(argv) == 1
+    assert mock_sender.send_email.call_count == 2
+
+    mock_sender.send_email.reset_mock()
+    mock_sender.send_email.side_effect = None
+    assert main(argv) == 0
+    mock_sender.send_email.assert_called_once()
+    assert mock_sender.send_email.call_args[0][0] == "test2@example.com"
+
+def test_resume_batch_journals_each_request(mock_env, mock_sender, mock_data_loader, tmp_path):
+    """Test that --batch --resume keeps the outcomes of requests sent before a crash."""
+    data_file = tmp_path / "data.json"
+    data_file.touch()
+    argv = [
+        '--from', 'sender@example.com',
+        '--src', str(data_file),
+        '--subject', 'Test',
+        '--content', 'Hello {name}',
+        '--batch',
+        '--resume', str(tmp_path / "journal.db")
+    ]
+
+    def crash_after_first_request(records, *args, on_result=None, **kwargs):
+        on_result([0], SendOutcome(True, 202))
+        raise RuntimeError("killed")
+
+    mock_sender.send_batch.side_effect = crash_after_first_request
+    assert main(argv) == 1
+
+    mock_sender.send_batch.side_effect = lambda records, *args, **kwargs: [True] * len(records)
+    assert main(argv) == 0
+    assert [r["to_email"] for r in mock_sender.send_batch.call_args[0][0]] == ["test2@example.com"]
+
 def test_preview_mode(mock_env, mock_sender, mock_data_loader, tmp_path):
     """Test preview mode doesn't send emails."""
     data_file = tmp_path / "data.json"
@@ -110,7 +285,8 @@ def test_preview_mode(mock_env, mock_sender, mock_data_loader, tmp_path):
 def test_validate_mode(mock_env, mock_sender, mock_data_loader, tmp_path):
     """Test validation mode doesn't send emails."""
     data_file = tmp_path / "data.json"
-    data_file.touch()
+    # Validation streams the file itself rather than through the CLI's loader
+    data_file.write_text('[{"to_email": "test1@example.com", "name": "Test 1"}]')
 
     mock_sender.validate_template_keys.return_value = []
 
@@ -138,3 +314,173 @@ def test_exception_handling(mock_env):
         ])
 
         assert exit_code == 1
+
+def test_metrics_out(mock_env, mock_sender, mock_data_loader, tmp_path):
+    """Test that --metrics-out enables metrics and writes them after the run."""
+    metrics_file = tmp_path / "metrics.prom"
+
+    with patch('swecc_email_sender.cli.EmailSender') as mock:
+        mock.return_value = mock_sender
+        exit_code = main([
+            '--from', 'sender@example.com',
+            '--src', 'data.csv',
+            '--subject', 'Test',
+            '--content', 'Hello {name}',
+            '--metrics-out', str(metrics_file)
+        ])
+        assert mock.call_args[1]['metrics'] is not None
+
+    assert exit_code == 0
+    assert "swecc_email_sent_total" in metrics_file.read_text()
+
+def test_profile(mock_env, mock_sender, tmp_path, capsys):
+    """Test that --profile writes pstats and collapsed stacks and prints a summary."""
+    profile_file = tmp_path / "run.prof"
+
+    exit_code = main([
+        '--from', 'sender@example.com',
+        '--to', 'recipient@example.com',
+        '--subject', 'Test',
+        '--content', 'Hello',
+        '--profile', str(profile_file)
+    ])
+
+    assert exit_code == 0
+    assert profile_file.exists()
+    assert (tmp_path / "run.prof.collapsed").exists()
+    assert "function calls" in capsys.readouterr().err
+
+def test_compact_batch(mock_env, mock_sender, mock_data_loader):
+    """Test that --compact hands a RecipientTable straight to send_batch."""
+    mock_data_loader.load_table.return_value = RecipientTable.from_records([
+        {"to_email": "test1@example.com", "name": "Test 1"},
+    ])
+    mock_sender.send_batch.return_value = [True]
+
+    exit_code = main([
+        '--from', 'sender@example.com',
+        '--src', 'data.csv',
+        '--subject', 'Test',
+        '--content', 'Hello {name}',
+        '--batch',
+        '--compact'
+    ])
+
+    assert exit_code == 0
+    mock_data_loader.iter_data.assert_not_called()
+    assert mock_sender.send_batch.call_args[0][0] is mock_data_loader.load_table.return_value
+
+def test_compact_validate(mock_env, mock_data_loader, caplog):
+    """Test column-wise validation of a RecipientTable."""
+    mock_data_loader.load_table.return_value = RecipientTable.from_records([
+        {"to_email": "test1@example.com", "name": "Test 1"},
+        {"to_email": "test2@example.com"},
+    ])
+
+    exit_code = main([
+        '--from', 'sender@example.com',
+        '--api-key', 'test_key',
+        '--src', 'data.csv',
+        '--subject', 'Hi {name}',
+        '--content', 'Hello {name}',
+        '--validate',
+        '--compact'
+    ])
+
+    assert exit_code == 1
+    assert "1 row missing `name` (body, subject); e.g. row 2 (test2@example.com)" in caplog.text
+    assert "test1@example.com" not in caplog.text
+
+def test_validate_csv_header(mock_env, tmp_path, caplog):
+    """Test that CSV files are validated from their header."""
+    caplog.set_level(logging.INFO)
+    data_file = tmp_path / "data.csv"
+    data_file.write_text("to_email,first\na@example.com,A\nb@example.com,B\n")
+
+    exit_code = main([
+        '--from', 'sender@example.com',
+        '--api-key', 'test_key',
+        '--src', str(data_file),
+        '--subject', 'Hi {first}',
+        '--content', 'Hello {name}',
+        '--validate'
+    ])
+
+    assert exit_code == 1
+    assert "Validated 2 rows" in caplog.text
+    assert "2 rows missing `name` (body); e.g. rows 1, 2" in caplog.text
+
+def test_serve(mock_env, mock_sender, tmp_path):
+    """Test that the serve command runs a send server with the shared sender."""
+    socket_path = str(tmp_path / "send.sock")
+    with patch('swecc_email_sender.core.server.SendServer') as server_cls:
+        exit_code = main(['serve', '--socket', socket_path, '--max-delay', '0.01', '--workers', '2'])
+
+    assert exit_code == 0
+    args, kwargs = server_cls.call_args
+    assert args == (mock_sender, socket_path)
+    assert kwargs['max_delay'] == 0.01
+    assert kwargs['workers'] == 2
+    assert kwargs['allow_remote'] is False
+    server_cls.return_value.serve_forever.assert_called_once()
+
+def test_serve_refuses_remote_host(mock_env, mock_sender, caplog):
+    """Test that serving the unauthenticated API beyond loopback must be opted into."""
+    exit_code = main(['serve', '--host', '0.0.0.0', '--port', '0'])
+
+    assert exit_code == 1
+    assert "non-loopback" in caplog.text
+
+def test_serve_requires_api_key(tmp_path, caplog):
+    """Test that the server refuses to start when it would have to prompt for a key."""
+    with patch.dict(os.environ, {'SENDGRID_API_KEY': ''}), \
+            patch('swecc_email_sender.core.credentials.ConfigFileCredentialProvider.get_api_key',
+                  return_value=None):
+        exit_code = main(['serve', '--port', '0'])
+
+    assert exit_code == 1
+    assert "No SendGrid API key" in caplog.text
+
+def test_queue_sends_from_queue(mock_env, mock_sender, mock_data_loader, tmp_path):
+    """Test that --queue stores the emails durably and then drains the queue."""
+    queue_path = tmp_path / "queue.db"
+    argv = [
+        '--from', 'sender@example.com',
+        '--src', 'data.csv',
+        '--subject', 'Hi {name}',
+        '--content', 'Hello',
+        '--queue', str(queue_path)
+    ]
+    exit_code = main(argv)
+
+    assert exit_code == 0
+    assert [call.args[0] for call in mock_sender.send_email_outcome.call_args_list] == [
+        "test1@example.com", "test2@example.com"
+    ]
+    assert queue_path.exists()
+
+    # Running the same command again does not queue the recipients a second time
+    assert main(argv) == 0
+    assert mock_sender.send_email_outcome.call_count == 2
+
+def test_worker_reports_dead_letters(mock_env, mock_sender, tmp_path):
+    """Test that the worker command drains a queue and fails if emails were given up on."""
+    from swecc_email_sender.core.send_queue import SendQueue
+
+    queue_path = tmp_path / "queue.db"
+    with SendQueue(queue_path) as queue:
+        queue.enqueue([{"to_email": "a@example.com"}], "Hi", "Hello", "sender@example.com")
+    mock_sender.send_email_outcome.return_value = SendOutcome(False, 503)
+
+    exit_code = main(['worker', str(queue_path), '--max-deliveries', '1'])
+
+    assert exit_code == 1
+    with SendQueue(queue_path) as queue:
+        assert queue.counts() == {"pending": 0, "dead": 1}
+
+def test_queue_requires_src():
+    """Test that --queue is rejected for single emails."""
+    parser_args = ['--from', 'a@example.com', '--to', 'b@example.com', '--subject', 'Hi',
+                   '--content', 'Hello', '--queue', 'queue.db']
+    with pytest.raises(SystemExit):
+        main(parser_args)
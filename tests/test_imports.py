@@ -0,0 +1,28 @@
+"""Tests for lazily imported package exports"""
+
+import subprocess
+import sys
+
+import pytest
+
+import swecc_email_sender
+from swecc_email_sender.core.sender import EmailSender
+
+def test_lazy_exports():
+    """Test that package exports resolve on first use."""
+    assert swecc_email_sender.EmailSender is EmailSender
+    assert "ShardedSender" in dir(swecc_email_sender)
+    with pytest.raises(AttributeError):
+        swecc_email_sender.NotAnExport
+
+def test_cli_import_skips_optional_dependencies():
+    """Test that importing the CLI does not load modules only some commands need."""
+    script = (
+        "import sys, swecc_email_sender.cli\n"
+        "heavy = ['asyncio', 'markdown', 'csv', 'getpass', 'sqlite3', 'multiprocessing', 'cProfile']\n"
+        "print(','.join(m for m in heavy if m in sys.modules))"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", script], check=True, capture_output=True, text=True
+    ).stdout
+    assert output.strip() == ""
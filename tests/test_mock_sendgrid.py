@@ -0,0 +1,124 @@
+"""End-to-end tests against the local mock SendGrid server"""
+
+import asyncio
+
+from swecc_email_sender.cli import main
+from swecc_email_sender.core.async_sender import AsyncEmailSender
+from swecc_email_sender.core.metrics import SenderMetrics
+from swecc_email_sender.core.retry import RetryPolicy
+from swecc_email_sender.core.sender import EmailSender
+from swecc_email_sender.core.sharded import ShardedSender
+
+def test_send_email_reuses_connection(mock_server):
+    """Test that sequential sends share one keep-alive connection."""
+    with EmailSender(api_key='test_key', api_url=mock_server.url) as sender:
+        for i in range(5):
+            assert sender.send_email(f"user{i}@example.com", "Hi", "Hello", "sender@example.com")
+
+    stats = mock_server.snapshot()
+    assert stats["accepted"] == 5
+    assert stats["connections"] == 1
+
+def test_send_email_unauthorized(mock_server):
+    """Test that a wrong API key is reported as a failure."""
+    with EmailSender(api_key='wrong_key', api_url=mock_server.url) as sender:
+        assert not sender.send_email("user@example.com", "Hi", "Hello", "sender@example.com")
+
+def test_send_batch_personalizations(mock_server):
+    """Test that send_batch delivers every recipient in one request."""
+    records = [{"to_email": f"user{i}@example.com"} for i in range(10)]
+    with EmailSender(api_key='test_key', api_url=mock_server.url) as sender:
+        assert all(sender.send_batch(records, "Hi", "Hello", "sender@example.com"))
+
+    stats = mock_server.snapshot()
+    assert stats["requests"] == 1
+    assert stats["personalizations"] == 10
+
+def test_retries_transient_errors(mock_server):
+    """Test that injected 5xx errors are retried until they succeed."""
+    mock_server.config.error_rate = 0.5
+    policy = RetryPolicy(max_attempts=20, backoff_base=0)
+    with EmailSender(api_key='test_key', api_url=mock_server.url, retry_policy=policy) as sender:
+        for i in range(10):
+            assert sender.send_email(f"user{i}@example.com", "Hi", "Hello", "sender@example.com")
+
+def test_async_send_many(mock_server):
+    """Test AsyncEmailSender against the mock server."""
+    records = [{"to_email": f"user{i}@example.com"} for i in range(20)]
+
+    async def run():
+        async with AsyncEmailSender(api_key='test_key', api_url=mock_server.url) as sender:
+            return await sender.send_many(records, "Hi", "Hello", "sender@example.com")
+
+    assert all(asyncio.run(run()))
+    assert mock_server.snapshot()["accepted"] == 20
+
+def test_sharded_sender(mock_server):
+    """Test sending from worker processes with results in record order."""
+    records = [{"to_email": f"user{i}@example.com", "name": str(i)} for i in range(25)]
+    records.insert(3, {"name": "no email"})
+    metrics = SenderMetrics()
+    sender = ShardedSender(
+        2, api_key='test_key', threads=2, api_url=mock_server.url, metrics=metrics, chunk_size=4
+    )
+
+    results = sender.send_all(records, "Hi {name}", "# Hello {name}", "sender@example.com", True)
+
+    assert results == [True] * 3 + [False] + [True] * 22
+    assert mock_server.snapshot()["accepted"] == 25
+    assert metrics.snapshot()["counters"]["sent"] == 25
+    assert metrics.snapshot()["stages"]["markdown"]["count"] == 25
+
+def test_sharded_batch_shares_retry_budget(mock_server):
+    """Test that the retry budget covers every chunk and process of a send."""
+    mock_server.config.error_rate = 1.0
+    policy = RetryPolicy(max_attempts=5, backoff_base=0, retry_budget=3)
+    records = [{"to_email": f"user{i}@example.com"} for i in range(8)]
+    sender = ShardedSender(
+        2, api_key='test_key', api_url=mock_server.url, retry_policy=policy, chunk_size=2
+    )
+
+    results = sender.send_all(records, "Hi", "Hello", "sender@example.com", batch=True)
+
+    assert not any(results)
+    # One request per chunk plus the budget's retries
+    assert mock_server.snapshot()["requests"] == 4 + 3
+
+def test_cli_batch(mock_server, tmp_path):
+    """Test a full CLI run against the mock server."""
+    src = tmp_path / "recipients.csv"
+    src.write_text("to_email,name\na@example.com,A\nb@example.com,B\n")
+
+    exit_code = main([
+        '--from', 'sender@example.com',
+        '--api-key', 'test_key',
+        '--api-url', mock_server.url,
+        '--src', str(src),
+        '--subject', 'Hi {name}',
+        '--content', 'Hello {name}',
+        '--workers', '2'
+    ])
+
+    assert exit_code == 0
+    assert mock_server.snapshot()["accepted"] == 2
+
+def test_cli_processes(mock_server, tmp_path):
+    """Test a CLI batch run spread across worker processes."""
+    src = tmp_path / "recipients.csv"
+    src.write_text("to_email,name\na@example.com,A\nb@example.com,B\nc@example.com,C\n")
+    journal = tmp_path / "sent.journal"
+
+    exit_code = main([
+        '--from', 'sender@example.com',
+        '--api-key', 'test_key',
+        '--api-url', mock_server.url,
+        '--src', str(src),
+        '--subject', 'Hi {name}',
+        '--content', 'Hello {name}',
+        '--processes', '2',
+        '--resume', str(journal)
+    ])
+
+    assert exit_code == 0
+    assert mock_server.snapshot()["accepted"] == 3
+    assert journal.exists()
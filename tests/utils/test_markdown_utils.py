@@ -0,0 +1,64 @@
+"""Tests for markdown utilities"""
+
+import threading
+import pytest
+from unittest.mock import patch
+
+from swecc_email_sender.utils import markdown_utils
+from swecc_email_sender.utils.markdown_utils import clear_markdown_cache, convert_markdown_to_html
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    """Start every test with an empty conversion memo."""
+    clear_markdown_cache()
+    yield
+    clear_markdown_cache()
+
+def test_convert_markdown_to_html():
+    """Test conversion with fenced code, tables and the CSS class wrapper."""
+    html = convert_markdown_to_html(
+        "# Title\n\n```\ncode\n```\n\n| a | b |\n|---|---|\n| 1 | 2 |", css_class="email"
+    )
+    assert "<h1>Title</h1>" in html
+    assert "<pre><code>code" in html
+    assert "<table>" in html
+    assert 'class="email"' in html
+
+def test_converter_reset_between_documents():
+    """Test that state from one document does not leak into the next."""
+    first = convert_markdown_to_html("[a]: https://example.com\n\n[link][a]")
+    second = convert_markdown_to_html("[link][a]")
+    assert 'href="https://example.com"' in first
+    assert "href" not in second
+
+def test_identical_content_converted_once():
+    """Test that repeated bodies are served from the memo."""
+    with patch.object(markdown_utils, '_markdown_to_html', return_value="<p>x</p>") as convert:
+        first = convert_markdown_to_html("**x**")
+        second = convert_markdown_to_html("**x**")
+        convert_markdown_to_html("**x**", css_class="other")
+
+    assert first == second
+    assert convert.call_count == 2
+
+def test_memo_is_bounded():
+    """Test that the least recently used entries are evicted."""
+    with patch.object(markdown_utils, 'MARKDOWN_CACHE_SIZE', 2):
+        for text in ("a", "b", "c"):
+            convert_markdown_to_html(text)
+        assert len(markdown_utils._cache) == 2
+
+def test_concurrent_conversions():
+    """Test that the shared converter can be used from several threads."""
+    results = {}
+
+    def convert(i):
+        results[i] = convert_markdown_to_html(f"# Heading {i}\n\n*item {i}*")
+
+    threads = [threading.Thread(target=convert, args=(i,)) for i in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert all(f"<h1>Heading {i}</h1>" in results[i] for i in range(20))
@@ -0,0 +1,49 @@
+"""Tests for profiling helpers"""
+
+import io
+import pstats
+import threading
+import time
+
+from swecc_email_sender.utils.profiling import StackSampler, profile_call
+
+def busy_worker():
+    """Spin briefly so the sampler catches this frame."""
+    end = time.perf_counter() + 0.05
+    while time.perf_counter() < end:
+        pass
+
+def test_profile_call_includes_threads(tmp_path):
+    """Test that work done in other threads appears in both profiles."""
+    out = tmp_path / "run.prof"
+
+    def run():
+        thread = threading.Thread(target=busy_worker)
+        thread.start()
+        thread.join()
+        return 42
+
+    stream = io.StringIO()
+    assert profile_call(run, str(out), stream=stream) == 42
+
+    functions = {name for _, _, name in pstats.Stats(str(out)).stats}
+    assert "busy_worker" in functions
+    collapsed = (tmp_path / "run.prof.collapsed").read_text()
+    assert "busy_worker" in collapsed
+    assert "Profile written to" in stream.getvalue()
+
+def test_collapsed_format(tmp_path):
+    """Test that collapsed stacks are outermost first with a sample count."""
+    sampler = StackSampler()
+    sampler.samples["a:main;b:work"] = 3
+    path = tmp_path / "stacks"
+    sampler.write(str(path))
+    assert path.read_text() == "a:main;b:work 3\n"
+
+def test_profile_call_unwritable_output(tmp_path, caplog):
+    """Test that failing to write the profile does not replace the function's result."""
+    stream = io.StringIO()
+    out = tmp_path / "missing" / "run.prof"
+    assert profile_call(lambda: 7, str(out), stream=stream) == 7
+    assert "Could not write profile" in caplog.text
+    assert "Profile written to" not in stream.getvalue()